@@ -0,0 +1,68 @@
+"""
+Compares pd.read_sql with the columnar Vertica fetch path (pymaf.utils.fetch.read_vertica).
+
+Runs offline against a fake connection serving pre-built rows by default, or against a live
+Vertica with --live and the VERTICA_DEV_* environment variables. Prints one JSON line per engine.
+
+    python benchmarks/bench_fetch.py --rows 1000000
+    python benchmarks/bench_fetch.py --live --query "SELECT * FROM ca_ods.ods_crf_dim_account LIMIT 1000000"
+"""
+import argparse
+import json
+import os
+import sys
+import time
+import warnings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+
+from pymaf.utils.fetch import read_vertica
+
+
+def get_connection(args):
+    if args.live:
+        import vertica_python
+        return vertica_python.connect(host=os.getenv("VERTICA_DEV_HOST"), port=os.getenv("VERTICA_DEV_PORT"),
+                                      database=args.database, user=os.getenv("VERTICA_DEV_USER"),
+                                      password=os.getenv("VERTICA_DEV_PASSWORD"))
+
+    from fake_vertica import FakeConnection, make_rows
+    return FakeConnection(make_rows(args.rows))
+
+
+def run(name, read, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        df = read()
+        timings.append(time.perf_counter() - start)
+    return {"benchmark": "fetch", "engine": name, "rows": len(df), "columns": df.shape[1],
+            "best_seconds": min(timings), "mean_seconds": sum(timings) / len(timings),
+            "rows_per_second": len(df) / min(timings)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--live", action="store_true")
+    parser.add_argument("--database", default="ca_dev")
+    parser.add_argument("--query", default="SELECT * FROM bench")
+    args = parser.parse_args()
+
+    connection = get_connection(args)
+    with warnings.catch_warnings():
+        # pandas warns about DBAPI connections other than sqlite3
+        warnings.simplefilter("ignore", UserWarning)
+        results = [run("pd.read_sql", lambda: pd.read_sql(args.query, connection), args.repeat),
+                   run("columnar", lambda: read_vertica(args.query, connection), args.repeat)]
+
+    results[1]["speedup"] = results[0]["best_seconds"] / results[1]["best_seconds"]
+    for result in results:
+        print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Measures cold-start cost: importing pymaf, constructing a DatabaseConnector, and getting the
+first result from a warm cache. Each repeat runs in a fresh interpreter, so module imports are
+not shared between runs. No database is needed, as cached results never open a connection.
+Prints one JSON line.
+
+    python benchmarks/bench_startup.py --repeat 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+QUERY = "SELECT * FROM bench"
+
+CHILD = """
+import json, sys, time
+start = time.perf_counter()
+from pymaf.utils.database_connector import DatabaseConnector
+imported = time.perf_counter()
+connector = DatabaseConnector('vertica', connection_info={'host': 'localhost'}, cache_directory=sys.argv[1],
+                              loglevel='WARNING')
+constructed = time.perf_counter()
+result = connector.q(sys.argv[2], cache_only=True)
+done = time.perf_counter()
+assert result is not None and connector._dbengine is None
+print(json.dumps({"import_seconds": imported - start, "construct_seconds": constructed - imported,
+                  "first_cached_result_seconds": done - constructed, "total_seconds": done - start}))
+"""
+
+
+def populate(cache_directory, rows):
+    import pandas as pd
+    from pymaf.utils.database_connector import DatabaseConnector
+
+    connector = DatabaseConnector('vertica', connection_info={'host': 'localhost'}, cache_directory=cache_directory,
+                                  loglevel='WARNING')
+    df = pd.DataFrame({"id": range(rows), "amount": [i * 1.5 for i in range(rows)]})
+    connector.cache.set(connector._get_cache_key(QUERY), df)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as cache_directory:
+        populate(cache_directory, args.rows)
+        runs = [json.loads(subprocess.run([sys.executable, "-c", CHILD, cache_directory, QUERY], cwd=ROOT,
+                                          capture_output=True, text=True, check=True).stdout)
+                for _ in range(args.repeat)]
+
+    result = {"benchmark": "startup", "rows": args.rows}
+    for name in runs[0]:
+        timings = [run[name] for run in runs]
+        result[name.replace("_seconds", "_best_seconds")] = min(timings)
+        result[name.replace("_seconds", "_mean_seconds")] = sum(timings) / len(timings)
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
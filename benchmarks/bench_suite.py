@@ -0,0 +1,227 @@
+"""
+Offline benchmark suite for DatabaseConnector. Queries run against the fake vertica_python
+connection in fake_vertica.py, through the real connection pool, fetch engines and cache.
+
+Benchmarks:
+    q_latency      q cold (fetch and cache), warm from disk and warm from the memory tier
+    serialization  cache write/read time and size by result size, dtype mix, cache format and compression
+    concurrency    q_many throughput by number of workers, with simulated server latency
+    memory         peak traced memory of q cold, q warm and q_iter
+
+Prints one JSON line per result; every line carries the run's metadata. Save runs to files and
+compare them with compare.py:
+
+    python benchmarks/bench_suite.py --output base.jsonl
+    python benchmarks/bench_suite.py --only q_latency memory --rows 10000 100000
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import numpy as np
+import pandas as pd
+
+from fake_vertica import FakeConnection, make_rows
+from pymaf.utils import dbconfig
+from pymaf.utils.cache import ResultCache
+from pymaf.utils.database_connector import DatabaseConnector
+from pymaf.utils.dbconfig import dispose_shared_engines
+
+QUERY = "SELECT * FROM bench"
+DTYPE_MIXES = ("numeric", "strings", "datetime", "mixed")
+
+
+def get_metadata():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                                text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"commit": commit, "python": platform.python_version(), "pandas": pd.__version__,
+            "machine": platform.machine(), "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat()}
+
+
+def best_of(repeat, func, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings), sum(timings) / len(timings)
+
+
+class StandIn:
+    """
+    Points verticaConnection at FakeConnection while the block runs, as the stand-in Vertica.
+    """
+    def __init__(self, rows, latency=0):
+        self.rows = make_rows(rows)
+        self.latency = latency
+
+    def __enter__(self):
+        self._connect = dbconfig.verticaConnection.connect
+        dbconfig.verticaConnection.connect = lambda _: FakeConnection(self.rows, latency=self.latency)
+        return self
+
+    def __exit__(self, *exc):
+        dbconfig.verticaConnection.connect = self._connect
+        dispose_shared_engines()
+
+
+def make_connector(cache_directory, **kwargs):
+    kwargs.setdefault("pool_options", {"pre_ping": False})
+    return DatabaseConnector("vertica", connection_info={"host": "stand-in"}, cache_directory=cache_directory,
+                             loglevel="WARNING", **kwargs)
+
+
+def bench_q_latency(args):
+    for rows in args.rows:
+        for engine in ("pandas", "columnar"):
+            with StandIn(rows), tempfile.TemporaryDirectory() as directory:
+                connector = make_connector(directory, fetch_engine=engine, memory_cache_bytes=2 ** 31)
+                cold = best_of(args.repeat, lambda: connector.q(QUERY), setup=connector.clear_cache)
+                warm_memory = best_of(args.repeat, lambda: connector.q(QUERY))
+                disk_only = make_connector(directory, fetch_engine=engine)
+                warm_disk = best_of(args.repeat, lambda: disk_only.q(QUERY))
+            yield {"benchmark": "q_latency", "rows": rows, "engine": engine,
+                   "cold_seconds": cold[0], "warm_disk_seconds": warm_disk[0], "warm_memory_seconds": warm_memory[0],
+                   "cold_mean_seconds": cold[1], "warm_disk_mean_seconds": warm_disk[1]}
+
+
+def make_frame(mix, rows):
+    rng = np.random.default_rng(0)
+    numeric = {"id": np.arange(rows), "amount": rng.random(rows), "quantity": rng.integers(0, 100, rows)}
+    strings = {"label": [f"label-{i % 1000}" for i in range(rows)], "code": [f"C{i % 37:03d}" for i in range(rows)]}
+    dates = {"order_date": pd.date_range("2023-01-01", periods=rows, freq="min"),
+             "updated_at": pd.date_range("2023-01-01", periods=rows, freq="s")}
+    columns = {"numeric": numeric, "strings": strings, "datetime": dates,
+               "mixed": dict(numeric, **strings, **dates)}[mix]
+    return pd.DataFrame(columns)
+
+
+def available(*modules):
+    try:
+        for module in modules:
+            __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+def bench_serialization(args):
+    formats = ["pickle"] + (["arrow"] if available("pyarrow") else [])
+    compressions = [None] + [codec for codec, module in (("zstd", "zstandard"), ("lz4", "lz4.frame"))
+                             if available(module)]
+
+    for rows in args.rows:
+        for mix in DTYPE_MIXES:
+            df = make_frame(mix, rows)
+            for cache_format in formats:
+                for compression in compressions:
+                    with tempfile.TemporaryDirectory() as directory:
+                        cache = ResultCache(directory=directory, cache_format=cache_format, compression=compression,
+                                            compression_min_bytes=0)
+                        write = best_of(args.repeat, lambda: cache.set("key", df))
+                        read = best_of(args.repeat, lambda: cache.get("key"))
+                        stored = cache.get_stats()["bytes_stored"]
+                        cache.close()
+                    yield {"benchmark": "serialization", "rows": rows, "dtypes": mix, "format": cache_format,
+                           "compression": compression, "write_seconds": write[0], "read_seconds": read[0],
+                           "stored_bytes": stored, "memory_bytes": int(df.memory_usage(deep=True).sum())}
+
+
+def bench_concurrency(args):
+    # A different literal per query: cache keys ignore comments and whitespace, so queries differing
+    # only there would be coalesced into one
+    queries = [f"{QUERY} WHERE id >= {-i}" for i in range(args.queries)]
+    for workers in args.workers:
+        with StandIn(1000, latency=args.latency), tempfile.TemporaryDirectory() as directory:
+            connector = make_connector(directory, pool_options={"pre_ping": False, "max_size": workers})
+            cold = best_of(args.repeat, lambda: connector.q_many(queries, max_workers=workers),
+                           setup=connector.clear_cache)
+            warm = best_of(args.repeat, lambda: connector.q_many(queries, max_workers=workers))
+        yield {"benchmark": "concurrency", "workers": workers, "queries": len(queries), "latency": args.latency,
+               "cold_seconds": cold[0], "warm_seconds": warm[0],
+               "cold_queries_per_second": len(queries) / cold[0], "warm_queries_per_second": len(queries) / warm[0]}
+
+
+def bench_memory(args):
+    def peak(func):
+        tracemalloc.start()
+        try:
+            func()
+            return tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+
+    for rows in args.rows:
+        with StandIn(rows), tempfile.TemporaryDirectory() as directory:
+            connector = make_connector(directory)
+            result_bytes = int(connector.q(QUERY).memory_usage(deep=True).sum())
+            warm = peak(lambda: connector.q(QUERY))
+            connector.clear_cache()
+            cold = peak(lambda: connector.q(QUERY))
+            connector.clear_cache()
+            chunksize = max(rows // 10, 1)
+            streamed = peak(lambda: sum(len(chunk) for chunk in connector.q_iter(QUERY, chunksize=chunksize)))
+        yield {"benchmark": "memory", "rows": rows, "result_bytes": result_bytes, "cold_peak_bytes": cold,
+               "warm_peak_bytes": warm, "q_iter_peak_bytes": streamed, "q_iter_chunksize": chunksize}
+
+
+BENCHMARKS = {
+    "q_latency": bench_q_latency,
+    "serialization": bench_serialization,
+    "concurrency": bench_concurrency,
+    "memory": bench_memory,
+}
+
+
+def run(args):
+    metadata = get_metadata()
+    for name in args.only or BENCHMARKS:
+        for result in BENCHMARKS[name](args):
+            result["meta"] = metadata
+            yield result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    parser.add_argument("--rows", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--queries", type=int, default=32, help="distinct queries per concurrency run")
+    parser.add_argument("--latency", type=float, default=0.02, help="simulated server seconds per query")
+    parser.add_argument("--output", help="append results to this file as well as printing them")
+    args = parser.parse_args(argv)
+    # pandas warns about DBAPI connections other than sqlite3
+    warnings.filterwarnings("ignore", "pandas only supports", UserWarning)
+
+    output = open(args.output, "a") if args.output else None
+    try:
+        for result in run(args):
+            line = json.dumps(result)
+            print(line, flush=True)
+            if output:
+                output.write(line + "\n")
+    finally:
+        if output:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""
+Compares two bench_suite.py result files. Results are matched on their parameters; each metric
+is printed with its ratio new/base, and ratios past --threshold are flagged. Exits 1 if any
+timing or memory metric regressed.
+
+    python benchmarks/compare.py base.jsonl new.jsonl --threshold 1.1
+"""
+import argparse
+import json
+import sys
+
+# Metrics where larger is better; every other metric is a cost.
+HIGHER_IS_BETTER = ("_per_second",)
+METRIC_SUFFIXES = ("_seconds", "_bytes") + HIGHER_IS_BETTER
+
+
+def is_metric(name):
+    return name.endswith(METRIC_SUFFIXES)
+
+
+def load(path):
+    results = {}
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            result = json.loads(line)
+            result.pop("meta", None)
+            params = tuple(sorted((k, json.dumps(v)) for k, v in result.items() if not is_metric(k)))
+            results[params] = {k: v for k, v in result.items() if is_metric(k)}  # the latest run wins
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("base")
+    parser.add_argument("new")
+    parser.add_argument("--threshold", type=float, default=1.1)
+    args = parser.parse_args(argv)
+
+    base, new = load(args.base), load(args.new)
+    regressed = False
+    for params in sorted(set(base) & set(new)):
+        label = " ".join(f"{k}={json.loads(v)}" for k, v in params)
+        for metric, value in new[params].items():
+            old = base[params].get(metric)
+            if not old or value is None:
+                continue
+            ratio = value / old
+            worse = ratio < 1 / args.threshold if metric.endswith(HIGHER_IS_BETTER) else ratio > args.threshold
+            better = ratio > args.threshold if metric.endswith(HIGHER_IS_BETTER) else ratio < 1 / args.threshold
+            regressed = regressed or worse
+            flag = "REGRESSED" if worse else "improved" if better else ""
+            print(f"{label:<60} {metric:<28} {old:>14.6g} {value:>14.6g} {ratio:>7.2f}x {flag}")
+    return 1 if regressed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
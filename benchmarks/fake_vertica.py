@@ -0,0 +1,104 @@
+"""
+A stand-in for a vertica_python connection, so benchmarks run without a database.
+
+Rows are held in Vertica's text wire format and converted with vertica_python's own
+deserializers on fetch, as a real text-protocol connection does, unless the cursor's
+disable_sqldata_converter is set.
+"""
+import datetime
+import decimal
+import time
+
+from vertica_python.datatypes import VerticaType
+from vertica_python.vertica.deserializer import Deserializer
+
+# (name, type_code, value for row i); every seventh value is NULL in nullable columns
+COLUMNS = [
+    ("id", VerticaType.INT8, lambda i: i),
+    ("amount", VerticaType.FLOAT8, lambda i: None if i % 7 == 0 else i * 0.5),
+    ("price", VerticaType.NUMERIC, lambda i: decimal.Decimal(i) / 100),
+    ("quantity", VerticaType.INT8, lambda i: None if i % 7 == 0 else i % 100),
+    ("is_active", VerticaType.BOOL, lambda i: i % 2 == 0),
+    ("order_date", VerticaType.DATE, lambda i: datetime.date(2023, 1, 1) + datetime.timedelta(days=i % 365)),
+    ("updated_at", VerticaType.TIMESTAMP, lambda i: datetime.datetime(2023, 1, 1, microsecond=i % 7 * 1000) + datetime.timedelta(seconds=i)),
+    ("label", VerticaType.VARCHAR, lambda i: f"label-{i % 1000}"),
+]
+
+
+def to_text(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return b't' if value else b'f'
+    return str(value).encode()
+
+
+def make_rows(n_rows, columns=COLUMNS):
+    return [tuple(to_text(value(i)) for _, _, value in columns) for i in range(n_rows)]
+
+
+class FakeColumn(tuple):
+    format_code = 0  # text
+
+    @property
+    def name(self):
+        return self[0]
+
+    @property
+    def type_code(self):
+        return self[1]
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.description = None
+        self.disable_sqldata_converter = False
+        self._position = 0
+
+    def execute(self, query, *args, **kwargs):
+        if self.connection.latency:
+            time.sleep(self.connection.latency)
+        self.description = [FakeColumn((name, type_code, None, None, None, None, True))
+                            for name, type_code, _ in self.connection.columns]
+        self._position = 0
+        return self
+
+    def get_deserializers(self):
+        context = {'unicode_error': 'strict', 'session_tz': 'UTC', 'complex_types_enabled': False}
+        return Deserializer().get_row_deserializers(self.description, {}, context)
+
+    def fetchmany(self, size=1):
+        rows = self.connection.rows[self._position:self._position + size]
+        self._position += len(rows)
+        if self.disable_sqldata_converter:
+            return rows
+        deserializers = self.get_deserializers()
+        return [tuple(convert(value) for convert, value in zip(deserializers, row)) for row in rows]
+
+    def fetchall(self):
+        return self.fetchmany(len(self.connection.rows) - self._position)
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    options = {'binary_transfer': False}
+
+    def __init__(self, rows, columns=COLUMNS, latency=0):
+        self.rows = rows
+        self.columns = columns
+        self.latency = latency  # seconds each execute takes, standing in for server time
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
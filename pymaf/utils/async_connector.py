@@ -0,0 +1,88 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from .database_connector import DatabaseConnector
+from .dbconfig import POOL_DEFAULTS, QueryTimeoutError
+from .logger import pkg_logger as logger
+
+
+class AsyncDatabaseConnector(DatabaseConnector):
+    """
+    DatabaseConnector with coroutine counterparts of its query methods, for use from an
+    asyncio event loop.
+
+    Cache lookups and database work run on threads, so the loop is never blocked. At most
+    pool max_size queries run at once; other callers wait on an asyncio semaphore rather
+    than holding a thread each, so many concurrent requests share a few connections.
+
+    Takes the same arguments as DatabaseConnector.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.max_concurrency = dict(POOL_DEFAULTS, **(self.pool_options or {}))["max_size"]
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='pymaf-query')
+        self._slots = None
+
+    async def aq(self, query, columns=None, ttl=None, stale_ttl=None, timeout=None, retries=None):
+        """
+        Coroutine version of q. Returns None and logs on failure, and raises QueryTimeoutError past
+        timeout, like q.
+
+        Cancelling the awaiting task also cancels the running query on the server (Vertica only);
+        for other backends the query finishes on its thread and the result is discarded.
+        """
+        cache_key = self._get_cache_key(query)
+
+        try:
+            with self.hooks.query(query, cache_key) as event:
+                result = await self._run_in_thread(None, self._cache_get, query, cache_key, columns, ttl, stale_ttl)
+                if result is not None:
+                    logger.debug("Returning cached query result.")
+                else:
+                    async with self._get_slots():
+                        result = await self._run_cancellable(query, cache_key, columns, ttl, stale_ttl,
+                                                             timeout, retries)
+                event.rows = len(result)
+                return result
+        except asyncio.CancelledError:
+            raise
+        except QueryTimeoutError as error:
+            logger.error("Query timed out: %s", error)
+            raise
+        except Exception as error:
+            logger.error("Error executing the query: %s", error)
+
+    async def _run_cancellable(self, query, cache_key, columns, ttl=None, stale_ttl=None, timeout=None,
+                               retries=None):
+        checked_out = []
+        load = functools.partial(self._load, query, cache_key, columns, on_connection=checked_out.append, ttl=ttl,
+                                 stale_ttl=stale_ttl, timeout=timeout)
+        try:
+            return await self._run_in_thread(self._executor, self._retry, load,
+                                             self.retries if retries is None else retries)
+        except asyncio.CancelledError:
+            if checked_out and hasattr(checked_out[-1], 'cancel'):
+                logger.debug("Query task cancelled, cancelling the query on the server.")
+                try:
+                    checked_out[-1].cancel()
+                except Exception as error:
+                    logger.warning("Could not cancel the query on the server: %s", error)
+            raise
+
+    def _get_slots(self):
+        # Created on first use so the semaphore belongs to the running loop.
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+        return self._slots
+
+    @staticmethod
+    def _run_in_thread(executor, func, *args, **kwargs):
+        loop = asyncio.get_running_loop()
+        # Runs in a copy of the task's context, so events from the thread reach the task's query trace.
+        context = contextvars.copy_context()
+        return loop.run_in_executor(executor, functools.partial(context.run, func, *args, **kwargs))
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,701 @@
+import heapq
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from .logger import pkg_logger as logger
+
+ARROW_TAG = 'arrow'
+PICKLE_TAG = 'pickle'  # pickled bytes, below the compression threshold or not worth compressing
+
+
+class ResultCache:
+    """
+    Stores query results on disk behind a diskcache index.
+
+    Args:
+        directory: Directory location. A temporary directory is used if not set.
+        timeout: SQLite connection timeout in seconds, passed on to diskcache.
+        cache_format: 'pickle' stores DataFrames with diskcache's default pickling.
+            'arrow' stores them as Arrow IPC files inside the cache directory; hits are
+            memory-mapped without copying and a column projection only reads those columns.
+        memory_limit: Byte budget of an in-process LRU tier in front of the disk. Disabled if not set.
+        size_limit: Byte budget of the disk cache. Defaults to diskcache's 1GB.
+        eviction_policy: diskcache eviction policy, e.g. 'least-recently-stored' (default),
+            'least-recently-used', 'least-frequently-used' or 'none'.
+        shards: Splits the disk cache into this many diskcache.FanoutCache shards, which lets
+            concurrent writers proceed without waiting on one SQLite lock.
+        compression: 'zstd' or 'lz4' compresses stored DataFrames, see Compressor. With the 'arrow'
+            format Arrow's own buffer compression is used, so hits are decompressed rather than
+            memory-mapped. None (default) stores them uncompressed.
+        compression_level: Codec level, e.g. 1-22 for zstd. Higher saves more space for more CPU.
+        compression_min_bytes: DataFrames smaller than this are stored uncompressed.
+    """
+    formats = ('pickle', 'arrow')
+    cull_interval = 100  # sets between sweeps of expired entries
+
+    def __init__(self, directory=None, timeout=60, cache_format='pickle', memory_limit=None, size_limit=None,
+                 eviction_policy='least-recently-stored', shards=None, compression=None, compression_level=None,
+                 compression_min_bytes=65536):
+        if cache_format not in self.formats:
+            raise NotImplementedError(f"{cache_format} is not a supported cache format. Possible options: {','.join(self.formats)}")
+        if cache_format == 'arrow':
+            try:
+                import pyarrow  # noqa: F401
+            except ImportError as e:
+                raise ImportError("cache_format='arrow' requires pyarrow: pip install pymaf[arrow]") from e
+
+        import diskcache
+
+        self.cache_format = cache_format
+        self.size_limit = size_limit or diskcache.DEFAULT_SETTINGS['size_limit']
+        # Culling is done in _cull rather than inline by diskcache, so evictions can be counted.
+        settings = {'size_limit': self.size_limit, 'eviction_policy': eviction_policy, 'cull_limit': 0}
+        if shards and shards > 1:
+            self.disk = diskcache.FanoutCache(directory=directory, shards=shards, timeout=timeout, **settings)
+        else:
+            self.disk = diskcache.Cache(directory=directory, timeout=timeout, **settings)
+        self.memory = MemoryCache(memory_limit) if memory_limit else None
+        self.compressor = Compressor(compression, compression_level, compression_min_bytes) if compression else None
+        self.stats = CacheStats()
+        self._sets = 0
+        self._table_index = None
+
+    @property
+    def directory(self):
+        return self.disk.directory
+
+    @property
+    def table_index(self):
+        """
+        The TableIndex of the tables cached results were read from, opened on first use.
+        """
+        if self._table_index is None:
+            self._table_index = TableIndex(os.path.join(self.directory, 'tables'))
+        return self._table_index
+
+    def invalidate_table(self, table):
+        """
+        Deletes every entry tagged with table, see TableIndex. Returns the number of entries.
+        """
+        keys = self.table_index.pop(table)
+        for key in keys:
+            self.delete(key)
+            self.delete(f"{key}.fresh")
+        return len(keys)
+
+    def get(self, key, default=None, columns=None):
+        """
+        Returns the cached value for key, or default on a miss.
+
+        Args:
+            columns: Optional list of columns to project a cached DataFrame onto.
+        """
+        if self.memory is not None:
+            value = self.memory.get(key)
+            if value is not None:
+                return self._project(value, columns)
+
+        value, expire_time, tag = self.disk.get(key, default=default, read=True, expire_time=True, tag=True)
+        if tag == ARROW_TAG:
+            with value:
+                value = self._read_arrow(value.name, columns)
+            if columns is not None:
+                return value
+        elif tag == PICKLE_TAG or tag in Compressor.codecs:
+            value = self._decode(value, tag)
+        elif value is default:
+            return value
+
+        if self.memory is not None:
+            self.memory.set(key, value, expire_time, copy=False)  # only the memory tier's copy is handed out
+            value = self.memory.get(key, value)
+        return self._project(value, columns)
+
+    def set(self, key, value, expire=None, stale_ttl=0):
+        """
+        Stores value under key.
+
+        Args:
+            expire: Seconds the value is fresh for. Never expires if not set.
+            stale_ttl: Seconds the value is still kept after it goes stale, so it can be served
+                while it is refreshed. See is_stale.
+        """
+        if expire is not None:
+            expire_stale = expire + (stale_ttl or 0)
+            self._store(f"{key}.fresh", time.time() + expire, expire_stale)
+            expire = expire_stale
+        self._store(key, value, expire)
+
+    def fresh_until(self, key):
+        """
+        Returns the time.time() at which the value under key goes stale, or None if it never does.
+        """
+        return self.get(f"{key}.fresh")
+
+    def is_stale(self, key):
+        fresh_until = self.fresh_until(key)
+        return fresh_until is not None and fresh_until <= time.time()
+
+    def _store(self, key, value, expire=None):
+        if self.memory is not None:
+            self.memory.set(key, value, time.time() + expire if expire is not None else None)
+
+        stored = None
+        if self.cache_format == 'arrow' and _is_frame(value):
+            import pyarrow as pa
+            try:
+                buffer = self._to_arrow(value, self.compressor)
+            except (pa.ArrowInvalid, pa.ArrowTypeError, pa.ArrowNotImplementedError) as error:
+                logger.warning("Result cannot be stored as Arrow, pickling instead: %s", error)
+            else:
+                # read=True makes diskcache keep the bytes as a file of their own, which it
+                # also removes on eviction or expiry.
+                stored = self.disk.set(key, pa.BufferReader(buffer), expire=expire, read=True, tag=ARROW_TAG)
+        elif self.compressor is not None and _is_frame(value):
+            stored = self._store_compressed(key, value, expire)
+
+        if stored is None:
+            stored = self.disk.set(key, value, expire=expire)
+        self._cull()
+        return stored
+
+    def _store_compressed(self, key, value, expire=None):
+        start = time.perf_counter()
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if len(data) < self.compressor.min_bytes:
+            return self.disk.set(key, data, expire=expire, tag=PICKLE_TAG)
+
+        compressed = self.compressor.compress(data)
+        if len(compressed) > len(data) * 0.95:
+            logger.debug("Result does not compress, storing it uncompressed.")
+            return self.disk.set(key, data, expire=expire, tag=PICKLE_TAG)
+        self.stats.record_compression(len(data), len(compressed), time.perf_counter() - start)
+        return self.disk.set(key, compressed, expire=expire, tag=self.compressor.codec)
+
+    def _decode(self, value, tag):
+        if hasattr(value, 'read'):  # diskcache hands out large values as open files with read=True
+            with value:
+                value = value.read()
+        if tag != PICKLE_TAG:
+            start = time.perf_counter()
+            value = Compressor.decompress(tag, value)
+            self.stats.record_decompression(time.perf_counter() - start)
+        return pickle.loads(value)
+
+    def _cull(self):
+        self._sets += 1
+        over_limit = self.disk.volume() > self.size_limit
+        if not over_limit and self._sets % self.cull_interval:
+            return
+        # diskcache removes keys one by one, so a result and its .fresh sidecar can go separately.
+        # Removals are worked out from the keys before and after, to drop the other half and to
+        # count results only.
+        before = set(self.disk)
+        self.disk.expire()
+        remaining = set(self.disk)
+        expired = before - remaining
+        evicted = set()
+        if over_limit:
+            self.disk.cull()
+            evicted = remaining - set(self.disk)
+        self.stats.record_removals(expired=self._drop_partners(expired), evicted=self._drop_partners(evicted))
+
+    def _drop_partners(self, removed):
+        # Deletes the result of every removed .fresh sidecar, and the sidecar of every removed
+        # result, so no result is left that looks fresh for want of its sidecar. Returns the
+        # number of results removed.
+        results = set()
+        for key in removed:
+            if isinstance(key, str) and key.endswith('.fresh'):
+                results.add(key[:-len('.fresh')])
+            elif _is_result_key(key):
+                results.add(key)
+        for key in results:
+            self.delete(key)
+            self.delete(f"{key}.fresh")
+        return len(results)
+
+    def delete(self, key):
+        if self.memory is not None:
+            self.memory.delete(key)
+        return self.disk.delete(key)
+
+    def clear(self):
+        if self.memory is not None:
+            self.memory.clear()
+        if self._table_index is not None or os.path.isdir(os.path.join(self.directory, 'tables')):
+            self.table_index.clear()
+        return self.disk.clear()
+
+    def get_stats(self):
+        """
+        Returns the counters in self.stats together with the current size of each tier.
+        """
+        stats = self.stats.snapshot()
+        entries = sum(1 for key in self.disk if _is_result_key(key))
+        stats.update(bytes_stored=self.disk.volume(), entries=entries, size_limit=self.size_limit,
+                     compression=self.compressor.codec if self.compressor is not None else None)
+        if self.memory is not None:
+            stats['memory'] = {'bytes_stored': self.memory.current_bytes, 'entries': len(self.memory),
+                               'evictions': self.memory.evictions, 'max_bytes': self.memory.max_bytes}
+        return stats
+
+    def close(self):
+        self.disk.close()
+
+    def __contains__(self, key):
+        return key in self.disk
+
+    @staticmethod
+    def _project(value, columns):
+        if columns is not None and _is_frame(value):
+            return value[list(columns)]
+        return value
+
+    def _to_arrow(self, df, compressor=None):
+        import pyarrow as pa
+
+        start = time.perf_counter()
+        table = pa.Table.from_pandas(df)
+        options = None
+        if compressor is not None and table.nbytes >= compressor.min_bytes:
+            codec = pa.Codec(compressor.codec, compression_level=compressor.level)
+            options = pa.ipc.IpcWriteOptions(compression=codec)
+        sink = pa.BufferOutputStream()
+        # Uncompressed by default, so buffers can be used straight from the memory map.
+        with pa.ipc.new_file(sink, table.schema, options=options) as writer:
+            writer.write_table(table)
+        buffer = sink.getvalue()
+        if options is not None:
+            self.stats.record_compression(table.nbytes, buffer.size, time.perf_counter() - start)
+        return buffer
+
+    @staticmethod
+    def _read_arrow(path, columns=None):
+        import pyarrow as pa
+
+        table = pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+        if columns is not None:
+            index_columns = [c for c in (table.schema.pandas_metadata or {}).get('index_columns', [])
+                             if isinstance(c, str)]
+            table = table.select(list(columns) + index_columns)
+
+        # split_blocks avoids consolidating columns into 2D blocks, which would copy them.
+        return table.to_pandas(split_blocks=True)
+
+
+class Compressor:
+    """
+    Compresses pickled cache values with zstd (zstandard package) or lz4 (lz4 package).
+
+    Args:
+        codec: 'zstd' or 'lz4'.
+        level: Compression level. Defaults to the codec's default (3 for zstd, 0 for lz4).
+        min_bytes: Values smaller than this are not worth compressing.
+    """
+    codecs = ('zstd', 'lz4')
+    packages = {'zstd': 'zstandard', 'lz4': 'lz4'}
+
+    def __init__(self, codec, level=None, min_bytes=65536):
+        if codec not in self.codecs:
+            raise NotImplementedError(f"{codec} compression is not implemented. Possible options: {','.join(self.codecs)}")
+        self._import(codec)
+        self.codec = codec
+        self.level = level
+        self.min_bytes = min_bytes
+
+    def compress(self, data):
+        if self.codec == 'zstd':
+            zstandard = self._import('zstd')
+            return zstandard.ZstdCompressor(level=3 if self.level is None else self.level).compress(data)
+        lz4_frame = self._import('lz4')
+        return lz4_frame.compress(data, compression_level=self.level or 0)
+
+    @classmethod
+    def decompress(cls, codec, data):
+        """
+        Decompresses data written with codec, whatever the cache's current codec is.
+        """
+        if codec == 'zstd':
+            return cls._import('zstd').ZstdDecompressor().decompress(data)
+        return cls._import('lz4').decompress(data)
+
+    @classmethod
+    def _import(cls, codec):
+        try:
+            if codec == 'zstd':
+                import zstandard
+                return zstandard
+            import lz4.frame
+            return lz4.frame
+        except ImportError as e:
+            raise ImportError(f"{codec} compression requires {cls.packages[codec]}: pip install pymaf[{codec}]") from e
+
+
+# Suffixes of the keys kept next to a result: freshness, refresh and single-flight locks, and
+# incremental state. A q_iter result is counted by its .chunks manifest, not its numbered chunks.
+SIDECAR_SUFFIXES = ('fresh', 'refresh', 'lock', 'state')
+
+
+def _is_result_key(key):
+    if not isinstance(key, str) or '.' not in key:
+        return True
+    suffix = key.rsplit('.', 1)[1]
+    return suffix not in SIDECAR_SUFFIXES and not suffix.isdigit()
+
+
+PRUNE_MIN_KEYS = 32  # keys of a table are first pruned at twice this many
+
+
+class TableIndex:
+    """
+    Maps tables to the keys of the cached results read from them, and keeps the last change
+    marker seen for each table, and a generation counted up each time a table is invalidated. It lives in its own diskcache without eviction, so tags are never
+    culled while their entries are kept.
+
+    Entries are indexed under the table name without its schema, so invalidating ca_ods.sales
+    also drops results read from another schema's sales: extra misses rather than stale hits.
+    """
+    def __init__(self, directory):
+        import diskcache
+
+        self.disk = diskcache.Cache(directory=directory, eviction_policy='none')
+
+    def add(self, key, tables, alive=None, generations=None):
+        """
+        Tags key with tables. Returns False, without tagging, if one of the tables was invalidated
+        since generations were read.
+
+        Args:
+            alive: Optional callable telling whether a key's entry is still cached. A table's keys
+                are pruned of the evicted and expired ones each time they double since the last prune.
+            generations: Optional dict returned by generations() before the entry was read.
+        """
+        with self.disk.transact():
+            if generations is not None and self.generations(generations) != generations:
+                return False
+            for table in tables:
+                bare = _bare_name(table)
+                keys = self.disk.get(f"keys.{bare}", set())
+                if key in keys:
+                    continue
+                keys.add(key)
+                if alive is not None and len(keys) >= 2 * self.disk.get(f"pruned.{bare}", PRUNE_MIN_KEYS):
+                    keys = {k for k in keys if k == key or alive(k)}
+                    self.disk.set(f"pruned.{bare}", max(len(keys), PRUNE_MIN_KEYS))
+                self.disk.set(f"keys.{bare}", keys)
+            known = self.disk.get('tables', set())
+            if not known.issuperset(tables):
+                self.disk.set('tables', known | set(tables))
+        return True
+
+    def pop(self, table):
+        """
+        Removes and returns the keys of the entries tagged with table, and counts up its generation.
+        """
+        with self.disk.transact():
+            self.disk.delete(f"pruned.{_bare_name(table)}")
+            self.disk.incr(f"generation.{_bare_name(table)}")
+            return self.disk.pop(f"keys.{_bare_name(table)}", set())
+
+    def generations(self, tables):
+        """
+        Returns a dict of each table to its generation. A result read while none of them changed
+        can be tagged with add; one read across an invalidation may predate the change.
+        """
+        return {table: self.disk.get(f"generation.{_bare_name(table)}", 0) for table in tables}
+
+    def tables(self):
+        """
+        Returns the names of every table tagged so far, as written in the queries.
+        """
+        return self.disk.get('tables', set())
+
+    def get_marker(self, table):
+        return self.disk.get(f"marker.{table}")
+
+    def set_marker(self, table, marker):
+        self.disk.set(f"marker.{table}", marker)
+
+    def clear(self):
+        self.disk.clear()
+
+
+def _bare_name(table):
+    return table.rsplit('.', 1)[-1]
+
+
+class MemoryCache:
+    """
+    Thread-safe in-process LRU cache with a budget in bytes, measured with
+    DataFrame.memory_usage(deep=True).
+
+    DataFrames are copied and made read-only when stored, and handed out as shallow copies, so
+    callers can add or replace columns on what they get back but cannot modify the cached values
+    in place. The frame given to set stays writable.
+
+    Args:
+        max_bytes: Budget for all entries. Least recently used entries are evicted to stay under it,
+            and values larger than the whole budget are not kept.
+    """
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (value, nbytes, expire_time)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, _, expire_time = entry
+            if expire_time is not None and expire_time <= time.time():
+                self._remove(key)
+                return default
+            self._entries.move_to_end(key)
+
+        return value.copy(deep=False) if _is_frame(value) else value
+
+    def set(self, key, value, expire_time=None, copy=True):
+        """
+        Args:
+            copy: Whether a DataFrame is copied before it is made read-only. Only pass False for a
+                frame nothing else refers to, e.g. one just read from disk.
+        """
+        nbytes = self._sizeof(value)
+        if nbytes > self.max_bytes:
+            self.delete(key)
+            return
+        if _is_frame(value):
+            value = self._freeze(value.copy(deep=True) if copy else value)
+        with self._lock:
+            self._remove(key)
+            while self.current_bytes + nbytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+            self._entries[key] = (value, nbytes, expire_time)
+            self.current_bytes += nbytes
+
+    def delete(self, key):
+        with self._lock:
+            return self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return False
+        self.current_bytes -= entry[1]
+        return True
+
+    @staticmethod
+    def _sizeof(value):
+        if _is_frame(value):
+            return int(value.memory_usage(deep=True).sum())
+        return sys.getsizeof(value)
+
+    @staticmethod
+    def _freeze(df):
+        df = df.copy(deep=False)
+        # pandas has no public API for this; blocks that are not plain ndarrays are left as they are.
+        for block in getattr(getattr(df, '_mgr', None), 'blocks', ()):
+            values = getattr(block, 'values', None)
+            if hasattr(values, 'flags'):
+                values.flags.writeable = False
+        return df
+
+
+class CacheStats:
+    """
+    Thread-safe counters for a ResultCache: hits, misses, latencies, compression and the most
+    expensive queries.
+
+    Args:
+        max_samples: Latency samples kept per kind for percentiles; older ones are dropped.
+        max_keys: Distinct keys whose query cost is tracked before the cheapest are dropped.
+    """
+    def __init__(self, max_samples=10000, max_keys=1000):
+        self.max_samples = max_samples
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expired = 0
+            self._hit_latencies = deque(maxlen=self.max_samples)
+            self._miss_latencies = deque(maxlen=self.max_samples)
+            self._key_costs = {}  # key -> [total_seconds, count, nbytes, query]
+            self.compressed_entries = 0
+            self.bytes_before_compression = 0
+            self.bytes_after_compression = 0
+            self.compress_seconds = 0.0
+            self.decompress_seconds = 0.0
+
+    def record_hit(self, seconds):
+        with self._lock:
+            self.hits += 1
+            self._hit_latencies.append(seconds)
+
+    def record_miss(self):
+        with self._lock:
+            self.misses += 1
+
+    def record_fetch(self, key, seconds, nbytes=None, query=None):
+        """
+        Records the time taken to run a missing query and store its result.
+        """
+        with self._lock:
+            self._miss_latencies.append(seconds)
+            cost = self._key_costs.setdefault(key, [0.0, 0, None, None])
+            cost[0] += seconds
+            cost[1] += 1
+            cost[2] = nbytes
+            cost[3] = query[:200] if query else None
+            if len(self._key_costs) > 2 * self.max_keys:
+                keep = heapq.nlargest(self.max_keys, self._key_costs.items(), key=lambda item: item[1][0])
+                self._key_costs = dict(keep)
+
+    def record_compression(self, raw_bytes, stored_bytes, seconds):
+        with self._lock:
+            self.compressed_entries += 1
+            self.bytes_before_compression += raw_bytes
+            self.bytes_after_compression += stored_bytes
+            self.compress_seconds += seconds
+
+    def record_decompression(self, seconds):
+        with self._lock:
+            self.decompress_seconds += seconds
+
+    def record_removals(self, expired=0, evicted=0):
+        with self._lock:
+            self.expired += expired
+            self.evictions += evicted
+
+    def snapshot(self, top=10):
+        with self._lock:
+            lookups = self.hits + self.misses
+            expensive = heapq.nlargest(top, self._key_costs.items(), key=lambda item: item[1][0])
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': self.hits / lookups if lookups else None,
+                'evictions': self.evictions,
+                'expired': self.expired,
+                'hit_latency_p50': _percentile(self._hit_latencies, 50),
+                'hit_latency_p99': _percentile(self._hit_latencies, 99),
+                'miss_latency_p50': _percentile(self._miss_latencies, 50),
+                'miss_latency_p99': _percentile(self._miss_latencies, 99),
+                'compressed_entries': self.compressed_entries,
+                'compression_ratio': (self.bytes_before_compression / self.bytes_after_compression
+                                      if self.bytes_after_compression else None),
+                'compress_seconds': self.compress_seconds,
+                'decompress_seconds': self.decompress_seconds,
+                'expensive_keys': [{'key': key, 'total_seconds': total, 'count': count, 'bytes': nbytes, 'query': query}
+                                   for key, (total, count, nbytes, query) in expensive],
+            }
+
+
+def _percentile(samples, percent):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(int(round(percent / 100 * len(ordered))) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+class SingleFlight:
+    """
+    Lets one caller load a missing cache entry while concurrent callers for the same key wait
+    for it instead of running the same query. Works across threads, and across processes
+    that share the cache directory through a lock entry in the cache.
+
+    Args:
+        cache: ResultCache that loaded results are published to.
+        timeout: Seconds a waiting caller waits before loading the value itself.
+        lock_expire: Seconds after which the lock of a crashed process is dropped.
+    """
+    def __init__(self, cache, timeout=60, lock_expire=900):
+        self.cache = cache
+        self.timeout = timeout
+        self.lock_expire = lock_expire
+        self._calls = {}
+        self._lock = threading.Lock()
+
+    def do(self, key, load, columns=None):
+        """
+        Returns the result of load(), which is expected to store it in the cache under key.
+        Callers that wait on another one read the result back from the cache.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = Future()
+
+        if not leader:
+            try:
+                call.result(timeout=self.timeout)
+            except FutureTimeoutError:
+                logger.warning("Timed out waiting for an identical query, running it directly.")
+                return load()
+            result = self.cache.get(key, columns=columns)
+            return result if result is not None else load()
+
+        try:
+            result = self._load_across_processes(key, load, columns)
+            call.set_result(None)
+            return result
+        except BaseException as error:
+            call.set_exception(error)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+    def _load_across_processes(self, key, load, columns):
+        lock_key = f"{key}.lock"
+        deadline = time.monotonic() + self.timeout
+        delay = 0.01
+
+        # add() only succeeds if the key is absent, which makes it an atomic lock across processes.
+        while not self.cache.disk.add(lock_key, os.getpid(), expire=self.lock_expire):
+            result = self.cache.get(key, columns=columns)
+            if result is not None:
+                logger.debug("Identical query finished in another process, returning its result.")
+                return result
+            if time.monotonic() >= deadline:
+                logger.warning("Timed out waiting for an identical query in another process, running it directly.")
+                return load()
+            time.sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+        try:
+            # Another process may have filled the entry between our miss and taking the lock.
+            result = self.cache.get(key, columns=columns)
+            return result if result is not None else load()
+        finally:
+            self.cache.disk.delete(lock_key)
+
+
+def _is_frame(value):
+    # A DataFrame can only exist once pandas has been imported, so this check never imports it.
+    pd = sys.modules.get('pandas')
+    return pd is not None and isinstance(value, pd.DataFrame)
@@ -0,0 +1,202 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+from .logger import pkg_logger as logger
+
+EVENTS = ('query_start', 'query_end', 'cache_hit', 'cache_miss', 'checkout', 'fetch', 'serialize')
+
+# The query being traced in the current thread or task, so its phases can be attached to it.
+_current_query = contextvars.ContextVar('pymaf_current_query', default=None)
+
+
+class QueryEvent:
+    """
+    Something that happened to a query. Fields that are unknown for an event are None.
+
+    Attributes:
+        name: One of EVENTS. checkout (waiting for a pooled connection), fetch (running the query and
+            reading the result) and serialize (writing it to the cache) are the phases of a cache miss.
+        query, cache_key: The query and its cache key.
+        started_at: Epoch seconds the event started.
+        seconds: Duration. For query_end, the whole call; for cache_hit and cache_miss, the lookup.
+        rows: Rows in the result.
+        nbytes: Size of the result in memory, known when it is written to the cache.
+        error: Exception raised, if any.
+        phases: For query_end, the phase events of the query in order.
+    """
+    def __init__(self, name, query=None, cache_key=None, started_at=None, seconds=None, rows=None,
+                 nbytes=None, error=None):
+        self.name = name
+        self.query = query
+        self.cache_key = cache_key
+        self.started_at = started_at
+        self.seconds = seconds
+        self.rows = rows
+        self.nbytes = nbytes
+        self.error = error
+        self.phases = []
+
+    def phase_seconds(self):
+        """
+        Returns the total seconds spent in each phase, e.g. {'checkout': 0.01, 'fetch': 2.5}.
+        """
+        totals = {}
+        for phase in self.phases:
+            totals[phase.name] = totals.get(phase.name, 0) + phase.seconds
+        return totals
+
+    def __repr__(self):
+        return f"QueryEvent({self.name}, cache_key={self.cache_key}, seconds={self.seconds}, rows={self.rows})"
+
+
+class Hooks:
+    """
+    Dispatches QueryEvents to subscribed callbacks. Callbacks run synchronously on the thread that
+    ran the query, so they should be quick; an exception in a callback is logged and ignored.
+    """
+    def __init__(self):
+        self._callbacks = []
+
+    def subscribe(self, callback, events=None):
+        """
+        Calls callback(event) for each event, or only for the event names in events.
+        Returns callback, so it can be used as a decorator.
+        """
+        self._callbacks = self._callbacks + [(callback, frozenset(events) if events else None)]
+        return callback
+
+    def unsubscribe(self, callback):
+        self._callbacks = [(cb, events) for cb, events in self._callbacks if cb is not callback]
+
+    def emit(self, event):
+        for callback, events in self._callbacks:
+            if events is None or event.name in events:
+                try:
+                    callback(event)
+                except Exception as error:
+                    logger.warning("Error in a query event callback: %s", error)
+
+    @contextmanager
+    def query(self, query, cache_key):
+        """
+        Emits query_start, then query_end with the phases recorded while the block runs. The block
+        can set rows and nbytes on the yielded event.
+        """
+        event = QueryEvent('query_end', query, cache_key, started_at=time.time())
+        if self._callbacks:
+            self.emit(QueryEvent('query_start', query, cache_key, started_at=event.started_at))
+        token = _current_query.set(event)
+        start = time.perf_counter()
+        try:
+            yield event
+        except BaseException as error:
+            event.error = error
+            raise
+        finally:
+            _current_query.reset(token)
+            event.seconds = time.perf_counter() - start
+            if event.nbytes is None:
+                event.nbytes = next((phase.nbytes for phase in event.phases if phase.nbytes is not None), None)
+            if self._callbacks:
+                self.emit(event)
+
+    def record(self, name, start, query=None, cache_key=None, rows=None, nbytes=None, error=None):
+        """
+        Emits a phase or cache event that began at start (a time.perf_counter() value) and ended now,
+        and attaches it to the query being traced, if any.
+        """
+        seconds = time.perf_counter() - start
+        current = _current_query.get()
+        if not self._callbacks and current is None:
+            return
+        event = QueryEvent(name, query, cache_key, started_at=time.time() - seconds, seconds=seconds,
+                           rows=rows, nbytes=nbytes, error=error)
+        if current is not None and name not in ('query_start', 'query_end'):
+            current.phases.append(event)
+        self.emit(event)
+
+    @contextmanager
+    def phase(self, name, query=None, cache_key=None):
+        """
+        Records the block as a phase event. The block can set rows and nbytes on the yielded dict.
+        """
+        fields = {}
+        start = time.perf_counter()
+        error = None
+        try:
+            yield fields
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self.record(name, start, query, cache_key, error=error, **fields)
+
+
+class SlowQueryLog:
+    """
+    Hook that logs a warning, with the time spent in each phase, for queries slower than threshold.
+
+    Args:
+        threshold: Seconds above which a query is logged.
+        max_query_length: Characters of the query text to include.
+    """
+    def __init__(self, threshold=1.0, max_query_length=200):
+        self.threshold = threshold
+        self.max_query_length = max_query_length
+
+    def __call__(self, event):
+        if event.name != 'query_end' or event.seconds < self.threshold:
+            return
+        phases = ", ".join("{} {:.3f}s".format(name, seconds) for name, seconds in event.phase_seconds().items())
+        query = " ".join((event.query or "").split())[:self.max_query_length]
+        logger.warning("Slow query %s took %.3fs%s, %s rows: %s",
+                       event.cache_key, event.seconds, f" ({phases})" if phases else "", event.rows, query)
+
+
+class OpenTelemetryHooks:
+    """
+    Hook that turns each query into an OpenTelemetry span, with one child span per phase. Spans are
+    created when the query ends, with their recorded start and end times. Needs opentelemetry-api.
+
+    Args:
+        tracer: Tracer to use. Defaults to the global tracer provider's tracer for pymaf.
+    """
+    def __init__(self, tracer=None):
+        try:
+            from opentelemetry import trace
+        except ImportError as e:
+            raise ImportError("OpenTelemetryHooks requires opentelemetry-api: pip install pymaf[otel]") from e
+
+        self._trace = trace
+        self.tracer = tracer or trace.get_tracer('pymaf')
+
+    def __call__(self, event):
+        if event.name != 'query_end':
+            return
+        span = self.tracer.start_span('pymaf.query', start_time=_ns(event.started_at),
+                                      attributes=self._attributes(event, {'db.statement': event.query or ''}))
+        context = self._trace.set_span_in_context(span)
+        for phase in event.phases:
+            child = self.tracer.start_span(f'pymaf.{phase.name}', context=context, start_time=_ns(phase.started_at),
+                                           attributes=self._attributes(phase, {}))
+            self._end(child, phase)
+        self._end(span, event)
+
+    def _end(self, span, event):
+        if event.error is not None:
+            span.record_exception(event.error)
+            span.set_status(self._trace.Status(self._trace.StatusCode.ERROR, str(event.error)))
+        span.end(end_time=_ns(event.started_at + event.seconds))
+
+    @staticmethod
+    def _attributes(event, attributes):
+        for name in ('cache_key', 'rows', 'nbytes'):
+            value = getattr(event, name)
+            if value is not None:
+                attributes[f'pymaf.{name}'] = value
+        return attributes
+
+
+def _ns(seconds):
+    return int(seconds * 1e9)
@@ -1,13 +1,30 @@
 import os
+import threading
+import time
 
 import hvac
 # from hvac import exceptions
 
+from .logger import pkg_logger as logger
+
+# Process-wide caches, shared by every Vault instance so repeated connectors do not log in again.
+# _lock only guards the dicts: calls to Vault are made without it, so a slow Vault never blocks
+# lookups of cached leases.
+_lock = threading.RLock()
+_tokens = {}   # (url, user) -> _Lease of an authenticated hvac.Client
+_secrets = {}  # (url, user, path) -> _Lease of the secret's data
+_login_locks = {}  # (url, user) -> Lock held while logging in, so concurrent callers log in once
+
+RENEW_AT = 2 / 3  # Fraction of a token or lease TTL after which it is renewed in the background
+
+
 class Vault:
-    def __init__(self, vault="secret/data/jupyterhub-development/config"):
+    def __init__(self, vault="secret/data/jupyterhub-development/config", credential_ttl=300):
         """
         Args:
             vault: (str) Location of credentials on path
+            credential_ttl: Seconds credentials without a Vault lease (e.g. KV secrets) are reused
+                before they are read again.
         """
         env_key = "DEVELOPER_ENVIRONMENT"
         environment = os.environ.get(env_key, "SANDBOX")
@@ -21,6 +38,7 @@ class Vault:
         self.password_key = f"{self.environment}_PASSWORD"
 
         self.credential_path = vault
+        self.credential_ttl = credential_ttl
 
     def _get_vault_env_credentials(self):
         """
@@ -41,43 +59,202 @@ class Vault:
 
     def get_client(self, auth_method="userpass"):
         """
-        Creates an authenticated vault client.
+        Returns an authenticated vault client. The client is shared process-wide per URL and user:
+        it logs in once, and its token is renewed in the background before it expires.
 
         Args:
             auth_method: defaults to username & password.
         """
-        try:
-            credentials = self._get_vault_env_credentials()
-            self.client = hvac.Client(url=credentials["url"])
-            if auth_method == "userpass":
-                self.client.auth.userpass.login(
-                    username=credentials["user"], password=credentials["password"]
-                )
-            else:
-                raise NotImplementedError(
-                    f"Authentication with {auth_method} is not implemented"
-                )
-
-            return self.client
-        except (hvac.exceptions.Forbidden,
-                hvac.exceptions.Unauthorized,
-                hvac.exceptions.InternalServerError,
-                hvac.exceptions.InvalidRequest) as e:
-            raise VaultCustomException(str(e))
+        if auth_method != "userpass":
+            raise NotImplementedError(
+                f"Authentication with {auth_method} is not implemented"
+            )
+
+        credentials = self._get_vault_env_credentials()
+        key = (credentials["url"], credentials["user"])
+        with _lock:
+            lease = _tokens.get(key)
+        if lease is None or not lease.valid():
+            with _login_lock(key):
+                with _lock:
+                    lease = _tokens.get(key)
+                if lease is None or not lease.valid():
+                    lease = _login(key, credentials)
+        self.client = lease.value
+        return self.client
 
     def _get_credentials(self):
         """
-        Get credentials from the path provided by the user
+        Get credentials from the path provided by the user. They are cached process-wide for the
+        secret's lease duration, or credential_ttl when it has none.
         """
-        response = self.get_client().read(self.credential_path)
+        credentials = self._get_vault_env_credentials()
+        key = (credentials["url"], credentials["user"], self.credential_path)
+        with _lock:
+            lease = _secrets.get(key)
+            if lease is not None and lease.valid():
+                return dict(lease.value)
+
+        response = self._read(self.credential_path)
+        if response is None:
+            raise VaultCustomException(f"No secret found at {self.credential_path}")
+        data = response
         if 'data' in response and response['data'] is not None:
-            response = response['data']['data']
+            data = response['data']['data']
 
-        return response
+        # Only dynamic secrets carry a real lease; KV lease durations are advisory.
+        lease_id = response.get('lease_id')
+        ttl = response.get('lease_duration') if lease_id else self.credential_ttl
+        lease = _Lease(data, ttl, response.get('renewable'), lease_id)
+        with _lock:
+            _replace(_secrets, key, lease)
+            if lease.lease_id and lease.renewable:
+                _schedule(lease, _renew_secret, key, self.client)
+        return dict(data)
+
+    def _read(self, path):
+        """
+        Reads path, logging in again once if Vault rejects the cached token (e.g. it was revoked).
+        """
+        for attempt in range(2):
+            client = self.get_client()
+            try:
+                return client.read(path)
+            except (hvac.exceptions.Forbidden, hvac.exceptions.Unauthorized) as e:
+                if attempt:
+                    raise VaultCustomException(str(e))
+                logger.debug("Vault rejected the cached token, logging in again.")
+                credentials = self._get_vault_env_credentials()
+                key = (credentials["url"], credentials["user"])
+                with _lock:
+                    lease = _tokens.get(key)
+                    if lease is not None and lease.value is client:
+                        _replace(_tokens, key, None)
+            except (hvac.exceptions.InternalServerError, hvac.exceptions.InvalidRequest) as e:
+                raise VaultCustomException(str(e))
 
     def get_vertica_credentials(self):
         response = self._get_credentials()
         return {k.replace('VERTICA_', '').lower(): v for k, v in response.items()}
-    
+
+
+def clear_vault_cache():
+    """
+    Forgets every cached Vault token and secret and stops their background renewals,
+    e.g. after rotating credentials.
+    """
+    with _lock:
+        for cache in (_tokens, _secrets):
+            for key in list(cache):
+                _replace(cache, key, None)
+
+
+class _Lease:
+    """
+    A cached value with the TTL Vault granted it. ttl of 0 or None never expires.
+    """
+    def __init__(self, value, ttl, renewable=False, lease_id=None):
+        self.value = value
+        self.renewable = bool(renewable)
+        self.lease_id = lease_id
+        self.timer = None
+        self.extend(ttl)
+
+    def extend(self, ttl):
+        self.ttl = ttl
+        self.expires_at = time.monotonic() + ttl if ttl else None
+
+    def valid(self, margin=5):
+        return self.expires_at is None or self.expires_at - time.monotonic() > margin
+
+
+def _login(key, credentials):
+    try:
+        client = hvac.Client(url=credentials["url"])
+        response = client.auth.userpass.login(
+            username=credentials["user"], password=credentials["password"]
+        )
+    except (hvac.exceptions.Forbidden,
+            hvac.exceptions.Unauthorized,
+            hvac.exceptions.InternalServerError,
+            hvac.exceptions.InvalidRequest) as e:
+        raise VaultCustomException(str(e))
+
+    auth = (response or {}).get('auth') or {}
+    lease = _Lease(client, auth.get('lease_duration'), auth.get('renewable'))
+    logger.debug("Logged in to Vault, token valid for %ss.", lease.ttl)
+    with _lock:
+        _replace(_tokens, key, lease)
+        _schedule(lease, _renew_token, key, credentials)
+    return lease
+
+
+def _login_lock(key):
+    with _lock:
+        return _login_locks.setdefault(key, threading.Lock())
+
+
+def _renew_token(key, credentials):
+    with _lock:
+        lease = _tokens.get(key)
+    if lease is None:
+        return
+    try:
+        if lease.renewable:
+            response = lease.value.auth.token.renew_self()
+            with _lock:
+                if _tokens.get(key) is not lease:  # replaced or cleared while renewing
+                    return
+                lease.extend(response['auth']['lease_duration'])
+                _schedule(lease, _renew_token, key, credentials)
+            logger.debug("Renewed Vault token for another %ss.", lease.ttl)
+        else:
+            with _login_lock(key):
+                _login(key, credentials)
+    except Exception as error:
+        # The next call logs in again.
+        logger.warning("Could not renew the Vault token: %s", error)
+        with _lock:
+            if _tokens.get(key) is lease:
+                _replace(_tokens, key, None)
+
+
+def _renew_secret(key, client):
+    with _lock:
+        lease = _secrets.get(key)
+    if lease is None:
+        return
+    try:
+        response = client.sys.renew_lease(lease.lease_id)
+        with _lock:
+            if _secrets.get(key) is not lease:  # replaced or cleared while renewing
+                return
+            lease.extend(response['lease_duration'])
+            _schedule(lease, _renew_secret, key, client)
+        logger.debug("Renewed Vault lease for another %ss.", lease.ttl)
+    except Exception as error:
+        # The next call reads the secret again.
+        logger.warning("Could not renew the Vault lease: %s", error)
+        with _lock:
+            if _secrets.get(key) is lease:
+                _replace(_secrets, key, None)
+
+
+def _schedule(lease, renew, *args):
+    if not lease.ttl:
+        return
+    lease.timer = threading.Timer(lease.ttl * RENEW_AT, renew, args)
+    lease.timer.daemon = True
+    lease.timer.start()
+
+
+def _replace(cache, key, lease):
+    old = cache.pop(key, None)
+    if old is not None and old.timer is not None and old is not lease:
+        old.timer.cancel()
+    if lease is not None:
+        cache[key] = lease
+
+
 class VaultCustomException(Exception):
-    pass
\ No newline at end of file
+    pass
@@ -17,6 +17,16 @@ setup(
         'hvac==1.1.1',
         'diskcache'
     ],
+    extras_require={
+        'arrow': ['pyarrow'],
+        'otel': ['opentelemetry-api'],
+        'zstd': ['zstandard'],
+        'lz4': ['lz4'],
+        'cli': ['PyYAML'],
+    },
+    entry_points={
+        'console_scripts': ['pymaf = pymaf.utils.cli:main'],
+    },
     # classifiers=[
     #     'Development Status :: 3 - Alpha',
     #     'Intended Audience :: Developers',
@@ -0,0 +1,138 @@
+"""
+Command line interface of pymaf.
+
+    pymaf warm manifest.yaml [--workers 8] [--force] [--only daily_sales ...] [--json]
+
+A manifest names connections, given as DatabaseConnector arguments, and the queries to keep warm
+in their caches. Strings may refer to environment variables as ${NAME}, to keep secrets out of it:
+
+    connections:
+      vertica:
+        db_type: vertica
+        connection_info: {host: vertica.internal, port: 5433, user: etl, password: "${VERTICA_PASSWORD}"}
+        cache_directory: /var/cache/pymaf
+        cache_timeout: 3600
+    queries:
+      - name: daily_sales
+        connection: vertica
+        sql: SELECT * FROM ca_ods.daily_sales
+        ttl: 21600
+        stale_ttl: 3600
+      - name: store_sales
+        connection: vertica
+        sql: SELECT * FROM ca_ods.daily_sales WHERE store_id = :store_id
+        params: {store_id: 42}
+
+Manifests ending in .json are read as JSON, others as YAML (needs PyYAML).
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .logger import pkg_logger as logger
+
+
+def load_manifest(path):
+    with open(path) as f:
+        if path.endswith('.json'):
+            manifest = json.load(f)
+        else:
+            try:
+                import yaml
+            except ImportError as e:
+                raise ImportError("YAML manifests require PyYAML: pip install pymaf[cli]") from e
+            manifest = yaml.safe_load(f)
+    return _expand_vars(manifest or {})
+
+
+def _expand_vars(value):
+    if isinstance(value, str):
+        return os.path.expandvars(value)
+    if isinstance(value, dict):
+        return {k: _expand_vars(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_expand_vars(v) for v in value]
+    return value
+
+
+def warm(manifest, max_workers=4, force=False, only=None, loglevel='WARNING'):
+    """
+    Runs the manifest's queries whose cached results are missing or stale, in parallel, and
+    stores them in their connection's cache. Safe to run from cron: queries that another process
+    is already refreshing are skipped.
+
+    Returns one dict per query with name, status (fresh, warmed, busy or failed), seconds, rows and error.
+    """
+    from .database_connector import DatabaseConnector
+
+    queries = [query for query in manifest.get('queries', []) if not only or query['name'] in only]
+    connectors = {}
+    for query in queries:
+        name = query['connection']
+        if name not in connectors:
+            options = dict(manifest['connections'][name])
+            options.setdefault('loglevel', loglevel)
+            connectors[name] = DatabaseConnector(**options)
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='pymaf-warm') as executor:
+        futures = [executor.submit(_warm_query, connectors[query['connection']], query, force) for query in queries]
+        return [future.result() for future in futures]
+
+
+def _warm_query(connector, query, force=False):
+    sql = query['sql']
+    cache_key = connector._get_cache_key(sql, query.get('params'))
+    report = {'name': query['name'], 'cache_key': cache_key, 'status': None, 'seconds': 0.0, 'rows': None,
+              'error': None}
+
+    if not force and cache_key in connector.cache and not connector.cache.is_stale(cache_key):
+        report['status'] = 'fresh'
+        return report
+
+    # Shares the lock of background refreshes, so overlapping runs never run a query twice.
+    lock_key = f"{cache_key}.refresh"
+    if not connector.cache.disk.add(lock_key, os.getpid(), expire=900):
+        report['status'] = 'busy'
+        return report
+
+    start = time.perf_counter()
+    try:
+        result = connector._fetch(sql, cache_key, ttl=query.get('ttl'), stale_ttl=query.get('stale_ttl'),
+                                  params=query.get('params'))
+        report.update(status='warmed', rows=len(result))
+    except Exception as error:
+        logger.error("Error warming %s: %s", query['name'], error)
+        report.update(status='failed', error=str(error))
+    finally:
+        connector.cache.disk.delete(lock_key)
+        report['seconds'] = time.perf_counter() - start
+    return report
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='pymaf', description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest='command', required=True)
+    warm_parser = commands.add_parser('warm', help="populate the cache with the queries of a manifest")
+    warm_parser.add_argument('manifest')
+    warm_parser.add_argument('--workers', type=int, default=4, help="queries run at once (default 4)")
+    warm_parser.add_argument('--force', action='store_true', help="also re-run queries that are still fresh")
+    warm_parser.add_argument('--only', nargs='+', help="names of the queries to warm")
+    warm_parser.add_argument('--json', action='store_true', help="print one JSON line per query")
+    warm_parser.add_argument('--log-level', default='WARNING')
+    args = parser.parse_args(argv)
+
+    reports = warm(load_manifest(args.manifest), args.workers, args.force, args.only, args.log_level)
+    for report in reports:
+        if args.json:
+            print(json.dumps(report))
+        else:
+            rows = '' if report['rows'] is None else f"{report['rows']} rows"
+            print(f"{report['name']:<40} {report['status']:<7} {report['seconds']:>9.3f}s {rows}")
+    return 1 if any(report['status'] == 'failed' for report in reports) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
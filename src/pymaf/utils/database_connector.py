@@ -1,10 +1,24 @@
+import functools
 import hashlib
+import json
+import numbers
+import os
+import random
+import re
+import shutil
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import ExitStack, contextmanager
 
-import pandas as pd
-import diskcache
-
-from .dbconfig import verticaConnection, sqlAlchemyDbConnection
+from .cache import ResultCache, SingleFlight
+from .dbconfig import (get_shared_engine, checkout_timeout, POOL_DEFAULTS, PoolTimeoutError, QueryTimeoutError,
+                       _is_connection_error)
+from .events import Hooks, SlowQueryLog
 from .logger import pkg_logger as logger
+from .refresh import RefreshScheduler
+from .sql import normalize_sql, quote_literal, referenced_tables
 
 
 class DatabaseConnector:
@@ -16,14 +30,78 @@ class DatabaseConnector:
         db_type: Option to select a database connection - vertica,postgres,mysql. Else raises Error.
         connection_info: Python dictionary containing host,user,password and port. Is ignored if auth_backend is set to Vault.
         auth_backend: Ignored if passing authentication details in connection info. Else, use 'vault'.
-        cache_timeout: timeouts in seconds
+        loglevel: Sets the level of the package logger, e.g. 'DEBUG'. Left at WARNING by default, see
+            logger.configure_logging for the console and an optional log file.
+        cache_timeout: Seconds a cached result stays fresh, unless a call or ttl_rules says otherwise.
+            None keeps results until they are evicted.
         cache_directory: Directory location
+        cache_format: 'pickle' (default) or 'arrow' for memory-mapped columnar results. See ResultCache.
+        memory_cache_bytes: Byte budget of an in-process LRU cache in front of the disk cache. Results
+            served from it are read-only; copy them before modifying values in place.
+        cache_size_limit: Byte budget of the disk cache. Defaults to 1GB.
+        eviction_policy: How the disk cache makes room, see diskcache. Defaults to 'least-recently-stored'.
+        cache_shards: Number of diskcache.FanoutCache shards for the disk cache, for many concurrent writers.
+        cache_compression: 'zstd' or 'lz4' compresses cached results, trading CPU for disk space and read
+            bandwidth. cache_compression_level and cache_compression_min_bytes tune it, see ResultCache.
+        pool_options: Connection pool settings (min_size, max_size, timeout, recycle, pre_ping, and for
+            Vertica clusters load_balance and eject_seconds, see dbconfig.hostBalancer).
+            Connectors with the same connection_info and pool_options share one pool.
+        single_flight_timeout: Seconds a cache miss waits for an identical query that is already
+            running, in this or another process sharing cache_directory, before running it directly.
+            None disables single-flight.
+        ttl_rules: Optional dict of regex pattern to TTL in seconds. The first pattern found in a query
+            sets its TTL in place of cache_timeout.
+        stale_ttl: Seconds a result is still served after its TTL, while it is refreshed in the background.
+        fetch_engine: 'pandas' (default) reads results with pd.read_sql. 'columnar' reads Vertica results
+            straight into typed NumPy columns, see fetch.read_vertica. It is much faster on large results;
+            integer and boolean columns with NULLs come back as nullable Int64/boolean rather than float/object.
+        fetch_decimal: How NUMERIC columns are returned, by either engine. 'float' (default) converts them
+            to float64, which rounds values beyond about 15 significant digits; 'object' keeps exact Decimals.
+        slow_query_threshold: Logs a warning, with a breakdown by phase, for queries slower than this many
+            seconds. Other instrumentation subscribes to self.hooks, see events.Hooks.
+        query_timeout: Default deadline in seconds of every query run on the database. Past it the
+            query is cancelled on the server (Vertica or psycopg2 cancel) and QueryTimeoutError
+            is raised; waiting for a pooled connection counts against it. None (default) lets
+            queries run until they finish.
+        retries: Times q retries a query that timed out or lost its connection, waiting
+            retry_backoff seconds, doubled on each attempt and jittered, in between.
     """
-    def __init__(self, db_type, auth_backend=None, connection_info={}, loglevel='DEBUG', cache_directory=None, cache_timeout=3600):
+    def __init__(self, db_type, auth_backend=None, connection_info={}, loglevel=None, cache_directory=None, cache_timeout=3600,
+                 cache_format='pickle', memory_cache_bytes=None, cache_size_limit=None,
+                 eviction_policy='least-recently-stored', cache_shards=None, cache_compression=None,
+                 cache_compression_level=None, cache_compression_min_bytes=65536, pool_options=None, single_flight_timeout=60,
+                 ttl_rules=None, stale_ttl=0, fetch_engine='pandas', slow_query_threshold=None, query_timeout=None,
+                 retries=0, retry_backoff=1.0, fetch_decimal='float'):
         self.db_type = db_type
+        if fetch_engine not in ('pandas', 'columnar'):
+            raise NotImplementedError(f"{fetch_engine} is not a supported fetch engine. Possible options: pandas,columnar")
+        self.fetch_engine = fetch_engine
+        if fetch_decimal not in ('object', 'float'):
+            raise NotImplementedError(f"{fetch_decimal} is not a supported fetch_decimal. Possible options: object,float")
+        self.fetch_decimal = fetch_decimal
+        self.pool_options = pool_options
         self.cache_enabled = True  # Flag to enable/disable caching
-        self.cache = diskcache.Cache(directory=cache_directory if cache_directory else None,
-                                    timeout=cache_timeout)
+        self.cache = ResultCache(directory=cache_directory if cache_directory else None,
+                                 cache_format=cache_format, memory_limit=memory_cache_bytes, size_limit=cache_size_limit,
+                                 eviction_policy=eviction_policy, shards=cache_shards, compression=cache_compression,
+                                 compression_level=cache_compression_level,
+                                 compression_min_bytes=cache_compression_min_bytes)
+        self.cache_timeout = cache_timeout
+        self.ttl_rules = [(re.compile(pattern, re.IGNORECASE), ttl) for pattern, ttl in (ttl_rules or {}).items()]
+        self.stale_ttl = stale_ttl
+        self.query_timeout = query_timeout
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.refresh_scheduler = RefreshScheduler(self)
+        self.table_watcher = None
+        self._refreshing = set()
+        self._refresh_lock = threading.Lock()
+        self._refresh_executor = None
+        self._increment_locks = {}
+        self.single_flight = SingleFlight(self.cache, timeout=single_flight_timeout) if single_flight_timeout is not None else None
+        self.hooks = Hooks()
+        if slow_query_threshold is not None:
+            self.hooks.subscribe(SlowQueryLog(slow_query_threshold), events=('query_end',))
 
         if loglevel:
             logger.setLevel(level=loglevel.upper())
@@ -31,52 +109,846 @@ class DatabaseConnector:
         if not connection_info and auth_backend != 'vault':
             raise TypeError("If Vault backend is not used, connection_info argument is expected.")
         
+        # Vault credentials and the connection pool are only fetched when a query needs the database,
+        # so results served from the cache never wait on them.
+        self.auth_backend = auth_backend
+        self._connection_info = connection_info if auth_backend != 'vault' else None
+        self._dbengine = None
+
+    @property
+    def connection_info(self):
         # chooses connection parameters based on auth-backend
-        if auth_backend == 'vault':
+        if self._connection_info is None:
             from .vault import Vault
-            self.connection_info = Vault().get_vertica_credentials()
-        elif connection_info:
-            self.connection_info = connection_info
-        
-        self.dbengine = None
-        self.dbengine = self.connect()  # Placeholder for the database connection
-        
+            self._connection_info = Vault().get_vertica_credentials()
+        return self._connection_info
+
+    @property
+    def dbengine(self):
+        """
+        The shared connection pool, opened on first use.
+        """
+        return self.connect()
+
     def connect(self):
-        if self.dbengine is None:
-            if self.db_type == 'vertica':
-                self.dbengine = verticaConnection(self.connection_info).connect()
-            else:
-                self.dbengine = sqlAlchemyDbConnection(self.connection_info).connect()
+        """
+        Returns the connection pool for this connector: a verticaConnectionPool for Vertica,
+        otherwise a SQLAlchemy engine.
+        """
+        if self._dbengine is None:
+            self._dbengine = get_shared_engine(self.db_type, self.connection_info, self.pool_options)
 
-        return self.dbengine
+        return self._dbengine
 
-    def q(self, query):
-        cache_key = self._get_cache_key(query)
+    @contextmanager
+    def _connection(self, query=None, cache_key=None, deadline=None):
+        """
+        Yields something pd.read_sql can run a query on, checked out from the pool.
+
+        Args:
+            deadline: Optional _Deadline of the query. Waiting for a connection counts against it,
+                and raises QueryTimeoutError once it passes.
+        """
+        start = time.perf_counter()
+        remaining = deadline.remaining() if deadline is not None else None
+        with ExitStack() as stack:
+            try:
+                if self.db_type == 'vertica':
+                    connection = stack.enter_context(self.dbengine.connection(
+                        timeout=min(remaining, self.dbengine.timeout) if remaining is not None else None))
+                else:
+                    with checkout_timeout(remaining):
+                        connection = stack.enter_context(self.dbengine.connect())
+            except Exception as error:
+                if remaining is not None and deadline.remaining() <= 0 and _is_pool_timeout(error):
+                    raise QueryTimeoutError(f"No connection available within the {deadline.seconds}s deadline.") from error
+                raise
+            self.hooks.record('checkout', start, query, cache_key)
+            try:
+                yield connection
+            except QueryTimeoutError:
+                if self.db_type != 'vertica':
+                    # A cancel landing late would hit the next query on this backend, so close it.
+                    connection.invalidate()
+                raise
+
+    def q(self, query, columns=None, ttl=None, stale_ttl=None, cache_only=False, lazy=False, params=None,
+          timeout=None, retries=None):
+        """
+        Runs a query and returns the result as a DataFrame, served from cache when available.
+        A cached result is returned without connecting to the database.
+
+        Args:
+            query: SQL query to run.
+            columns: Optional list of columns to return. With the 'arrow' cache format only
+                these columns are read from a cached result.
+            ttl: Seconds the result stays fresh, overriding ttl_rules and cache_timeout.
+            stale_ttl: Overrides the connector's stale_ttl for this query.
+            cache_only: Returns the cached result, even a stale one, or None, and never connects.
+            lazy: Returns a lazy.LazyResult instead of a DataFrame, for results larger than memory.
+                Rows are spilled to a Parquet file in the cache directory as they stream in, and
+                the file is reused as the cached result until ttl. Needs pyarrow.
+            params: Values bound to the query's placeholders by the database driver, e.g. a dict
+                for :name placeholders. They are part of the cache key, so one query text serves
+                every set of values.
+            timeout: Deadline in seconds, overriding query_timeout. A query past it is cancelled on
+                the server and raises QueryTimeoutError; other errors are logged and return None.
+            retries: Overrides the connector's retries for this call.
+        """
+        cache_key = self._get_cache_key(query, params)
+        if lazy:
+            return self._q_lazy(query, cache_key, columns, ttl, cache_only, params)
         
         try:
-            result = self.cache.get(cache_key)
-            if self.cache_enabled and result is not None:
-                logger.debug("Returning cached query result.")
+            with self.hooks.query(query, cache_key) as event:
+                result = self._cache_get(query, cache_key, columns, ttl, stale_ttl, refresh=not cache_only,
+                                         params=params)
+                if result is not None:
+                    logger.debug("Returning cached query result.")
+                elif not cache_only:
+                    load = functools.partial(self._load, query, cache_key, columns, ttl=ttl, stale_ttl=stale_ttl,
+                                             params=params, timeout=timeout)
+                    result = self._retry(load, self.retries if retries is None else retries)
+                event.rows = len(result) if result is not None else None
                 return result
+        except QueryTimeoutError as error:
+            logger.error("Query timed out: %s", error)
+            raise
+        except Exception as error:
+            logger.error("Error executing the query: %s", error)
             
-            result = pd.read_sql(query, self.dbengine)
-            logger.debug("Query executed successfully!")
 
+    def q_many(self, queries, max_workers=None, columns=None, ttl=None, stale_ttl=None):
+        """
+        Runs independent queries concurrently and returns their results in input order.
+
+        Cache hits are answered straight away, identical queries run once, and the rest run
+        on a thread pool with one pooled connection per worker. Unlike q, a failed query does
+        not hide behind None: its position in the returned list holds the exception.
+
+        Args:
+            queries: Iterable of SQL queries.
+            max_workers: Number of worker threads. Defaults to the connection pool's max_size.
+            columns: Optional list of columns to return from every result.
+            ttl, stale_ttl: As in q, for every query.
+        """
+        queries = list(queries)
+        cache_keys = [self._get_cache_key(query) for query in queries]
+        results = {}
+        pending = {}
+
+        for query, cache_key in zip(queries, cache_keys):
+            if cache_key in results or cache_key in pending:
+                continue
+            try:
+                result = self._cache_get(query, cache_key, columns, ttl, stale_ttl)
+            except Exception as error:
+                result = None
+                logger.warning("Cache lookup failed, querying the database: %s", error)
+            if result is not None:
+                results[cache_key] = result
+            else:
+                pending[cache_key] = query
+        logger.debug("q_many: %s cached, %s to run.", len(results), len(pending))
+
+        if pending:
+            max_workers = max_workers or dict(POOL_DEFAULTS, **(self.pool_options or {}))["max_size"]
+            with ThreadPoolExecutor(max_workers=min(max_workers, len(pending))) as executor:
+                futures = {executor.submit(self._traced_load, query, cache_key, columns, ttl=ttl, stale_ttl=stale_ttl): cache_key
+                           for cache_key, query in pending.items()}
+                for future in as_completed(futures):
+                    cache_key = futures[future]
+                    try:
+                        results[cache_key] = future.result()
+                    except Exception as error:
+                        logger.error("Error executing the query: %s", error)
+                        results[cache_key] = error
+
+        return [results[cache_key] for cache_key in cache_keys]
+
+    def _cache_get(self, query, cache_key, columns=None, ttl=None, stale_ttl=None, refresh=True, params=None):
+        """
+        Returns the cached result or None. A stale result is still returned, and refreshed in the
+        background unless refresh is False.
+        """
+        if not self.cache_enabled:
+            return None
+
+        start = time.perf_counter()
+        result = self.cache.get(cache_key, columns=columns)
+        if result is None:
+            self.cache.stats.record_miss()
+            self.hooks.record('cache_miss', start, query, cache_key)
+        else:
+            self.cache.stats.record_hit(time.perf_counter() - start)
+            self.hooks.record('cache_hit', start, query, cache_key, rows=len(result))
+
+        stale_ttl = self.stale_ttl if stale_ttl is None else stale_ttl
+        if refresh and result is not None and stale_ttl and self.cache.is_stale(cache_key):
+            logger.debug("Returning stale cached result, refreshing it in the background.")
+            self._refresh_in_background(query, cache_key, ttl, stale_ttl, params)
+        return result
+
+    def _load(self, query, cache_key, columns=None, on_connection=None, ttl=None, stale_ttl=None, params=None,
+              timeout=None):
+        """
+        Fetches a missing result, coalescing identical concurrent misses when caching is on.
+        """
+        fetch = functools.partial(self._fetch, query, cache_key, columns, on_connection=on_connection,
+                                  ttl=ttl, stale_ttl=stale_ttl, params=params, timeout=timeout)
+        if self.single_flight is None or not self.cache_enabled:
+            return fetch()
+        return self.single_flight.do(cache_key, fetch, columns)
+
+    def _retry(self, func, retries):
+        """
+        Calls func, retrying up to retries times on timeouts and connection errors with jittered
+        exponential backoff.
+        """
+        for attempt in range(retries + 1):
+            try:
+                return func()
+            except Exception as error:
+                retryable = isinstance(error, (QueryTimeoutError, PoolTimeoutError)) or _is_connection_error(error)
+                if attempt == retries or not retryable:
+                    raise
+                delay = self.retry_backoff * 2 ** attempt * random.uniform(0.5, 1)
+                logger.warning("Query attempt %s failed, retrying in %.2fs: %s", attempt + 1, delay, error)
+                time.sleep(delay)
+
+    def _traced_load(self, query, cache_key, columns=None, ttl=None, stale_ttl=None):
+        """
+        _load wrapped in query_start and query_end events, for queries run on worker threads.
+        """
+        with self.hooks.query(query, cache_key) as event:
+            result = self._load(query, cache_key, columns, ttl=ttl, stale_ttl=stale_ttl)
+            event.rows = len(result)
+            return result
+
+    def _fetch(self, query, cache_key, columns=None, on_connection=None, ttl=None, stale_ttl=None, params=None,
+               timeout=None):
+        """
+        Runs query on a pooled connection and caches the result. Errors are raised.
+
+        Args:
+            on_connection: Optional callable given the checked-out connection before the query
+                runs, e.g. to keep a handle for cancelling it from another thread.
+            timeout: Deadline in seconds, defaults to query_timeout.
+        """
+        timeout = self.query_timeout if timeout is None else timeout
+        deadline = _Deadline(timeout, self._canceller) if timeout else None
+        generations = self._table_generations(query)
+        start = time.perf_counter()
+        with self._connection(query, cache_key, deadline) as connection:
+            if on_connection is not None:
+                on_connection(connection)
+            with self.hooks.phase('fetch', query, cache_key) as fetched:
+                if deadline is None:
+                    result = self._read_sql(query, connection, params=params)
+                else:
+                    with deadline.watch(connection):
+                        result = self._read_sql(query, connection, params=params)
+                fetched['rows'] = len(result)
+        logger.debug("Query executed successfully!")
+
+        if self.cache_enabled:
+            nbytes = int(result.memory_usage(deep=True).sum())
+            with self.hooks.phase('serialize', query, cache_key) as serialized:
+                serialized['nbytes'] = nbytes
+                self.cache.set(cache_key, result, expire=self._get_ttl(query, ttl),
+                               stale_ttl=self.stale_ttl if stale_ttl is None else stale_ttl)
+            self._tag_tables(cache_key, generations)
+            self.cache.stats.record_fetch(cache_key, time.perf_counter() - start, nbytes, query)
+
+        return result[list(columns)] if columns is not None else result
+
+    def _canceller(self, connection):
+        """
+        Returns a callable that cancels the query running on connection from another thread.
+        """
+        if self.db_type != 'vertica':
+            connection = connection.connection.dbapi_connection  # the DBAPI connection of a SQLAlchemy one
+        # DBAPI connections that can be cancelled from another thread: vertica_python's and psycopg2's
+        # cancel, which needs no second pooled connection, and sqlite3's interrupt
+        cancel = getattr(connection, 'cancel', None) or getattr(connection, 'interrupt', None)
+        if cancel is None:
+            raise NotImplementedError(f"Query timeouts are not implemented for {self.db_type}. Possible options: vertica,postgresql")
+        return cancel
+
+    def _read_sql(self, query, connection, chunksize=None, params=None):
+        """
+        Reads a query result with the configured fetch engine. Returns an iterator of
+        DataFrames when chunksize is set. params are bound by the driver: vertica_python for
+        Vertica, SQLAlchemy (with :name placeholders) otherwise.
+        """
+        if self.fetch_engine == 'columnar' and self.db_type == 'vertica':
+            from .fetch import read_vertica, iter_vertica
+
+            if chunksize is not None:
+                return iter_vertica(query, connection, batch_size=chunksize, decimal=self.fetch_decimal, params=params)
+            return read_vertica(query, connection, decimal=self.fetch_decimal, params=params)
+        import pandas as pd
+
+        if params is not None and self.db_type != 'vertica':
+            from sqlalchemy import text
+
+            query = text(query)
+        return pd.read_sql(query, connection, chunksize=chunksize, params=params,
+                           coerce_float=self.fetch_decimal == 'float')
+
+    def _get_ttl(self, query, ttl=None):
+        if ttl is not None:
+            return ttl
+        for pattern, rule_ttl in self.ttl_rules:
+            if pattern.search(query):
+                return rule_ttl
+        return self.cache_timeout
+
+    def _refresh_in_background(self, query, cache_key, ttl=None, stale_ttl=None, params=None):
+        with self._refresh_lock:
+            if cache_key in self._refreshing:
+                return
+            self._refreshing.add(cache_key)
+            if self._refresh_executor is None:
+                self._refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='pymaf-refresh')
+        self._refresh_executor.submit(self._refresh, query, cache_key, ttl, stale_ttl, params)
+
+    def _refresh(self, query, cache_key, ttl=None, stale_ttl=None, params=None):
+        lock_key = f"{cache_key}.refresh"
+        try:
+            # Skip if another process sharing the cache directory is already refreshing this entry.
+            if not self.cache.disk.add(lock_key, os.getpid(), expire=900):
+                return
+            try:
+                self._fetch(query, cache_key, ttl=ttl, stale_ttl=stale_ttl, params=params)
+                logger.debug("Refreshed cached query %s.", cache_key)
+            finally:
+                self.cache.disk.delete(lock_key)
+        except Exception as error:
+            logger.error("Error refreshing the cached query: %s", error)
+        finally:
+            with self._refresh_lock:
+                self._refreshing.discard(cache_key)
+
+    def schedule_refresh(self, query, ttl=None, stale_ttl=None, lead_time=60):
+        """
+        Keeps a hot query's cached result warm by refreshing it lead_time seconds before it goes
+        stale. Takes effect once start_refresh_scheduler is called.
+        """
+        self.refresh_scheduler.register(query, ttl, stale_ttl, lead_time)
+
+    def unschedule_refresh(self, query):
+        self.refresh_scheduler.unregister(query)
+
+    def start_refresh_scheduler(self, interval=30):
+        self.refresh_scheduler.interval = interval
+        self.refresh_scheduler.start()
+
+    def stop_refresh_scheduler(self):
+        self.refresh_scheduler.stop()
+
+    def _table_generations(self, query):
+        """
+        Returns the invalidation generations of the tables query reads, taken before it runs.
+        """
+        tables = referenced_tables(query) if self.cache_enabled else []
+        return self.cache.table_index.generations(tables) if tables else {}
+
+    def _tag_tables(self, cache_key, generations):
+        """
+        Tags cache_key with the tables of generations. If one was invalidated while the query ran,
+        the result may predate the change and would never be invalidated again, so it is dropped.
+        """
+        if generations and not self.cache.table_index.add(cache_key, list(generations), alive=self.cache.__contains__,
+                                                           generations=generations):
+            logger.debug("A table changed while the query ran, not caching its result.")
+            self.cache.delete(cache_key)
+            self.cache.delete(f"{cache_key}.fresh")
+
+    def invalidate(self, table=None, query=None, params=None):
+        """
+        Drops cached results: those read from table, and/or the result of query with params.
+        Tables match on their name without schema, so 'ca_ods.sales' also drops results of
+        other schemas' sales tables. Returns the number of entries dropped.
+        """
+        count = 0
+        if table is not None:
+            count += self.cache.invalidate_table(table.lower() if '"' not in table else table.replace('"', ''))
+        if query is not None:
+            cache_key = self._get_cache_key(query, params)
+            for key in (cache_key, f"{cache_key}.chunks", f"{cache_key}.spill"):
+                if self.cache.delete(key):
+                    count += 1
+                self.cache.delete(f"{key}.fresh")
+        logger.debug("Invalidated %s cached results.", count)
+        return count
+
+    def start_table_watcher(self, interval=60, markers=None):
+        """
+        Starts invalidating cached results when a table they were read from changes, polling a
+        change marker of every such table each interval seconds. See invalidation.TableWatcher.
+        """
+        from .invalidation import TableWatcher
+
+        if self.table_watcher is None:
+            self.table_watcher = TableWatcher(self, interval, markers)
+        self.table_watcher.interval = interval
+        self.table_watcher.start()
+
+    def stop_table_watcher(self):
+        if self.table_watcher is not None:
+            self.table_watcher.stop()
+
+    def q_iter(self, query, chunksize=100000, params=None):
+        """
+        Streams a query result as DataFrame chunks instead of building one frame,
+        so peak memory stays near a single chunk.
+
+        Rows are read from a server-side cursor. When caching is enabled every chunk is
+        written to the cache as it arrives, and a completed stream is replayed chunk by
+        chunk on the next call.
+
+        Args:
+            query: SQL query to run.
+            chunksize: Maximum number of rows in each yielded DataFrame.
+            params: Values bound to the query's placeholders, as in q.
+        """
+        cache_key = self._get_cache_key(query, params)
+        manifest_key = f"{cache_key}.chunks"
+        ttl = self._get_ttl(query)
+
+        n_chunks = self.cache.get(manifest_key) if self.cache_enabled else None
+        if n_chunks is not None and all(f"{cache_key}.{i}" in self.cache for i in range(n_chunks)):
+            logger.debug("Streaming cached query result.")
+            for i in range(n_chunks):
+                yield self.cache.get(f"{cache_key}.{i}")
+            return
+
+        try:
+            n_chunks = 0
+            generations = self._table_generations(query)
+            with self._stream_connection() as connection:
+                for chunk in self._read_sql(query, connection, chunksize=chunksize, params=params):
+                    if self.cache_enabled:
+                        self.cache.set(f"{cache_key}.{n_chunks}", chunk, expire=ttl)
+                    n_chunks += 1
+                    yield chunk
+            logger.debug("Query streamed successfully in %s chunks!", n_chunks)
+
+            # Only a fully consumed stream is marked as replayable.
             if self.cache_enabled:
-                self.cache.set(cache_key, result)
+                self.cache.set(manifest_key, n_chunks, expire=ttl)
+                self._tag_tables(manifest_key, generations)
+        except Exception as error:
+            logger.error("Error streaming the query: %s", error)
+            raise
+
+    def _q_lazy(self, query, cache_key, columns=None, ttl=None, cache_only=False, params=None):
+        from .lazy import LazyResult, spill
 
+        spill_key = f"{cache_key}.spill"
+        directory = self._spill_directory()
+        with self.hooks.query(query, cache_key) as event:
+            name = self.cache.get(spill_key) if self.cache_enabled else None
+            if name is not None and os.path.exists(os.path.join(directory, name)):
+                logger.debug("Returning spilled query result.")
+            elif cache_only:
+                return None
+            else:
+                try:
+                    generations = self._table_generations(query)
+                    with self._stream_connection() as connection:
+                        chunks = self._read_sql(query, connection, chunksize=100000, params=params)
+                        name = spill(chunks, directory, cache_key)
+                except Exception as error:
+                    logger.error("Error spilling the query: %s", error)
+                    raise
+                logger.debug("Query spilled successfully to %s!", name)
+                if self.cache_enabled:
+                    self._sweep_spills(keep=name)
+                    self.cache.set(spill_key, name, expire=self._get_ttl(query, ttl))
+                    self._tag_tables(spill_key, generations)
+
+            result = LazyResult(os.path.join(directory, name), columns)
+            event.rows = len(result)
+            return result
+
+    def _spill_directory(self):
+        return os.path.join(self.cache.directory, 'spill')
+
+    def _sweep_spills(self, keep):
+        """
+        Deletes spilled files that no cache entry refers to anymore, e.g. once their entry expired.
+        """
+        for name in os.listdir(self._spill_directory()):
+            if name == keep or name.endswith('.tmp'):
+                continue
+            if self.cache.get(f"{name.split('-')[0]}.spill") != name:
+                try:
+                    os.remove(os.path.join(self._spill_directory(), name))
+                except OSError:
+                    pass
+
+    @contextmanager
+    def _stream_connection(self):
+        """
+        Yields a connection that fetches rows lazily from the server.
+        vertica_python cursors already read from the socket on demand, whereas
+        SQLAlchemy needs `stream_results` to avoid buffering the whole result client-side.
+        """
+        if self.db_type == 'vertica':
+            with self.dbengine.connection() as connection:
+                yield connection
+        else:
+            with self.dbengine.connect().execution_options(stream_results=True) as connection:
+                yield connection
+
+    def q_incremental(self, query, watermark_column, ttl=None, lookback=None):
+        """
+        Runs a query over an append-only table and caches the result, then on later calls only
+        fetches rows whose watermark_column is at or past the highest value already cached, and
+        appends them to the cached result. Refresh cost scales with new rows rather than all rows.
+
+        Rows at the watermark itself are fetched again and replace the cached ones, so rows that
+        arrive late with the same value are not lost or duplicated.
+
+        Args:
+            query: SQL query without a watermark filter, e.g. SELECT * FROM sales. It is wrapped in
+                a subquery that filters on watermark_column.
+            watermark_column: Column that only grows for new rows, e.g. an id or a load timestamp.
+            ttl: Seconds before the cached result is topped up again, overriding ttl_rules and cache_timeout.
+            lookback: Also re-fetches rows up to this far before the watermark (a number, or a
+                timedelta for timestamp columns), for tables where rows can arrive out of order.
+        """
+        cache_key = f"{self._get_cache_key(query)}.incremental"
+        try:
+            result = self._cached_increment(query, cache_key, ttl)
+            if result is not None:
+                logger.debug("Returning cached incremental result.")
+                return result
+
+            with self._increment_locks.setdefault(cache_key, threading.Lock()):
+                # Another thread may have topped up the result while this one waited.
+                result = self._cached_increment(query, cache_key, ttl)
+                if result is None:
+                    result = self._fetch_increment(query, cache_key, watermark_column, lookback)
             return result
         except Exception as error:
-            logger.error("Error executing the query: {}".format(error))
-            
+            logger.error("Error running the incremental query: %s", error)
+            raise
+
+    def _cached_increment(self, query, cache_key, ttl):
+        if not self.cache_enabled:
+            return None
+        state = self.cache.get(f"{cache_key}.state")
+        ttl = self._get_ttl(query, ttl)
+        if state is None or (ttl is not None and time.time() - state["checked_at"] >= ttl):
+            return None
+        return self.cache.get(cache_key)
+
+    def _fetch_increment(self, query, cache_key, watermark_column, lookback=None):
+        import pandas as pd
+
+        state = self.cache.get(f"{cache_key}.state") if self.cache_enabled else None
+        cached = self.cache.get(cache_key) if state is not None else None
+        watermark = state["watermark"] if state is not None else None
+
+        if cached is None or watermark is None:
+            fetch_query = query
+        else:
+            cutoff = watermark - lookback if lookback else watermark
+            fetch_query = f"SELECT * FROM ({query}) pymaf_increment WHERE {watermark_column} >= {quote_literal(cutoff)}"
+
+        start = time.perf_counter()
+        with self._connection(fetch_query, cache_key) as connection:
+            with self.hooks.phase('fetch', fetch_query, cache_key) as fetched:
+                fetched_rows = self._read_sql(fetch_query, connection)
+                fetched['rows'] = len(fetched_rows)
+
+        if fetch_query is query:
+            result = fetched_rows
+        else:
+            logger.debug("Fetched %s new rows past watermark %s.", len(fetched_rows), watermark)
+            result = pd.concat([cached[cached[watermark_column] < cutoff], fetched_rows], ignore_index=True)
+
+        latest = result[watermark_column].max() if len(result) else None
+        if self.cache_enabled:
+            nbytes = int(result.memory_usage(deep=True).sum())
+            with self.hooks.phase('serialize', query, cache_key) as serialized:
+                serialized['nbytes'] = nbytes
+                # The cached prefix never expires on its own; the state entry decides when to top it up.
+                self.cache.set(cache_key, result)
+                self.cache.set(f"{cache_key}.state", {"watermark": None if pd.isna(latest) else latest,
+                                                      "checked_at": time.time()})
+            self.cache.stats.record_fetch(cache_key, time.perf_counter() - start, nbytes, query)
+        return result
+
+    def q_range(self, query, start, end, freq='D', column=None, max_workers=None, ttl=None, closed_ttl=30 * 24 * 3600):
+        """
+        Runs a query over a time range as one cached query per partition (e.g. per day) and
+        concatenates them, so any range reuses the partitions already cached and only fetches
+        the missing ones. Missing partitions run concurrently, as in q_many.
+
+        Args:
+            query: Query with {start} and {end} placeholders, filled with each partition's bounds
+                as timestamp literals, e.g. SELECT * FROM sales WHERE sold_at >= {start} AND sold_at < {end}.
+            start, end: Range to return, end excluded. Anything pd.Timestamp accepts.
+            freq: Partition size as a pandas period frequency, e.g. 'D', 'h', 'M'.
+            column: Timestamp column to trim rows outside [start, end) when the range does not
+                fall on partition bounds.
+            max_workers: As in q_many.
+            ttl: TTL of partitions that are not over yet, as in q.
+            closed_ttl: TTL of partitions that ended before now, which are assumed complete.
+        """
+        import pandas as pd
+
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        now = pd.Timestamp.now(tz=start.tz)
+        closed, open_ = [], []
+        for period in pd.period_range(start, end - pd.Timedelta(1, 'ns'), freq=freq):
+            lower, upper = period.start_time, (period + 1).start_time
+            if start.tz is not None:
+                lower, upper = lower.tz_localize(start.tz), upper.tz_localize(start.tz)
+            partition = query.replace("{start}", quote_literal(lower)).replace("{end}", quote_literal(upper))
+            (closed if upper <= now else open_).append(partition)
+        logger.debug("q_range: %s closed and %s open partitions.", len(closed), len(open_))
+
+        results = self.q_many(closed, max_workers, ttl=closed_ttl) + self.q_many(open_, max_workers, ttl=ttl)
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            raise errors[0]
+
+        result = pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+        if column is not None and len(result):
+            values = result[column]
+            if not pd.api.types.is_datetime64_any_dtype(values):
+                values = pd.to_datetime(values)
+            result = result[(values >= start) & (values < end)].reset_index(drop=True)
+        return result
+
+    def q_partitioned(self, query, partition_column, num_partitions, lower_bound=None, upper_bound=None,
+                      method='range', max_workers=None, stream=False, ttl=None):
+        """
+        Splits one large query into num_partitions queries on disjoint predicates over partition_column,
+        runs them concurrently on pooled connections and concatenates their results, like Spark's
+        partitioned JDBC read. Each partition is cached on its own, so after a failure only the
+        failed partitions run again on the next call.
+
+        Args:
+            query: SQL query to split. It is wrapped in a subquery per partition.
+            partition_column: Column the partition predicates filter on.
+            num_partitions: Number of partition queries.
+            lower_bound, upper_bound: method='range' only. Values of partition_column that set the
+                partition strides; rows outside them still land in the first or last partition.
+                Read with MIN/MAX from the query when not set.
+            method: 'range' splits a numeric or timestamp column into equal strides. 'hash' splits on
+                HASH(column) modulo num_partitions (Vertica), 'mod' on an integer column modulo num_partitions.
+            max_workers: Number of worker threads. Defaults to the connection pool's max_size.
+            stream: Returns an iterator over the partition results, in partition order, instead of
+                one concatenated DataFrame.
+            ttl: As in q, for every partition.
+        """
+        import pandas as pd
+
+        if method not in ('range', 'hash', 'mod'):
+            raise NotImplementedError(f"{method} partitioning is not implemented. Possible options: range,hash,mod")
+        if method == 'range':
+            if lower_bound is None or upper_bound is None:
+                bounds = self._get_bounds(query, partition_column, ttl)
+                lower_bound = bounds[0] if lower_bound is None else lower_bound
+                upper_bound = bounds[1] if upper_bound is None else upper_bound
+            predicates = _range_predicates(partition_column, lower_bound, upper_bound, num_partitions)
+        else:
+            expression = f"HASH({partition_column})" if method == 'hash' else f"ABS({partition_column})"
+            predicates = [f"{expression} % {num_partitions} = {i}" for i in range(num_partitions)]
+            predicates[0] = f"{partition_column} IS NULL OR {predicates[0]}"
+
+        queries = [query if predicate is None else f"SELECT * FROM ({query}) pymaf_partition WHERE {predicate}"
+                   for predicate in predicates]
+        logger.debug("q_partitioned: running %s partitions.", len(queries))
+        results = self._iter_partitions(queries, max_workers, ttl)
+        if stream:
+            return results
+        return pd.concat(list(results), ignore_index=True)
+
+    def _get_bounds(self, query, column, ttl=None):
+        bounds = self.q_many([f"SELECT MIN({column}) AS lower_bound, MAX({column}) AS upper_bound "
+                              f"FROM ({query}) pymaf_bounds"], ttl=ttl)[0]
+        if isinstance(bounds, Exception):
+            raise bounds
+        return bounds.iloc[0, 0], bounds.iloc[0, 1]
+
+    def _iter_partitions(self, queries, max_workers=None, ttl=None):
+        """
+        Yields the result of each query in order while later ones still run. Every partition runs
+        to completion, and is cached, even if an earlier one failed.
+        """
+        max_workers = max_workers or dict(POOL_DEFAULTS, **(self.pool_options or {}))["max_size"]
+        with ThreadPoolExecutor(max_workers=min(max_workers, len(queries)), thread_name_prefix='pymaf-partition') as executor:
+            futures = [executor.submit(self._q_partition, query, ttl) for query in queries]
+            for future in futures:
+                yield future.result()
+
+    def _q_partition(self, query, ttl=None):
+        cache_key = self._get_cache_key(query)
+        result = self._cache_get(query, cache_key, ttl=ttl)
+        return result if result is not None else self._traced_load(query, cache_key, ttl=ttl)
+
+    def load(self, df, table, chunksize=100000, compress=None, rejected_table=None, reject_max=None):
+        """
+        Bulk loads a DataFrame into an existing table with COPY ... FROM STDIN, far faster than
+        row-by-row inserts. The frame is encoded to CSV chunksize rows at a time while the server
+        reads it, so memory stays near one encoded chunk on top of df itself.
+
+        Supported for Vertica and PostgreSQL (psycopg2). The load is committed when it finishes.
 
-    def _get_cache_key(self, query):
-        return hashlib.md5(query.encode()).hexdigest()
+        Args:
+            df: DataFrame whose columns match columns of table by name.
+            table: Target table, optionally schema-qualified.
+            chunksize: Rows encoded at a time.
+            compress: 'gzip' compresses the stream on the client (Vertica only).
+            rejected_table: Vertica only. Keeps rows that fail to parse, with the reason, in this table.
+            reject_max: Vertica only. Aborts the load once more rows than this are rejected.
+
+        Returns a dict with rows_loaded, rows_rejected and bytes_sent (before compression).
+        """
+        from .loader import copy_vertica, copy_postgres
+
+        try:
+            if self.db_type == 'vertica':
+                with self.dbengine.connection() as connection:
+                    return copy_vertica(connection, df, table, chunksize, compress, rejected_table, reject_max)
+            if self.db_type == 'postgresql':
+                if compress or rejected_table or reject_max is not None:
+                    raise NotImplementedError("compress, rejected_table and reject_max are only supported for Vertica.")
+                connection = self.dbengine.raw_connection()
+                try:
+                    return copy_postgres(connection, df, table, chunksize)
+                finally:
+                    connection.close()
+            raise NotImplementedError(f"Bulk load is not implemented for {self.db_type}. Possible options: vertica,postgresql")
+        except Exception as error:
+            logger.error("Error loading into %s: %s", table, error)
+            raise
+
+    def _get_cache_key(self, query, params=None):
+        """
+        Keys a result on the normalized query text, its bound params and the database it runs
+        on, so layout and comments do not matter and connectors to different databases or users
+        can share a cache directory.
+        """
+        fingerprint = json.dumps([self._connection_identity(), normalize_sql(query), params],
+                                 sort_keys=True, default=str)
+        return hashlib.md5(fingerprint.encode()).hexdigest()
+
+    def _connection_identity(self):
+        # Vault credentials are identified by their environment, so computing a key never reads them.
+        if self.auth_backend == 'vault':
+            return [self.db_type, 'vault', os.environ.get("DEVELOPER_ENVIRONMENT", "SANDBOX")]
+        return [self.db_type] + [self._connection_info.get(k) for k in ('host', 'port', 'database', 'user')]
     
     # Enable/disable cache functionality
     def toggle_cache(self):
         self.cache_enabled = not self.cache_enabled
-        logger.info("Caching enabled: {}".format(self.cache_enabled))
+        logger.info("Caching enabled: %s", self.cache_enabled)
 
     def clear_cache(self):
-        self.cache.clear()
\ No newline at end of file
+        self.cache.clear()
+        shutil.rmtree(self._spill_directory(), ignore_errors=True)
+
+    def cache_stats(self):
+        """
+        Returns cache counters since the connector was created or reset_cache_stats was called:
+        hits, misses, hit_ratio, evictions, expired, p50/p99 latencies in seconds for hits and
+        misses (running and storing the query), the most expensive keys by total query time,
+        plus the current bytes_stored and entry count of the cache.
+        """
+        return self.cache.get_stats()
+
+    def reset_cache_stats(self):
+        self.cache.stats.reset()
+
+
+class _Deadline:
+    """
+    Cancels the query running in a watch block once seconds have passed since the deadline was
+    created, and turns the resulting error into QueryTimeoutError.
+
+    Args:
+        seconds: Time allowed, including waiting for a connection.
+        get_cancel: Callable given the connection, returning a callable that cancels its query.
+    """
+    def __init__(self, seconds, get_cancel):
+        self.seconds = seconds
+        self.expires_at = time.monotonic() + seconds
+        self.expired = False
+        self._get_cancel = get_cancel
+        self._done = False
+        self._lock = threading.Lock()
+
+    def remaining(self):
+        return self.expires_at - time.monotonic()
+
+    @contextmanager
+    def watch(self, connection):
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise QueryTimeoutError(f"Deadline of {self.seconds}s passed before the query started.")
+        timer = threading.Timer(remaining, self._expire, args=(self._get_cancel(connection),))
+        timer.daemon = True
+        timer.start()
+        try:
+            yield
+        except Exception as error:
+            self._finish(timer)
+            if self.expired:
+                raise QueryTimeoutError(f"Query cancelled after its {self.seconds}s deadline.") from error
+            raise
+        self._finish(timer)
+        if self.expired:
+            # Cancelled just as it finished: the connection may still receive the cancel, so drop it.
+            raise QueryTimeoutError(f"Query cancelled after its {self.seconds}s deadline.")
+
+    def _finish(self, timer):
+        timer.cancel()
+        with self._lock:
+            self._done = True
+
+    def _expire(self, cancel):
+        with self._lock:
+            if self._done:
+                return
+            self.expired = True
+        logger.debug("Query past its %ss deadline, cancelling it on the server.", self.seconds)
+        try:
+            cancel()
+        except Exception as error:
+            logger.warning("Could not cancel the query on the server: %s", error)
+
+
+def _is_pool_timeout(error):
+    if isinstance(error, PoolTimeoutError):
+        return True
+    exc = sys.modules.get('sqlalchemy.exc')
+    return exc is not None and isinstance(error, exc.TimeoutError)
+
+
+def _range_predicates(column, lower, upper, num_partitions):
+    """
+    Returns num_partitions predicates splitting [lower, upper] into equal strides. The first one also
+    takes NULLs and values below lower, the last one values above upper. None means no filter.
+    """
+    import pandas as pd
+
+    if pd.isna(lower) or pd.isna(upper) or num_partitions < 2 or lower == upper:
+        return [None]
+    integral = isinstance(lower, numbers.Integral) and isinstance(upper, numbers.Integral)
+    span = upper - lower
+    bounds = [lower + (span * i // num_partitions if integral else span * i / num_partitions)
+              for i in range(1, num_partitions)]
+    bounds = [quote_literal(bound) for bound in sorted(set(bounds))]
+
+    predicates = [f"{column} < {bounds[0]} OR {column} IS NULL"]
+    predicates += [f"{column} >= {low} AND {column} < {high}" for low, high in zip(bounds, bounds[1:])]
+    predicates.append(f"{column} >= {bounds[-1]}")
+    return predicates
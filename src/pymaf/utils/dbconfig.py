@@ -1,4 +1,7 @@
-import pandas as pd
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 
 from .logger import pkg_logger as logger
 
@@ -16,28 +19,455 @@ class verticaConnection():
 class sqlAlchemyDbConnection():
     """
     Manages connections to databases supported by core sqlalchemy package.
+
+    Args:
+        pool_options: Optional pool settings, see verticaConnectionPool. They are mapped onto
+            the engine's QueuePool (pool_size, max_overflow, pool_timeout, pool_recycle, pool_pre_ping).
     """
-    def __init__(self, db_type, connection_info):
+    def __init__(self, db_type, connection_info, pool_options=None):
         self.connection_info = connection_info
+        self.pool_options = pool_options or {}
         dialect = {
             "postgresql": "postgresql",
             "mysql": "mysql+pymysql"
         }
-        
+
         connection_prefix = dialect[db_type]
         if not connection_prefix:
             raise NotImplementedError(f"{db_type} is not implemented. Possible options: {','.join(dialect.keys())}")
-        
-        connection_info.update({'dialect': dialect.get(db_type)})
+
+        connection_info = dict(connection_info, dialect=dialect.get(db_type))
         self.connection_string = "{dialect}://{user}:{password}@{host}:{port}/{database}".format(**connection_info)
-        logger.debug(f"Connection string : {self.connection_string}")
+        logger.debug("Connection string : %s", self.connection_string)
 
     def connect(self):
         try:
             from sqlalchemy import create_engine
-            self.db_engine = create_engine(self.connection_string)
+            self.db_engine = create_engine(self.connection_string, **self._engine_pool_kwargs())
             return self.db_engine
         except (ConnectionError) as e:
             # logger.error("Error executing the query: {}".format(error))
             raise(e)
 
+    def _engine_pool_kwargs(self):
+        options = dict(POOL_DEFAULTS, **self.pool_options)
+        return {
+            "poolclass": _deadline_queue_pool(),
+            "pool_size": options["min_size"],
+            "max_overflow": max(options["max_size"] - options["min_size"], 0),
+            "pool_timeout": options["timeout"],
+            "pool_recycle": options["recycle"],
+            "pool_pre_ping": options["pre_ping"],
+        }
+
+
+_checkout = threading.local()
+_deadline_pool_class = None
+
+
+def _deadline_queue_pool():
+    """
+    Returns a QueuePool subclass whose checkouts wait at most checkout_timeout's seconds, when
+    that is shorter than the pool's own timeout.
+    """
+    global _deadline_pool_class
+    if _deadline_pool_class is None:
+        from sqlalchemy.pool import QueuePool
+
+        class deadlineQueuePool(QueuePool):
+            # QueuePool reads self._timeout on every checkout
+            @property
+            def _timeout(self):
+                limit = getattr(_checkout, 'timeout', None)
+                return self._pool_timeout if limit is None else min(limit, self._pool_timeout)
+
+            @_timeout.setter
+            def _timeout(self, value):
+                self._pool_timeout = value
+
+        _deadline_pool_class = deadlineQueuePool
+    return _deadline_pool_class
+
+
+@contextmanager
+def checkout_timeout(seconds):
+    """
+    Bounds how long SQLAlchemy engines created by pymaf wait for a pooled connection in this thread.
+    """
+    previous = getattr(_checkout, 'timeout', None)
+    _checkout.timeout = seconds
+    try:
+        yield
+    finally:
+        _checkout.timeout = previous
+
+
+POOL_DEFAULTS = {
+    "min_size": 1,
+    "max_size": 5,
+    "timeout": 30,
+    "recycle": 3600,
+    "pre_ping": True,
+}
+
+
+class PoolTimeoutError(Exception):
+    pass
+
+
+class QueryTimeoutError(Exception):
+    """
+    Raised when a query runs past its deadline. The query was cancelled on the server and its
+    connection is not reused.
+    """
+    pass
+
+
+class hostBalancer():
+    """
+    Chooses the Vertica node each new connection goes to, and keeps nodes that failed to connect
+    or dropped a connection out of rotation for a while.
+
+    Args:
+        hosts: Node addresses, 'host' or 'host:port'. None stands for connection_info's own host.
+        policy: 'least_outstanding' (default) picks the node with the fewest checked-out connections,
+            'round_robin' takes nodes in turn, and 'native' leaves it to Vertica's connection load
+            balancing: connections ask the first node to redirect them, with the others as
+            vertica_python backup nodes.
+        eject_seconds: Seconds a failed node is skipped. When every node is ejected they are still
+            tried, the longest-ejected first.
+    """
+    policies = ('least_outstanding', 'round_robin', 'native')
+
+    def __init__(self, hosts, policy='least_outstanding', eject_seconds=30):
+        if policy not in self.policies:
+            raise NotImplementedError(f"{policy} is not a supported load balancing policy. Possible options: {','.join(self.policies)}")
+        self.hosts = list(hosts) or [None]
+        self.policy = policy
+        self.eject_seconds = eject_seconds
+        self.outstanding = {host: 0 for host in self.hosts}
+        self._ejected = {}  # host -> monotonic time it was ejected
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def candidates(self):
+        """
+        Returns the hosts to try for a new connection, in order.
+        """
+        now = time.monotonic()
+        with self._lock:
+            start = self._next % len(self.hosts)
+            self._next += 1
+            rotated = self.hosts[start:] + self.hosts[:start]
+            for host, ejected_at in list(self._ejected.items()):
+                if now - ejected_at >= self.eject_seconds:
+                    del self._ejected[host]
+            healthy = [host for host in rotated if host not in self._ejected]
+            if self.policy == 'least_outstanding':
+                healthy.sort(key=lambda host: self.outstanding[host])
+            return healthy + sorted(self._ejected, key=self._ejected.get)
+
+    def eject(self, host):
+        if len(self.hosts) > 1:
+            logger.warning("Ejecting Vertica node %s for %ss.", host, self.eject_seconds)
+        with self._lock:
+            self._ejected[host] = time.monotonic()
+
+    def is_ejected(self, host):
+        with self._lock:
+            ejected_at = self._ejected.get(host)
+            return ejected_at is not None and time.monotonic() - ejected_at < self.eject_seconds
+
+    def acquire(self, host):
+        with self._lock:
+            self.outstanding[host] += 1
+
+    def release(self, host):
+        with self._lock:
+            self.outstanding[host] -= 1
+
+    def connection_info(self, connection_info, host):
+        """
+        Returns connection_info pointed at host.
+        """
+        if host is None:
+            return connection_info
+        default_port = connection_info.get('port', 5433)
+        name, port = _host_port(host, default_port)
+        info = dict(connection_info, host=name, port=port)
+        if self.policy == 'native' and len(self.hosts) > 1:
+            info.setdefault('connection_load_balance', True)
+            # vertica_python takes (host, port) pairs; a bare 'host:port' string is taken as a host name
+            info.setdefault('backup_server_node', [_host_port(h, default_port) for h in self.hosts if h != host])
+        return info
+
+
+def _host_port(host, default_port):
+    name, _, port = host.rpartition(':') if ':' in host else (host, None, None)
+    return name, int(port) if port else default_port
+
+
+def _split_hosts(host):
+    if isinstance(host, str):
+        return [h.strip() for h in host.split(',') if h.strip()]
+    return list(host) if host else []
+
+
+class verticaConnectionPool():
+    """
+    Thread-safe pool of vertica_python connections.
+
+    Args:
+        connection_info: Keyword arguments for vertica_python.connect. Its host may be a list of
+            nodes, or a comma-separated string, with optional ':port' suffixes; new connections are
+            then spread over the nodes, see hostBalancer.
+        min_size: Connections opened up front and kept around.
+        max_size: Upper bound on open connections; further checkouts wait.
+        timeout: Seconds a checkout waits for a free connection before raising PoolTimeoutError.
+        recycle: Connections older than this many seconds are replaced on checkout.
+        pre_ping: Runs a cheap query on checkout and replaces connections that fail it.
+        load_balance: How connections are spread over several hosts, see hostBalancer.
+        eject_seconds: Seconds a node is skipped after it failed to connect or dropped a connection.
+    """
+    def __init__(self, connection_info, min_size=1, max_size=5, timeout=30, recycle=3600, pre_ping=True,
+                 load_balance='least_outstanding', eject_seconds=30):
+        if not 0 <= min_size <= max_size or max_size < 1:
+            raise ValueError("Pool sizes must satisfy 0 <= min_size <= max_size and max_size >= 1.")
+
+        self.connection_info = connection_info
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.recycle = recycle
+        self.pre_ping = pre_ping
+        self.balancer = hostBalancer(_split_hosts(connection_info.get('host')), load_balance, eject_seconds)
+
+        self._idle = deque()  # (connection, created_at, host), most recently returned on the right
+        self._size = 0
+        self._condition = threading.Condition()
+
+        for _ in range(min_size):
+            self._size += 1
+            self._idle.append(self._open())
+
+    @property
+    def size(self):
+        return self._size
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def checkout(self, timeout=None):
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+
+        with self._condition:
+            while not self._idle and self._size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise PoolTimeoutError(f"No connection available within {timeout}s (max_size={self.max_size}).")
+                self._condition.wait(remaining)
+            if self._idle:
+                entry = self._pop_idle()
+            else:
+                self._size += 1
+                entry = None
+
+        try:
+            if entry is None:
+                entry = self._open()
+            elif not self._is_healthy(entry):
+                self._close(entry[0])
+                entry = self._open()
+        except Exception:
+            self._release_slot()
+            raise
+
+        self.balancer.acquire(entry[2])
+        return _PooledConnection(*entry)
+
+    def checkin(self, connection, discard=False):
+        self.balancer.release(connection.host)
+        if discard or self._is_closed(connection.raw):
+            self._close(connection.raw)
+            self._release_slot()
+            return
+
+        with self._condition:
+            self._idle.append((connection.raw, connection.created_at, connection.host))
+            self._condition.notify()
+
+    @contextmanager
+    def connection(self, timeout=None):
+        """
+        Checks a connection out for the duration of the block. Connections that raised a
+        database connection error or QueryTimeoutError are discarded rather than returned to the pool.
+        """
+        connection = self.checkout(timeout)
+        discard = False
+        try:
+            yield connection.raw
+        except Exception as error:
+            discard = _is_connection_error(error)
+            if discard:
+                self._eject(connection.host)
+            discard = discard or isinstance(error, QueryTimeoutError)
+            raise
+        finally:
+            self.checkin(connection, discard=discard)
+
+    def dispose(self):
+        with self._condition:
+            idle, self._idle = self._idle, deque()
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for raw, _, _ in idle:
+            self._close(raw)
+
+    def _pop_idle(self):
+        """
+        Takes the most recently returned idle connection, or with least_outstanding balancing the
+        most recent one on the least busy node. Called holding self._condition.
+        """
+        if self.balancer.policy != 'least_outstanding' or len(self.balancer.hosts) == 1:
+            return self._idle.pop()
+        best = min(range(len(self._idle) - 1, -1, -1), key=lambda i: self.balancer.outstanding[self._idle[i][2]])
+        entry = self._idle[best]
+        del self._idle[best]
+        return entry
+
+    def _open(self):
+        """
+        Connects to the first node of the balancer that accepts, ejecting the ones that fail.
+        """
+        error = None
+        for host in self.balancer.candidates():
+            try:
+                raw = verticaConnection(self.balancer.connection_info(self.connection_info, host)).connect()
+                return raw, time.monotonic(), host
+            except Exception as e:
+                if not _is_connection_error(e) or len(self.balancer.hosts) == 1:
+                    raise
+                logger.warning("Could not connect to Vertica node %s, failing over: %s", host, e)
+                self._eject(host)
+                error = e
+        raise error
+
+    def _eject(self, host):
+        """
+        Keeps host out of rotation and closes its idle connections, which are likely dead too.
+        """
+        if len(self.balancer.hosts) == 1:
+            return
+        self.balancer.eject(host)
+        with self._condition:
+            dropped = [entry for entry in self._idle if entry[2] == host]
+            self._idle = deque(entry for entry in self._idle if entry[2] != host)
+            self._size -= len(dropped)
+            self._condition.notify_all()
+        for raw, _, _ in dropped:
+            self._close(raw)
+
+    def _release_slot(self):
+        with self._condition:
+            self._size -= 1
+            self._condition.notify()
+
+    def _is_healthy(self, entry):
+        raw, created_at, host = entry
+        if self.recycle is not None and time.monotonic() - created_at > self.recycle:
+            logger.debug("Recycling pooled connection older than %ss.", self.recycle)
+            return False
+        if self._is_closed(raw):
+            return False
+        if self.pre_ping:
+            try:
+                cursor = raw.cursor()
+                cursor.execute("SELECT 1")
+                cursor.fetchall()
+                cursor.close()
+            except Exception as error:
+                logger.debug("Pooled connection failed pre-ping, replacing it: %s", error)
+                if _is_connection_error(error):
+                    self._eject(host)
+                return False
+        return True
+
+    @staticmethod
+    def _is_closed(raw):
+        closed = getattr(raw, "closed", None)
+        return bool(closed()) if callable(closed) else False
+
+    @staticmethod
+    def _close(raw):
+        try:
+            raw.close()
+        except Exception:
+            pass
+
+
+class _PooledConnection():
+    def __init__(self, raw, created_at, host=None):
+        self.raw = raw
+        self.created_at = created_at
+        self.host = host
+
+
+def _is_connection_error(error):
+    try:
+        from vertica_python import errors
+    except ImportError:
+        return isinstance(error, ConnectionError)
+    return isinstance(error, (ConnectionError, errors.ConnectionError))
+
+
+_shared_engines = {}
+_shared_engines_lock = threading.Lock()
+_shared_engine_locks = {}  # key -> Lock held while its pool is built, so it is built once
+
+
+def get_shared_engine(db_type, connection_info, pool_options=None):
+    """
+    Returns the connection pool (a verticaConnectionPool, or a SQLAlchemy engine) for
+    connection_info, creating it on first use. Connectors with the same connection_info and
+    pool_options share one pool.
+    """
+    pool_options = dict(POOL_DEFAULTS, **(pool_options or {}))
+    key = (db_type, _freeze(connection_info), _freeze(pool_options))
+
+    with _shared_engines_lock:
+        engine = _shared_engines.get(key)
+        if engine is not None:
+            return engine
+        build_lock = _shared_engine_locks.setdefault(key, threading.Lock())
+
+    # Built outside _shared_engines_lock: opening min_size connections may wait on connect
+    # timeouts and failover, which must not hold up connectors to other databases.
+    with build_lock:
+        with _shared_engines_lock:
+            engine = _shared_engines.get(key)
+        if engine is None:
+            if db_type == 'vertica':
+                engine = verticaConnectionPool(connection_info, **pool_options)
+            else:
+                engine = sqlAlchemyDbConnection(db_type, connection_info, pool_options).connect()
+            with _shared_engines_lock:
+                _shared_engines[key] = engine
+
+    return engine
+
+
+def dispose_shared_engines():
+    """
+    Closes every shared pool. Connectors created afterwards open new ones.
+    """
+    with _shared_engines_lock:
+        engines = list(_shared_engines.values())
+        _shared_engines.clear()
+    for engine in engines:
+        engine.dispose()
+
+
+def _freeze(mapping):
+    return tuple(sorted((k, repr(v)) for k, v in mapping.items()))
@@ -0,0 +1,194 @@
+import numpy as np
+import pandas as pd
+
+from .logger import pkg_logger as logger
+
+
+def read_vertica(query, connection, batch_size=65536, decimal='float', params=None):
+    """
+    Runs query on a vertica_python connection and builds a DataFrame column by column,
+    instead of letting pd.read_sql infer types from a list of row tuples.
+
+    On a text-protocol connection (vertica_python's default) rows are fetched with
+    disable_sqldata_converter, so vertica_python does not build a Python object per value;
+    integers, floats, numerics, booleans, dates and timestamps are parsed a whole batch at a
+    time by NumPy. Other types go through vertica_python's own converters.
+
+    NULLs: integer and boolean columns with NULLs become pandas' nullable Int64/boolean,
+    floats and numerics hold NaN, dates and timestamps hold NaT.
+
+    Args:
+        query: SQL query to run.
+        connection: Open vertica_python connection.
+        batch_size: Rows fetched and converted at a time.
+        decimal: 'float' converts NUMERIC columns to float64, like pd.read_sql's coerce_float, which
+            rounds values beyond about 15 significant digits. 'object' keeps exact Decimal values.
+        params: Optional values bound to the query's placeholders by vertica_python.
+    """
+    batches = _fetch_batches(query, connection, batch_size, decimal, params)
+    names, converters = next(batches)
+    batches = list(batches)
+    logger.debug("Fetched %s columns in %s batches.", len(names), len(batches))
+    return _build_frame(names, converters, batches)
+
+
+def iter_vertica(query, connection, batch_size=65536, decimal='float', params=None):
+    """
+    Like read_vertica, but yields one DataFrame per batch.
+    """
+    batches = _fetch_batches(query, connection, batch_size, decimal, params)
+    names, converters = next(batches)
+    for batch in batches:
+        yield _build_frame(names, converters, [batch])
+
+
+def _fetch_batches(query, connection, batch_size, decimal, params=None):
+    """
+    Yields the column names and converters, then each batch converted to columns. Rows are
+    converted as they arrive, so only one batch of row tuples is alive at a time.
+    """
+    cursor = connection.cursor()
+    try:
+        if params is None:
+            cursor.execute(query)
+        else:
+            cursor.execute(query, params)
+        raw = _can_read_raw_text(connection, cursor)
+        deserializers = cursor.get_deserializers() if raw else [None] * len(cursor.description)
+        converters = [_Converter(_get_kind(column[1], decimal), raw, deserializer)
+                      for column, deserializer in zip(cursor.description, deserializers)]
+        if raw:
+            cursor.disable_sqldata_converter = True
+
+        yield [column[0] for column in cursor.description], converters
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield [converter.convert(values) for converter, values in zip(converters, zip(*rows))]
+    finally:
+        cursor.close()
+
+
+def _can_read_raw_text(connection, cursor):
+    options = getattr(connection, 'options', None)
+    return (hasattr(cursor, 'disable_sqldata_converter') and hasattr(cursor, 'get_deserializers')
+            and isinstance(options, dict) and not options.get('binary_transfer')
+            and all(getattr(column, 'format_code', 0) == 0 for column in cursor.description))
+
+
+def _get_kind(type_code, decimal='float'):
+    from vertica_python.datatypes import VerticaType
+
+    kinds = {
+        VerticaType.INT8: 'int',
+        VerticaType.BOOL: 'bool',
+        VerticaType.FLOAT8: 'float',
+        VerticaType.DATE: 'date',
+        VerticaType.TIMESTAMP: 'timestamp',
+    }
+    if decimal == 'float':
+        kinds[VerticaType.NUMERIC] = 'float'
+    return kinds.get(type_code, 'object')
+
+
+class _Converter:
+    """
+    Turns one column of a batch into a (values, mask) pair of arrays. mask is only set for
+    integer and boolean columns with NULLs; other kinds hold NULLs as NaN, NaT or None.
+
+    Args:
+        kind: int, bool, float, date, timestamp or object.
+        raw: Whether values are the server's text representation (bytes) rather than Python objects.
+        deserializer: vertica_python converter for one raw value, used for object columns and as
+            a fallback when NumPy cannot parse a batch (e.g. BC dates).
+    """
+    dtypes = {'int': np.int64, 'bool': np.bool_, 'float': np.float64,
+              'date': 'datetime64[D]', 'timestamp': 'datetime64[us]', 'object': object}
+
+    def __init__(self, kind, raw=False, deserializer=None):
+        self.kind = kind
+        self.raw = raw
+        self.deserializer = deserializer
+
+    def convert(self, values):
+        if self.kind == 'object':
+            if self.raw:
+                values = [self.deserializer(v) for v in values]
+            # fromiter keeps nested values such as ARRAY columns as single elements.
+            return np.fromiter(values, dtype=object, count=len(values)), None
+        if self.raw:
+            try:
+                return self._parse_text(values)
+            except ValueError:
+                values = [self.deserializer(v) for v in values]
+        return self._from_objects(values)
+
+    def _parse_text(self, values):
+        mask = np.fromiter((v is None for v in values), dtype=bool, count=len(values)) if None in values else None
+        if self.kind == 'bool':
+            return np.array(values, dtype=object) == b't', mask
+
+        null = {'int': b'0', 'float': b'NaN'}.get(self.kind, b'NaT')
+        text = np.array(values if mask is None else [null if v is None else v for v in values], dtype='S')
+        if self.kind in ('date', 'timestamp'):
+            text = text.astype('U')
+        return text.astype(self.dtypes[self.kind]), mask if self.kind == 'int' else None
+
+    def _from_objects(self, values):
+        n = len(values)
+        if self.kind in ('date', 'timestamp'):
+            values = np.fromiter(values, dtype=object, count=n)
+            try:
+                # pandas converts date and datetime objects in C, far faster than np.array(..., 'datetime64')
+                return pd.to_datetime(values).array, None
+            except (ValueError, OverflowError):
+                return values, None  # outside the range pandas can represent
+        if self.kind == 'float':
+            return np.array(values, dtype=np.float64), None  # None becomes NaN
+        if None not in values:
+            return np.fromiter(values, dtype=self.dtypes[self.kind], count=n), None
+
+        mask = np.fromiter((v is None for v in values), dtype=bool, count=n)
+        filled = np.fromiter((False if v is None else v for v in values), dtype=self.dtypes[self.kind], count=n)
+        return filled, mask
+
+    def empty(self):
+        return np.array([], dtype=self.dtypes[self.kind]), None
+
+    def finish(self, values, mask):
+        if mask is None or not mask.any():
+            return values
+        if self.kind == 'bool':
+            return pd.arrays.BooleanArray(values, mask)
+        return pd.arrays.IntegerArray(values, mask)
+
+
+def _build_frame(names, converters, batches):
+    data = {}
+    for i, converter in enumerate(converters):
+        if not batches:
+            values, mask = converter.empty()
+        elif len(batches) == 1:
+            values, mask = batches[0][i]
+        else:
+            pieces = [batch[i] for batch in batches]
+            values = _concatenate([piece[0] for piece in pieces])
+            masks = [piece[1] for piece in pieces]
+            mask = None if all(m is None for m in masks) else np.concatenate(
+                [np.zeros(len(piece[0]), dtype=bool) if m is None else m for piece, m in zip(pieces, masks)])
+        data[i] = converter.finish(values, mask)
+
+    df = pd.DataFrame(data, copy=False)
+    df.columns = names
+    # Columns of other types are left to pandas' inference, as pd.read_sql would do.
+    for i, converter in enumerate(converters):
+        if converter.kind == 'object':
+            df.isetitem(i, df.iloc[:, i].infer_objects())
+    return df
+
+
+def _concatenate(arrays):
+    if isinstance(arrays[0], np.ndarray):
+        return np.concatenate(arrays)
+    return pd.concat([pd.Series(a) for a in arrays], ignore_index=True).array
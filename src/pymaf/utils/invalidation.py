@@ -0,0 +1,138 @@
+import threading
+
+from .logger import pkg_logger as logger
+
+
+class TableWatcher:
+    """
+    Background thread that polls a change marker of every table cached results were read from,
+    and invalidates the results of the tables whose marker changed. Markers are kept in the cache
+    directory, so changes made while no watcher ran are caught by the next one; a table's first
+    marker is only a baseline.
+
+    Args:
+        connector: DatabaseConnector whose cache is invalidated.
+        interval: Seconds between polls.
+        markers: Optional callable given the connector and a list of tables, returning a dict of
+            table to a comparable marker (tables left out are skipped). Defaults to vertica_markers
+            or postgresql_markers, by the connector's db_type.
+    """
+    def __init__(self, connector, interval=60, markers=None):
+        if markers is None:
+            markers = MARKERS.get(connector.db_type)
+            if markers is None:
+                raise NotImplementedError(f"Table change markers are not implemented for {connector.db_type}. "
+                                          f"Possible options: {','.join(MARKERS)}")
+        self.connector = connector
+        self.interval = interval
+        self.markers = markers
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='pymaf-table-watcher', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def check(self):
+        """
+        Polls the markers once. Returns the tables found changed, whose results were invalidated.
+        """
+        cache = self.connector.cache
+        tables = sorted(cache.table_index.tables())
+        if not tables:
+            return []
+
+        changed = []
+        for table, marker in self.markers(self.connector, tables).items():
+            previous = cache.table_index.get_marker(table)
+            if previous == marker:
+                continue
+            if previous is not None:
+                count = cache.invalidate_table(table)
+                logger.debug("Table %s changed, invalidated %s cached results.", table, count)
+                changed.append(table)
+            cache.table_index.set_marker(table, marker)
+        return changed
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception as error:
+                logger.error("Error in the table watcher: %s", error)
+
+
+VERTICA_MARKERS_QUERY = """
+SELECT r.anchor_table_schema, r.anchor_table_name, r.row_count, e.epoch
+FROM (SELECT anchor_table_schema, anchor_table_name, SUM(row_count) AS row_count
+      FROM v_monitor.projection_storage GROUP BY 1, 2) r
+LEFT JOIN (SELECT p.anchor_table_schema, p.anchor_table_name, MAX(s.end_epoch) AS epoch
+           FROM (SELECT schema_name, projection_name, end_epoch FROM v_monitor.storage_containers
+                 UNION ALL
+                 SELECT schema_name, projection_name, end_epoch FROM v_monitor.delete_vectors) s
+           JOIN v_catalog.projections p
+             ON p.projection_schema = s.schema_name AND p.projection_name = s.projection_name
+           GROUP BY 1, 2) e
+  ON e.anchor_table_schema = r.anchor_table_schema AND e.anchor_table_name = r.anchor_table_name
+"""
+
+
+def vertica_markers(connector, tables):
+    """
+    Marks each table with its row count from v_monitor.projection_storage and the latest commit
+    epoch of its storage containers and delete vectors, read for all tables in one query of the
+    system tables, without touching table data. Unqualified names match the table in any schema.
+    A mergeout can move the epoch without a change: an extra miss rather than a stale hit.
+    """
+    with connector._connection() as connection:
+        cursor = connection.cursor()
+        try:
+            cursor.execute(VERTICA_MARKERS_QUERY)
+            rows = cursor.fetchall()
+        finally:
+            cursor.close()
+    # Vertica names are case-insensitive, and kept in the system tables as they were created
+    return _match_markers(tables, [(schema.lower(), name.lower(), (row_count, epoch))
+                                   for schema, name, row_count, epoch in rows], fold_case=True)
+
+
+def postgresql_markers(connector, tables):
+    """
+    Marks each table with its cumulative inserted, updated and deleted tuple counts from
+    pg_stat_all_tables, read for all tables in one query. Unqualified names match the table in
+    any schema. The statistics collector lags commits by up to about a second.
+    """
+    from sqlalchemy import text
+
+    with connector.dbengine.connect() as connection:
+        rows = connection.execute(text(
+            "SELECT schemaname, relname, n_tup_ins + n_tup_upd + n_tup_del FROM pg_stat_all_tables")).fetchall()
+
+    return _match_markers(tables, rows)
+
+
+def _match_markers(tables, rows, fold_case=False):
+    # rows are (schema, table, marker); each table is marked with the (schema, marker) of its matches
+    markers = {}
+    for table in tables:
+        schema, _, name = (table.lower() if fold_case else table).rpartition('.')
+        matches = sorted((row[0], row[2]) for row in rows if row[1] == name and (not schema or row[0] == schema))
+        if matches:
+            markers[table] = tuple(matches)
+    return markers
+
+
+MARKERS = {
+    'vertica': vertica_markers,
+    'postgresql': postgresql_markers,
+}
+
@@ -0,0 +1,247 @@
+import os
+import uuid
+
+# Partial aggregates computed per chunk, and how the partials of all chunks are combined.
+PARTIALS = {'sum': ('sum',), 'count': ('count',), 'min': ('min',), 'max': ('max',), 'mean': ('sum', 'count')}
+COMBINE = {'sum': 'sum', 'count': 'sum', 'min': 'min', 'max': 'max'}
+
+
+def _import_parquet():
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise ImportError("Lazy results require pyarrow: pip install pymaf[arrow]") from e
+    return pa, pq
+
+
+def spill(chunks, directory, prefix):
+    """
+    Writes DataFrame chunks to a new Parquet file in directory as they arrive, one row group per
+    chunk, so only one chunk is held in memory. Column types are taken from the first chunk; a
+    column that is all null there takes its type from the first chunk with values, and the row
+    groups written so far are rewritten with it. The file only appears under its final name once
+    every chunk is written.
+
+    Returns the file name, relative to directory.
+    """
+    pa, pq = _import_parquet()
+
+    os.makedirs(directory, exist_ok=True)
+    name = f"{prefix}-{uuid.uuid4().hex}.parquet"
+    path = os.path.join(directory, name)
+    writer = None
+    try:
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk, preserve_index=False)
+            if writer is None:
+                writer = pq.ParquetWriter(f"{path}.tmp", table.schema)
+            else:
+                schema = _promote_nulls(pa, writer.schema, table.schema)
+                if schema is not writer.schema:
+                    writer = _rewrite(pq, writer, f"{path}.tmp", schema)
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+        if writer is None:
+            writer = pq.ParquetWriter(f"{path}.tmp", pa.schema([]))
+        writer.close()
+        os.replace(f"{path}.tmp", path)
+    except BaseException:
+        if writer is not None:
+            writer.close()
+        for leftover in (f"{path}.tmp", f"{path}.tmp.old"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        raise
+    return name
+
+
+def _promote_nulls(pa, schema, chunk_schema):
+    # Returns schema with its null-typed fields given the chunk's type, or schema itself if none changes.
+    promoted = schema
+    for i, field in enumerate(schema):
+        if pa.types.is_null(field.type):
+            index = chunk_schema.get_field_index(field.name)
+            if index >= 0 and not pa.types.is_null(chunk_schema.field(index).type):
+                promoted = promoted.set(i, field.with_type(chunk_schema.field(index).type))
+    return promoted
+
+
+def _rewrite(pq, writer, tmp_path, schema):
+    # Copies the row groups written so far into a new file of schema, a row group at a time.
+    writer.close()
+    os.replace(tmp_path, f"{tmp_path}.old")
+    written = pq.ParquetFile(f"{tmp_path}.old")
+    writer = pq.ParquetWriter(tmp_path, schema)
+    for i in range(written.num_row_groups):
+        writer.write_table(written.read_row_group(i).cast(schema))
+    written.close()
+    os.remove(f"{tmp_path}.old")
+    return writer
+
+
+class LazyResult:
+    """
+    A query result spilled to a Parquet file, read in chunks on demand so results larger than
+    memory can be explored. select and filter return new LazyResults without reading anything;
+    head, iter_chunks, agg, reduce and to_pandas read the file, only the columns they need.
+
+        sales = connection.q("SELECT * FROM ca_ods.sales", lazy=True)
+        sales.head()
+        big = sales.filter("amount > 100")[['store_id', 'amount']]
+        big.agg({'amount': ['sum', 'mean']}, by='store_id')
+
+    Args:
+        path: Parquet file holding the result.
+        columns: Columns to return, None for all.
+        predicates: (predicate, columns) pairs applied in order, see filter.
+    """
+    def __init__(self, path, columns=None, predicates=()):
+        self.path = path
+        self._columns = list(columns) if columns is not None else None
+        self._predicates = tuple(predicates)
+
+    @property
+    def columns(self):
+        if self._columns is not None:
+            return list(self._columns)
+        _, pq = _import_parquet()
+        return pq.ParquetFile(self.path).schema_arrow.names
+
+    def __len__(self):
+        if not self._predicates:
+            _, pq = _import_parquet()
+            return pq.ParquetFile(self.path).metadata.num_rows
+        return sum(len(chunk) for chunk in self.iter_chunks())
+
+    def __getitem__(self, columns):
+        return self.select([columns] if isinstance(columns, str) else columns)
+
+    def __repr__(self):
+        return f"LazyResult({self.path!r}, columns={self._columns!r}, filters={len(self._predicates)})"
+
+    def select(self, columns):
+        """
+        Returns a LazyResult of only these columns.
+        """
+        return LazyResult(self.path, columns, self._predicates)
+
+    def filter(self, predicate):
+        """
+        Returns a LazyResult of the rows matching predicate, applied chunk by chunk.
+
+        Args:
+            predicate: A DataFrame.query expression, or a callable given a chunk and returning a
+                boolean mask. It sees the columns selected when filter is called.
+        """
+        return LazyResult(self.path, self._columns, self._predicates + ((predicate, self._columns),))
+
+    def iter_chunks(self, chunksize=100000):
+        """
+        Yields the result as DataFrames of up to chunksize rows (fewer once filtered).
+        """
+        _, pq = _import_parquet()
+
+        needed = [self._columns] + [columns for _, columns in self._predicates]
+        read_columns = None
+        if all(columns is not None for columns in needed):
+            read_columns = list(dict.fromkeys(column for columns in needed for column in columns))
+
+        for batch in pq.ParquetFile(self.path).iter_batches(batch_size=chunksize, columns=read_columns):
+            chunk = batch.to_pandas()
+            for predicate, columns in self._predicates:
+                view = chunk if columns is None else chunk[columns]
+                mask = view.eval(predicate) if isinstance(predicate, str) else predicate(view)
+                chunk = chunk[mask]
+            if self._columns is not None:
+                chunk = chunk[self._columns]
+            if len(chunk):
+                yield chunk.reset_index(drop=True)
+
+    def head(self, n=5):
+        """
+        Returns the first n rows, reading only as many chunks as needed.
+        """
+        import pandas as pd
+
+        chunks, rows = [], 0
+        for chunk in self.iter_chunks(chunksize=max(n, 1024)):
+            chunks.append(chunk.head(n - rows))
+            rows += len(chunks[-1])
+            if rows >= n:
+                break
+        if not chunks:
+            return self._empty()
+        return pd.concat(chunks, ignore_index=True)
+
+    def to_pandas(self):
+        """
+        Materializes the whole result in memory.
+        """
+        import pandas as pd
+
+        chunks = list(self.iter_chunks())
+        return pd.concat(chunks, ignore_index=True) if chunks else self._empty()
+
+    def reduce(self, func, combine, chunksize=100000):
+        """
+        Applies func to every chunk and returns combine of the list of their results.
+        """
+        return combine([func(chunk) for chunk in self.iter_chunks(chunksize)])
+
+    def agg(self, aggregations, by=None, chunksize=100000):
+        """
+        Aggregates chunk by chunk, keeping only partial aggregates in memory.
+
+        Args:
+            aggregations: Dict of column to 'sum', 'count', 'min', 'max', 'mean' or a list of them.
+            by: Optional column or list of columns to group by.
+
+        Returns a Series of the aggregates without by, else a DataFrame indexed by the groups. Columns
+        are named after their column, or (column, aggregate) when a column has several aggregates.
+        """
+        import numpy as np
+        import pandas as pd
+
+        by = [by] if isinstance(by, str) else list(by or [])
+        aggregations = {column: [funcs] if isinstance(funcs, str) else list(funcs)
+                        for column, funcs in aggregations.items()}
+        for funcs in aggregations.values():
+            for func in funcs:
+                if func not in PARTIALS:
+                    raise NotImplementedError(f"{func} is not a supported aggregate. Possible options: {','.join(PARTIALS)}")
+        partials = {column: list(dict.fromkeys(p for func in funcs for p in PARTIALS[func]))
+                    for column, funcs in aggregations.items()}
+
+        parts = []
+        for chunk in self.select(list(dict.fromkeys(by + list(aggregations)))).iter_chunks(chunksize):
+            keys = [chunk[column] for column in by] if by else [np.zeros(len(chunk), dtype=int)]
+            parts.append(chunk.groupby(keys, dropna=False).agg(partials))
+        if not parts:
+            return pd.Series(dtype=float) if not by else pd.DataFrame()
+
+        combined = pd.concat(parts)
+        combined = combined.groupby(level=list(range(combined.index.nlevels)), dropna=False).agg(
+            {(column, p): COMBINE[p] for column, ps in partials.items() for p in ps})
+
+        flat = all(len(funcs) == 1 for funcs in aggregations.values())
+        result = pd.DataFrame(index=combined.index)
+        for column, funcs in aggregations.items():
+            for func in funcs:
+                if func == 'mean':
+                    values = combined[(column, 'sum')] / combined[(column, 'count')]
+                else:
+                    values = combined[(column, func)]
+                result[column if flat else (column, func)] = values
+        if not flat:
+            result.columns = pd.MultiIndex.from_tuples(result.columns)
+        if not by:
+            return result.iloc[0]
+        result.index.names = by
+        return result
+
+    def _empty(self):
+        _, pq = _import_parquet()
+        schema = pq.ParquetFile(self.path).schema_arrow
+        df = schema.empty_table().to_pandas()
+        return df[self._columns] if self._columns is not None else df
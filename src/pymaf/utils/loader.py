@@ -0,0 +1,141 @@
+import csv
+import zlib
+
+from .logger import pkg_logger as logger
+
+NULL = r'\N'
+
+
+class CsvStream:
+    """
+    File-like object that encodes a DataFrame to CSV a chunk of rows at a time, so COPY can
+    read it without the whole CSV being held in memory.
+
+    NULLs are written as \\N and strings are only quoted when needed, so an empty string and a
+    NULL stay distinct. Float columns holding only whole numbers, which is what pandas makes of
+    integer columns with NULLs, are written without a decimal point so INTEGER columns accept them.
+
+    Args:
+        df: DataFrame to encode. Columns are written in order, without header or index.
+        chunksize: Rows encoded at a time.
+        compress: Optional 'gzip' to compress the stream as it is read.
+        level: Compression level for gzip.
+    """
+    def __init__(self, df, chunksize=100000, compress=None, level=6):
+        if compress not in (None, 'gzip'):
+            raise NotImplementedError(f"{compress} compression is not implemented. Possible options: gzip")
+        self.df = df
+        self.chunksize = chunksize
+        self.bytes_encoded = 0
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31) if compress == 'gzip' else None
+        self._chunks = self._encode()
+        self._buffer = bytearray()
+
+    def read(self, size=-1):
+        while size is None or size < 0 or len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+
+        if size is None or size < 0:
+            size = len(self._buffer)
+        data = bytes(self._buffer[:size])
+        del self._buffer[:size]
+        return data
+
+    def _encode(self):
+        for start in range(0, len(self.df), self.chunksize):
+            chunk = _whole_floats_as_int(self.df.iloc[start:start + self.chunksize])
+            data = chunk.to_csv(header=False, index=False, na_rep=NULL, quoting=csv.QUOTE_MINIMAL,
+                                lineterminator='\n').encode('utf-8')
+            self.bytes_encoded += len(data)
+            yield self._compressor.compress(data) if self._compressor else data
+        if self._compressor:
+            yield self._compressor.flush()
+
+
+def _whole_floats_as_int(chunk):
+    converted = None
+    for i in range(chunk.shape[1]):
+        values = chunk.iloc[:, i]
+        if values.dtype.kind != 'f':
+            continue
+        present = values.dropna()
+        if len(present) and (present % 1 == 0).all() and present.abs().max() < 2 ** 63:
+            if converted is None:
+                converted = chunk.copy()
+            converted.isetitem(i, values.astype('Int64'))
+    return chunk if converted is None else converted
+
+
+def copy_vertica(connection, df, table, chunksize=100000, compress=None, rejected_table=None, reject_max=None):
+    """
+    Loads df into table with Vertica's COPY ... FROM STDIN and commits.
+
+    Args:
+        connection: Open vertica_python connection.
+        compress: 'gzip' compresses the stream on the client; Vertica decompresses it.
+        rejected_table: Keeps rejected rows, with the reason, in this table.
+        reject_max: Aborts the load once more rows than this are rejected.
+
+    Returns a dict with rows_loaded and rows_rejected.
+    """
+    columns = ", ".join(_quote(column) for column in df.columns)
+    sql = (f"COPY {table} ({columns}) FROM STDIN{' GZIP' if compress else ''} "
+           f"DELIMITER ',' ENCLOSED BY '\"' NULL '{NULL}' NO ESCAPE")
+    if rejected_table:
+        sql += f" REJECTED DATA AS TABLE {rejected_table}"
+    if reject_max is not None:
+        sql += f" REJECTMAX {int(reject_max)}"
+
+    stream = CsvStream(df, chunksize, compress)
+    cursor = connection.cursor()
+    try:
+        cursor.copy(sql, stream)
+        cursor.execute("SELECT GET_NUM_ACCEPTED_ROWS(), GET_NUM_REJECTED_ROWS()")
+        rows_loaded, rows_rejected = cursor.fetchone()
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    logger.debug("Loaded %s rows into %s, %s rejected.", rows_loaded, table, rows_rejected)
+    return {"rows_loaded": rows_loaded, "rows_rejected": rows_rejected, "bytes_sent": stream.bytes_encoded}
+
+
+def copy_postgres(connection, df, table, chunksize=100000):
+    """
+    Loads df into table with PostgreSQL's COPY ... FROM STDIN and commits. COPY is
+    all-or-nothing in PostgreSQL, so no rows are ever reported as rejected.
+
+    Args:
+        connection: DBAPI connection of a psycopg2 driver, e.g. engine.raw_connection().
+
+    Returns a dict with rows_loaded and rows_rejected.
+    """
+    columns = ", ".join(_quote(column) for column in df.columns)
+    sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv, NULL '{NULL}')"
+
+    stream = CsvStream(df, chunksize)
+    cursor = connection.cursor()
+    try:
+        if not hasattr(cursor, 'copy_expert'):
+            raise NotImplementedError("Bulk load needs the psycopg2 driver for COPY FROM STDIN.")
+        cursor.copy_expert(sql, stream)
+        rows_loaded = cursor.rowcount
+        connection.commit()
+    except Exception:
+        connection.rollback()
+        raise
+    finally:
+        cursor.close()
+
+    logger.debug("Loaded %s rows into %s.", rows_loaded, table)
+    return {"rows_loaded": rows_loaded, "rows_rejected": 0, "bytes_sent": stream.bytes_encoded}
+
+
+def _quote(identifier):
+    return '"{}"'.format(str(identifier).replace('"', '""'))
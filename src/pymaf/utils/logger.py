@@ -1,23 +1,98 @@
+import atexit
 import logging
+import logging.handlers
+import os
+import queue
+import threading
 
 PACKAGE_NAME = 'pymaf'
+DEFAULT_LEVEL = logging.WARNING
 
 pkg_logger = logging.getLogger(PACKAGE_NAME)
-# Create a file handler
-file_handler = logging.FileHandler(f'{PACKAGE_NAME}.log')
+pkg_logger.setLevel(DEFAULT_LEVEL)  # debug lines cost one level check unless enabled
 
-# Create a console handler
+# Create a formatter and a console handler
+formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 console_handler = logging.StreamHandler()
-
-# Set the log level for the handlers
-file_handler.setLevel(logging.DEBUG)
 console_handler.setLevel(logging.INFO)
-
-# Create a formatter and add it to the handlers
-formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
-file_handler.setFormatter(formatter)
 console_handler.setFormatter(formatter)
+file_handler = None
+
+# Records are queued by the logging thread and written by a background listener, so queries never
+# wait on the console or a log file.
+_queue = queue.SimpleQueue()
+_listener = logging.handlers.QueueListener(_queue, console_handler, respect_handler_level=True)
+_listener_lock = threading.Lock()
+_queue_handler = logging.handlers.QueueHandler(_queue)
+pkg_logger.addHandler(_queue_handler)
+_listener.start()
+
+
+def _stop_listener():
+    _listener.stop()
+
+
+def _restart_after_fork():
+    # A forked child only keeps the thread that forked, so it gets a listener of its own, with a
+    # fresh queue and lock in case the listener thread held theirs at the fork.
+    global _queue, _listener, _listener_lock
+    _queue = queue.SimpleQueue()
+    _queue_handler.queue = _queue
+    _listener = logging.handlers.QueueListener(_queue, *_listener.handlers, respect_handler_level=True)
+    _listener_lock = threading.Lock()
+    _listener.start()
+
+
+atexit.register(_stop_listener)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_restart_after_fork)
+
+
+def configure_logging(level=None, file=None, file_level='DEBUG', console=True):
+    """
+    Configures pymaf's logging. Nothing is written to a file unless file is set, or the PYMAF_LOG_FILE
+    environment variable names one when pymaf is imported.
+
+    Args:
+        level: Level of the package logger, e.g. 'DEBUG'. Left unchanged if not set; WARNING by default.
+        file: Path of a log file to write to, or None for no file.
+        file_level: Level of the records written to the file.
+        console: Whether INFO and higher records are printed to stderr.
+    """
+    global file_handler
+
+    if level is not None:
+        pkg_logger.setLevel(level.upper() if isinstance(level, str) else level)
+
+    handlers = [console_handler] if console else []
+    old_file_handler = file_handler
+    if file is not None:
+        if old_file_handler is not None and old_file_handler.baseFilename == os.path.abspath(file):
+            old_file_handler = None
+        else:
+            file_handler = logging.FileHandler(file, delay=True)  # The file is only opened once something is logged
+            file_handler.setFormatter(formatter)
+        file_handler.setLevel(file_level.upper() if isinstance(file_level, str) else file_level)
+        handlers.append(file_handler)
+    else:
+        file_handler = None
+
+    with _listener_lock:
+        _listener.stop()  # writes out the queued records first
+        _listener.handlers = tuple(handlers)
+        _listener.start()
+    if old_file_handler is not None:
+        old_file_handler.close()
+
+
+def flush_logs():
+    """
+    Blocks until every record logged so far is written.
+    """
+    with _listener_lock:
+        _listener.stop()
+        _listener.start()
+
 
-# Add the handlers to the logger
-pkg_logger.addHandler(file_handler)
-pkg_logger.addHandler(console_handler)
\ No newline at end of file
+if os.environ.get('PYMAF_LOG_FILE'):
+    configure_logging(file=os.environ['PYMAF_LOG_FILE'])
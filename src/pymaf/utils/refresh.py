@@ -0,0 +1,67 @@
+import threading
+import time
+
+from .logger import pkg_logger as logger
+
+
+class RefreshScheduler:
+    """
+    Background thread that refreshes registered queries shortly before their cached
+    results go stale, so user-facing calls never wait on an expired entry.
+
+    Args:
+        connector: DatabaseConnector whose cache is kept warm.
+        interval: Seconds between checks.
+    """
+    def __init__(self, connector, interval=30):
+        self.connector = connector
+        self.interval = interval
+        self._queries = {}  # cache_key -> (query, ttl, stale_ttl, lead_time)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def register(self, query, ttl=None, stale_ttl=None, lead_time=60):
+        with self._lock:
+            self._queries[self.connector._get_cache_key(query)] = (query, ttl, stale_ttl, lead_time)
+
+    def unregister(self, query):
+        with self._lock:
+            self._queries.pop(self.connector._get_cache_key(query), None)
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='pymaf-refresh-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def run_pending(self):
+        """
+        Refreshes every registered query that is missing or goes stale within its lead_time.
+        """
+        if not self.connector.cache_enabled:
+            return
+        with self._lock:
+            queries = list(self._queries.items())
+
+        cache = self.connector.cache
+        for cache_key, (query, ttl, stale_ttl, lead_time) in queries:
+            fresh_until = cache.fresh_until(cache_key)
+            if cache_key in cache and (fresh_until is None or fresh_until - time.time() > lead_time):
+                continue
+            logger.debug("Scheduled refresh of cached query %s.", cache_key)
+            self.connector._refresh_in_background(query, cache_key, ttl, stale_ttl)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.run_pending()
+            except Exception as error:
+                logger.error("Error in the refresh scheduler: %s", error)
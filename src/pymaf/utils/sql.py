@@ -0,0 +1,111 @@
+import datetime
+import re
+import numbers
+
+
+def quote_literal(value):
+    """
+    Renders a Python value as a SQL literal: numbers as is, dates and timestamps (including
+    pandas Timestamps) in ISO format, anything else as a quoted string.
+    """
+    if value is None:
+        return "NULL"
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, numbers.Number):
+        return str(value)
+    if isinstance(value, datetime.datetime):
+        return "'{}'".format(value.isoformat(sep=' '))
+    if isinstance(value, datetime.date):
+        return "'{}'".format(value.isoformat())
+    return "'{}'".format(str(value).replace("'", "''"))
+
+
+# Tokens whose text is kept as is: string literals, quoted identifiers and dollar-quoted strings.
+# Comments and runs of whitespace are matched so they can be dropped or collapsed.
+_TOKENS = re.compile(r"""
+    (?P<literal>'(?:[^']|'')*'|"(?:[^"]|"")*"|\$\$.*?\$\$)
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<space>\s+)
+""", re.VERBOSE | re.DOTALL)
+
+
+def normalize_sql(query):
+    """
+    Returns query with comments removed, whitespace collapsed to single spaces and trailing
+    semicolons dropped, leaving string literals and quoted identifiers untouched. Queries that
+    differ only in layout normalize to the same text.
+    """
+    parts, position = [], 0
+    for match in _TOKENS.finditer(query):
+        if match.start() > position:
+            parts.append(query[position:match.start()])
+        if match.lastgroup == 'literal':
+            parts.append(match.group())
+        elif parts and parts[-1] != ' ':
+            parts.append(' ')
+        position = match.end()
+    parts.append(query[position:])
+    return ''.join(parts).strip().rstrip('; ')
+
+
+_WORDS = re.compile(r'"(?:[^"]|"")*"|[\w$]+|\S')
+# Words that end a FROM list, so commas after them do not start a FROM item.
+_FROM_LIST_ENDS = {
+    'WHERE', 'GROUP', 'ORDER', 'HAVING', 'LIMIT', 'OFFSET', 'UNION', 'EXCEPT', 'INTERSECT', 'WINDOW',
+    'SELECT', 'QUALIFY', 'TIMESERIES', 'FETCH', 'FOR', 'MATCH', 'INTO',
+}
+# Functions whose arguments use FROM, as in EXTRACT(YEAR FROM sold_at).
+_FROM_FUNCTIONS = {'EXTRACT', 'TRIM', 'SUBSTRING', 'OVERLAY', 'POSITION'}
+
+
+def referenced_tables(query):
+    """
+    Returns the sorted names of the tables query reads, as written after FROM, JOIN and the
+    commas of a FROM list (also after a join's ON condition), with unquoted names lowercased.
+    Subqueries are looked into; CTE names and table functions are left out. The parse is lexical,
+    so it may over-report on unusual SQL, which only costs extra invalidations.
+    """
+    text = re.sub(r"'(?:[^']|'')*'", "''", normalize_sql(query))
+    words = _WORDS.findall(text)
+    upper = [word.upper() for word in words]
+
+    ctes = {_unquote(words[i - 1]) for i in range(1, len(words) - 1)
+            if upper[i] == 'AS' and words[i + 1] == '(' and (i < 2 or upper[i - 2] in ('WITH', 'RECURSIVE', ','))}
+    tables, parens = set(), []
+    from_lists = set()  # paren depths at which a FROM list is being read
+    for i, word in enumerate(upper):
+        depth = len(parens)
+        if word == '(':
+            parens.append(upper[i - 1] if i else None)
+        elif word == ')' and parens:
+            from_lists.discard(depth)
+            parens.pop()
+        elif word in _FROM_LIST_ENDS:
+            from_lists.discard(depth)
+        elif (word == 'JOIN' or (word == ',' and depth in from_lists)
+              or (word == 'FROM' and not (parens and parens[-1] in _FROM_FUNCTIONS))):
+            if word == 'FROM':
+                from_lists.add(depth)
+            name, j = _read_name(words, i + 1)
+            if name is not None and not (j < len(words) and words[j] == '(') and name not in ctes:
+                tables.add(name)
+    return sorted(tables)
+
+
+def _read_name(words, j):
+    parts = []
+    while j < len(words) and (words[j].startswith('"') or re.match(r'[A-Za-z_]', words[j])):
+        parts.append(_unquote(words[j]))
+        j += 1
+        if j < len(words) - 1 and words[j] == '.':
+            j += 1
+        else:
+            break
+    return ('.'.join(parts) if parts else None), j
+
+
+def _unquote(word):
+    if word.startswith('"'):
+        return word[1:-1].replace('""', '"')
+    return word.lower()
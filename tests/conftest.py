@@ -0,0 +1,24 @@
+import os
+import sys
+import sqlite3
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from pymaf.utils import dbconfig
+from pymaf.utils.dbconfig import dispose_shared_engines
+
+@pytest.fixture
+def stand_in_database(tmp_path, monkeypatch):
+    # Stands in for Vertica with a sqlite database file, so tests can run offline
+    database = str(tmp_path / 'stand_in.db')
+    with sqlite3.connect(database) as sqlite_connection:
+        sqlite_connection.execute("CREATE TABLE sales (id INTEGER, amount REAL)")
+        sqlite_connection.executemany("INSERT INTO sales VALUES (?, ?)", [(i, i * 1.5) for i in range(10)])
+    sqlite_connection.close()
+
+    monkeypatch.setattr(dbconfig.verticaConnection, 'connect',
+                        lambda self: sqlite3.connect(database, check_same_thread=False))
+    yield database
+    dispose_shared_engines()
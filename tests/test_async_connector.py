@@ -0,0 +1,65 @@
+import os
+import sys
+import time
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from pymaf.utils.async_connector import AsyncDatabaseConnector
+from pymaf.utils.dbconfig import QueryTimeoutError
+
+@pytest.fixture
+def async_connector(stand_in_database, tmp_path):
+    async_connector = AsyncDatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                             cache_directory=str(tmp_path / 'cache'), pool_options={'max_size': 2})
+    yield async_connector
+    async_connector.clear_cache()
+    async_connector.close()
+
+def test_async_connector_aq_runs_and_caches(async_connector):
+    query = "SELECT id FROM sales WHERE id < 3"
+    result = asyncio.run(async_connector.aq(query))
+    assert result['id'].tolist() == [0, 1, 2]
+    assert async_connector.cache.get(async_connector._get_cache_key(query)) is not None
+
+def test_async_connector_bounds_concurrency(async_connector, monkeypatch):
+    running, peak = [0], [0]
+    def slow_fetch(*args, **kwargs):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        time.sleep(0.02)
+        running[0] -= 1
+    monkeypatch.setattr(async_connector, '_fetch', slow_fetch)
+
+    async def main():
+        await asyncio.gather(*(async_connector.aq(f"SELECT {i}") for i in range(10)))
+    asyncio.run(main())
+    assert peak[0] <= async_connector.max_concurrency
+
+def test_async_connector_aq_cancellation_cancels_server_query(async_connector, monkeypatch):
+    class Connection:
+        cancelled = False
+        def cancel(self):
+            Connection.cancelled = True
+
+    def blocking_fetch(query, cache_key, columns, on_connection=None, **kwargs):
+        on_connection(Connection())
+        time.sleep(0.2)
+    monkeypatch.setattr(async_connector, '_fetch', blocking_fetch)
+
+    async def main():
+        task = asyncio.ensure_future(async_connector.aq("SELECT 1"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+    asyncio.run(main())
+    assert Connection.cancelled
+
+def test_async_connector_aq_timeout_raises(async_connector):
+    slow_query = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT COUNT(*) FROM c"
+    with pytest.raises(QueryTimeoutError):
+        asyncio.run(async_connector.aq(slow_query, timeout=0.2))
+    assert len(asyncio.run(async_connector.aq("SELECT * FROM sales", timeout=5))) == 10
@@ -0,0 +1,38 @@
+import os
+import sys
+import json
+import argparse
+
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import bench_suite
+import fake_vertica
+import compare
+
+def test_bench_suite_writes_comparable_results(tmp_path, capsys):
+    output = str(tmp_path / 'results.jsonl')
+    bench_suite.main(['--rows', '200', '--repeat', '1', '--workers', '2', '--queries', '4', '--latency', '0',
+                      '--output', output])
+    capsys.readouterr()
+
+    results = [json.loads(line) for line in open(output)]
+    assert {result['benchmark'] for result in results} == set(bench_suite.BENCHMARKS)
+    assert all(result['meta']['python'] for result in results)
+    latency = [result for result in results if result['benchmark'] == 'q_latency']
+    assert all(result['warm_memory_seconds'] < result['cold_seconds'] for result in latency)
+
+    assert compare.main([output, output]) == 0
+    assert 'cold_seconds' in capsys.readouterr().out
+
+def test_bench_concurrency_runs_every_query(monkeypatch):
+    executed = []
+    execute = fake_vertica.FakeCursor.execute
+    def counting_execute(self, query, *args, **kwargs):
+        executed.append(query)
+        return execute(self, query, *args, **kwargs)
+    monkeypatch.setattr(fake_vertica.FakeCursor, 'execute', counting_execute)
+
+    args = argparse.Namespace(queries=8, workers=[2], latency=0, repeat=1)
+    result, = bench_suite.bench_concurrency(args)
+    assert result['queries'] == 8
+    assert len(executed) == 8  # cold run only; every query has its own cache key
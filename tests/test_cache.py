@@ -0,0 +1,210 @@
+import os
+import sys
+import time
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from pymaf.utils.cache import ResultCache, SingleFlight, MemoryCache, CacheStats
+
+@pytest.fixture
+def arrow_cache(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), cache_format='arrow')
+    yield cache
+    cache.clear()
+
+@pytest.fixture
+def wide_df():
+    return pd.DataFrame({'id': range(5), 'amount': [1.5] * 5, 'label': list('abcde')})
+
+def test_result_cache_arrow_round_trip(arrow_cache, wide_df):
+    arrow_cache.set('key', wide_df)
+    result = arrow_cache.get('key')
+    pd.testing.assert_frame_equal(result, wide_df)
+
+def test_result_cache_arrow_column_projection(arrow_cache, wide_df):
+    arrow_cache.set('key', wide_df)
+    result = arrow_cache.get('key', columns=['label'])
+    assert result.columns.tolist() == ['label']
+    assert result['label'].tolist() == list('abcde')
+
+def test_result_cache_arrow_falls_back_to_pickle(arrow_cache):
+    mixed = pd.DataFrame({'mixed': [1, 'a', 2.5]})
+    arrow_cache.set('key', mixed)
+    assert arrow_cache.get('key')['mixed'].tolist() == [1, 'a', 2.5]
+
+def test_result_cache_non_dataframe_values(arrow_cache):
+    arrow_cache.set('key', 3)
+    assert arrow_cache.get('key') == 3
+    assert arrow_cache.get('missing') is None
+
+def test_result_cache_rejects_unknown_format(tmp_path):
+    with pytest.raises(NotImplementedError):
+        ResultCache(directory=str(tmp_path), cache_format='csv')
+
+def test_single_flight_coalesces_threads(tmp_path, wide_df):
+    cache = ResultCache(directory=str(tmp_path))
+    single_flight = SingleFlight(cache, timeout=5)
+    loads = []
+    def load():
+        loads.append(1)
+        time.sleep(0.1)
+        cache.set('key', wide_df)
+        return wide_df
+
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(single_flight.do('key', load))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert len(results) == 8 and all(result.equals(wide_df) for result in results)
+
+def test_single_flight_waits_for_other_process(tmp_path, wide_df):
+    cache = ResultCache(directory=str(tmp_path))
+    # Lock held by another process that publishes its result shortly
+    cache.disk.add('key.lock', -1)
+    threading.Timer(0.05, cache.set, args=('key', wide_df)).start()
+
+    result = SingleFlight(cache, timeout=5).do('key', lambda: pytest.fail("query ran twice"))
+    assert result.equals(wide_df)
+
+def test_single_flight_falls_back_after_timeout(tmp_path, wide_df):
+    cache = ResultCache(directory=str(tmp_path))
+    cache.disk.add('key.lock', -1)
+    result = SingleFlight(cache, timeout=0.05).do('key', lambda: wide_df)
+    assert result.equals(wide_df)
+
+def test_memory_cache_evicts_least_recently_used(wide_df):
+    nbytes = int(wide_df.memory_usage(deep=True).sum())
+    memory = MemoryCache(max_bytes=2 * nbytes)
+    memory.set('a', wide_df)
+    memory.set('b', wide_df)
+    memory.get('a')
+    memory.set('c', wide_df)
+    assert memory.get('b') is None
+    assert memory.get('a') is not None and memory.get('c') is not None
+    assert memory.current_bytes == 2 * nbytes
+
+def test_memory_cache_skips_values_over_budget(wide_df):
+    memory = MemoryCache(max_bytes=10)
+    memory.set('a', wide_df)
+    assert len(memory) == 0 and memory.current_bytes == 0
+
+def test_memory_cache_results_cannot_corrupt_cache(wide_df):
+    memory = MemoryCache(max_bytes=10 ** 6)
+    memory.set('a', wide_df)
+    result = memory.get('a')
+    try:
+        result.loc[0, 'amount'] = -1.0
+    except ValueError:
+        pass  # read-only without pandas copy-on-write
+    result['extra'] = 1
+    assert memory.get('a')['amount'].tolist() == [1.5] * 5
+    assert 'extra' not in memory.get('a')
+
+def test_memory_cache_leaves_the_stored_frame_writable(wide_df):
+    memory = MemoryCache(max_bytes=10 ** 6)
+    memory.set('a', wide_df)
+    assert not np.shares_memory(memory.get('a')['amount'].to_numpy(), wide_df['amount'].to_numpy())
+    wide_df.loc[0, 'amount'] = -1.0  # e.g. the fresh result q returned on a miss
+    assert memory.get('a')['amount'].tolist() == [1.5] * 5
+
+def test_memory_cache_respects_expiry(wide_df):
+    memory = MemoryCache(max_bytes=10 ** 6)
+    memory.set('a', wide_df, expire_time=time.time() - 1)
+    assert memory.get('a') is None
+
+def test_result_cache_serves_hits_from_memory(tmp_path, wide_df):
+    cache = ResultCache(directory=str(tmp_path), memory_limit=10 ** 6)
+    cache.set('key', wide_df)
+    cache.disk.clear()
+    assert cache.get('key').equals(wide_df)
+    assert cache.get('key', columns=['id']).columns.tolist() == ['id']
+
+def test_result_cache_promotes_disk_hits_to_memory(tmp_path, wide_df):
+    ResultCache(directory=str(tmp_path)).set('key', wide_df)
+    cache = ResultCache(directory=str(tmp_path), memory_limit=10 ** 6)
+    assert cache.get('key').equals(wide_df)
+    assert 'key' in cache.memory._entries
+
+def test_result_cache_counts_evictions(tmp_path, wide_df):
+    cache = ResultCache(directory=str(tmp_path), size_limit=64 * 1024)
+    payload = b'x' * (40 * 1024)
+    for i in range(4):
+        cache.set(f'key{i}', payload)
+    stats = cache.get_stats()
+    assert stats['evictions'] > 0
+    assert stats['bytes_stored'] <= 64 * 1024 + 40 * 1024
+
+def test_result_cache_evicts_results_with_their_sidecars(tmp_path):
+    cache = ResultCache(directory=str(tmp_path), size_limit=64 * 1024)
+    payload = b'x' * (40 * 1024)
+    for i in range(6):
+        cache.set(f'key{i}', payload, expire=3600)
+    keys = set(cache.disk)
+    results = {key for key in keys if not key.endswith('.fresh')}
+    assert cache.get_stats()['evictions'] == 6 - len(results)  # each result counted once
+    assert keys == results | {f'{key}.fresh' for key in results}  # no result without its sidecar
+
+def test_result_cache_shards(tmp_path, wide_df):
+    cache = ResultCache(directory=str(tmp_path), shards=4)
+    cache.set('key', wide_df)
+    assert cache.get('key').equals(wide_df)
+    assert cache.get_stats()['entries'] == 1
+
+def test_cache_stats_percentiles_and_expensive_keys():
+    stats = CacheStats()
+    for i in range(1, 101):
+        stats.record_hit(i / 1000)
+    stats.record_miss()
+    stats.record_fetch('slow', 2.0, 100, 'SELECT slow')
+    stats.record_fetch('fast', 0.1, 100, 'SELECT fast')
+    snapshot = stats.snapshot()
+    assert snapshot['hit_latency_p50'] == 0.05 and snapshot['hit_latency_p99'] == 0.099
+    assert snapshot['hit_ratio'] == 100 / 101
+    assert [entry['key'] for entry in snapshot['expensive_keys']] == ['slow', 'fast']
+
+@pytest.fixture
+def large_df():
+    return pd.DataFrame({'id': range(20000), 'label': ['label-{}'.format(i % 100) for i in range(20000)]})
+
+@pytest.mark.parametrize('codec', ['zstd', 'lz4'])
+def test_result_cache_compression_round_trip(tmp_path, large_df, codec):
+    cache = ResultCache(directory=str(tmp_path / codec), compression=codec)
+    cache.set('key', large_df)
+    pd.testing.assert_frame_equal(cache.get('key'), large_df)
+    assert cache.disk.get('key', tag=True)[1] == codec
+
+    stats = cache.get_stats()
+    assert stats['compression'] == codec and stats['compressed_entries'] == 1
+    assert stats['compression_ratio'] > 2 and stats['decompress_seconds'] > 0
+
+def test_result_cache_compression_skips_small_results(tmp_path, wide_df):
+    cache = ResultCache(directory=str(tmp_path), compression='zstd')
+    cache.set('key', wide_df)
+    cache.set('marker', 1.5)
+    pd.testing.assert_frame_equal(cache.get('key'), wide_df)
+    assert cache.get('marker') == 1.5
+    assert cache.get_stats()['compressed_entries'] == 0
+
+def test_result_cache_reads_entries_of_another_codec(tmp_path, large_df):
+    ResultCache(directory=str(tmp_path), compression='lz4').set('key', large_df)
+    pd.testing.assert_frame_equal(ResultCache(directory=str(tmp_path), compression='zstd').get('key'), large_df)
+    pd.testing.assert_frame_equal(ResultCache(directory=str(tmp_path)).get('key'), large_df)
+
+def test_result_cache_arrow_compression(tmp_path, large_df):
+    cache = ResultCache(directory=str(tmp_path), cache_format='arrow', compression='zstd', compression_level=5)
+    cache.set('key', large_df)
+    pd.testing.assert_frame_equal(cache.get('key'), large_df)
+    assert cache.get_stats()['compression_ratio'] > 1
+
+def test_result_cache_rejects_unknown_compression(tmp_path):
+    with pytest.raises(NotImplementedError):
+        ResultCache(directory=str(tmp_path), compression='bz2')
@@ -0,0 +1,68 @@
+import os
+import sys
+import json
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from pymaf.utils.cli import load_manifest, main
+from pymaf.utils.database_connector import DatabaseConnector
+
+@pytest.fixture
+def manifest(stand_in_database, tmp_path, monkeypatch):
+    monkeypatch.setenv('STAND_IN_HOST', 'localhost')
+    path = tmp_path / 'manifest.yaml'
+    path.write_text(f"""
+connections:
+  vertica:
+    db_type: vertica
+    connection_info: {{host: "${{STAND_IN_HOST}}"}}
+    cache_directory: {tmp_path / 'cache'}
+queries:
+  - name: sales
+    connection: vertica
+    sql: SELECT * FROM sales
+    ttl: 600
+  - name: large_sales
+    connection: vertica
+    sql: SELECT * FROM sales WHERE amount > 6
+""")
+    return path
+
+def run(capsys, *argv):
+    code = main(['warm', *argv, '--json'])
+    return code, {report['name']: report for report in map(json.loads, capsys.readouterr().out.splitlines())}
+
+def test_load_manifest_expands_environment_variables(manifest):
+    assert load_manifest(str(manifest))['connections']['vertica']['connection_info'] == {'host': 'localhost'}
+
+def test_warm_populates_the_connector_cache(manifest, tmp_path, capsys):
+    code, reports = run(capsys, str(manifest))
+    assert code == 0
+    assert reports['sales']['status'] == 'warmed' and reports['sales']['rows'] == 10
+    assert reports['large_sales']['rows'] == 5
+
+    db_connector = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                     cache_directory=str(tmp_path / 'cache'))
+    assert len(db_connector.q("SELECT * FROM sales", cache_only=True)) == 10
+
+def test_warm_skips_fresh_queries(manifest, capsys):
+    run(capsys, str(manifest))
+    code, reports = run(capsys, str(manifest), '--only', 'sales')
+    assert code == 0 and list(reports) == ['sales']
+    assert reports['sales']['status'] == 'fresh'
+
+    code, reports = run(capsys, str(manifest), '--only', 'sales', '--force')
+    assert reports['sales']['status'] == 'warmed'
+
+def test_warm_reports_failures_in_the_exit_code(manifest, capsys):
+    manifest.write_text(manifest.read_text() + """
+  - name: broken
+    connection: vertica
+    sql: SELECT * FROM missing_table
+""")
+    code, reports = run(capsys, str(manifest))
+    assert code == 1
+    assert reports['broken']['status'] == 'failed' and 'missing_table' in reports['broken']['error']
+    assert reports['sales']['status'] == 'warmed'
@@ -1,14 +1,13 @@
 import os
 import sys
 import logging
-import hashlib
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import pytest
 import pandas as pd
 
-from utils.database_connector import DatabaseConnector
+from pymaf.utils.database_connector import DatabaseConnector
 
 @pytest.fixture
 def db_connector():
@@ -30,7 +29,7 @@ def test_db_connector_init(db_connector):
     # Check if the db_connector is properly initialized
     assert db_connector.db_type == 'vertica'
     assert db_connector.cache_enabled is True
-    assert db_connector.query_cache == {}
+    assert len(db_connector.cache.disk) == 0
 
 def test_db_connector_connect(db_connector):
     # Check if the connect() method establishes the database connection
@@ -40,10 +39,10 @@ def test_db_connector_connect(db_connector):
 def test_db_connector_q_with_cache(db_connector):
     # Check if the q() method retrieves query results from cache when cache is enabled
     query = "SELECT '22' as catch"
-    cache_key = hashlib.md5(query.encode('utf-8')).hexdigest()
+    cache_key = db_connector._get_cache_key(query)
     expected_value = pd.DataFrame(['22'], columns=['catch'])
     
-    db_connector.query_cache[cache_key] = expected_value
+    db_connector.cache.set(cache_key, expected_value)
     db_connector.cache_enabled = True
     result = db_connector.q(query)
     assert result.values.tolist() == expected_value.values.tolist()
@@ -51,17 +50,17 @@ def test_db_connector_q_with_cache(db_connector):
 def test_db_connector_q_without_cache(db_connector):
     # Check if the q() method executes the query and caches the result when cache is enabled
     query = "SELECT '22' as catch"
-    cache_key = hashlib.md5(query.encode('utf-8')).hexdigest()
+    cache_key = db_connector._get_cache_key(query)
     expected_value = pd.DataFrame(['22'], columns=['catch'])
     db_connector.cache_enabled = True
 
     result = db_connector.q(query)
     assert result.values.tolist() == expected_value.values.tolist()
-    assert all(db_connector.query_cache[cache_key] == expected_value)
+    assert all(db_connector.cache.get(cache_key) == expected_value)
 
 def test_db_connector_q_exception(db_connector, monkeypatch, caplog):
     # Check if the q() method logs an error when an exception occurs during query execution
-    def mock_read_sql(query, dbengine):
+    def mock_read_sql(query, dbengine, **kwargs):
         raise Exception('Query execution failed')
     
     monkeypatch.setattr('pandas.read_sql', mock_read_sql)
@@ -81,9 +80,9 @@ def test_db_connector_toggle_cache(db_connector):
 
 def test_db_connector_clear_cache(db_connector):
     # Check if the clear_cache() method clears the query cache
-    db_connector.query_cache['cache_key'] = 'cached_result'
+    db_connector.cache.set('cache_key', 'cached_result')
     db_connector.clear_cache()
-    assert db_connector.query_cache == {}
+    assert len(db_connector.cache.disk) == 0
 
 def test_db_connector_unsupported_auth_exception(db_connector):
     with pytest.raises(TypeError):
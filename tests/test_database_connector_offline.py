@@ -0,0 +1,329 @@
+import os
+import sys
+import re
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import pandas as pd
+from sqlalchemy import create_engine
+
+from pymaf.utils.database_connector import DatabaseConnector
+from pymaf.utils import dbconfig
+from pymaf.utils.dbconfig import QueryTimeoutError
+
+@pytest.fixture
+def db_connector(stand_in_database, tmp_path):
+    db_connector = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                     cache_directory=str(tmp_path / 'cache'))
+    yield db_connector
+    db_connector.clear_cache()
+
+def test_db_connector_q_iter_yields_bounded_chunks(db_connector):
+    chunks = list(db_connector.q_iter("SELECT * FROM sales ORDER BY id", chunksize=4))
+    assert [len(chunk) for chunk in chunks] == [4, 4, 2]
+    assert pd.concat(chunks)['id'].tolist() == list(range(10))
+
+def test_db_connector_q_iter_replays_from_cache(db_connector):
+    query = "SELECT * FROM sales ORDER BY id"
+    expected = list(db_connector.q_iter(query, chunksize=4))
+
+    with db_connector.dbengine.connection() as connection:
+        connection.execute("DELETE FROM sales")
+        connection.commit()
+    replayed = list(db_connector.q_iter(query, chunksize=4))
+    assert len(replayed) == len(expected)
+    assert all(a.equals(b) for a, b in zip(replayed, expected))
+
+def test_db_connector_q_iter_partial_stream_is_not_replayed(db_connector):
+    query = "SELECT * FROM sales ORDER BY id"
+    stream = db_connector.q_iter(query, chunksize=4)
+    next(stream)
+    stream.close()
+
+    cache_key = db_connector._get_cache_key(query)
+    assert db_connector.cache.get(f"{cache_key}.chunks") is None
+
+def test_db_connector_q_column_projection(db_connector):
+    query = "SELECT * FROM sales ORDER BY id"
+    assert db_connector.q(query, columns=['amount']).columns.tolist() == ['amount']
+    # Second call is a cache hit on the full result
+    assert db_connector.q(query, columns=['id'])['id'].tolist() == list(range(10))
+
+def test_db_connector_q_many_keeps_input_order_and_dedupes(db_connector, monkeypatch):
+    first, second = "SELECT id FROM sales WHERE id < 3", "SELECT id FROM sales WHERE id >= 8"
+    db_connector.q(second)
+
+    executed = []
+    fetch = db_connector._fetch
+    monkeypatch.setattr(db_connector, '_fetch', lambda query, *args, **kwargs: executed.append(query) or fetch(query, *args, **kwargs))
+    results = db_connector.q_many([first, second, first], max_workers=4)
+
+    assert [r['id'].tolist() for r in results] == [[0, 1, 2], [8, 9], [0, 1, 2]]
+    assert executed == [first]
+
+def test_db_connector_q_many_reports_errors_per_query(db_connector):
+    results = db_connector.q_many(["SELECT id FROM sales WHERE id = 1", "SELECT * FROM missing_table"])
+    assert results[0]['id'].tolist() == [1]
+    assert isinstance(results[1], Exception)
+
+def _delete_sales(db_connector):
+    with db_connector.dbengine.connection() as connection:
+        connection.execute("DELETE FROM sales")
+        connection.commit()
+
+def test_db_connector_ttl_rules_and_per_call_ttl(db_connector):
+    db_connector.ttl_rules = [(re.compile('sales'), 5)]
+    assert db_connector._get_ttl("SELECT * FROM sales") == 5
+    assert db_connector._get_ttl("SELECT * FROM sales", ttl=1) == 1
+    assert db_connector._get_ttl("SELECT 1") == db_connector.cache_timeout
+
+def test_db_connector_expired_result_is_refetched(db_connector):
+    query = "SELECT COUNT(*) AS n FROM sales"
+    db_connector.q(query, ttl=0.05)
+    _delete_sales(db_connector)
+    time.sleep(0.1)
+    assert db_connector.q(query)['n'].tolist() == [0]
+
+def test_db_connector_serves_stale_result_while_refreshing(db_connector):
+    query = "SELECT COUNT(*) AS n FROM sales"
+    db_connector.q(query, ttl=0.05, stale_ttl=60)
+    _delete_sales(db_connector)
+    time.sleep(0.1)
+
+    assert db_connector.q(query, ttl=60, stale_ttl=60)['n'].tolist() == [10]
+    db_connector._refresh_executor.shutdown(wait=True)
+    assert db_connector.q(query)['n'].tolist() == [0]
+
+def test_db_connector_scheduler_refreshes_before_expiry(db_connector):
+    query = "SELECT COUNT(*) AS n FROM sales"
+    db_connector.q(query, ttl=30)
+    _delete_sales(db_connector)
+
+    db_connector.schedule_refresh(query, ttl=30, lead_time=60)
+    db_connector.refresh_scheduler.run_pending()
+    db_connector._refresh_executor.shutdown(wait=True)
+    assert db_connector.q(query)['n'].tolist() == [0]
+
+def test_db_connector_cache_stats(db_connector):
+    query = "SELECT * FROM sales"
+    db_connector.q(query)
+    db_connector.q(query)
+    stats = db_connector.cache_stats()
+    assert stats['hits'] == 1 and stats['misses'] == 1 and stats['hit_ratio'] == 0.5
+    assert stats['entries'] == 1 and stats['bytes_stored'] > 0
+    assert stats['expensive_keys'][0]['query'] == query
+
+    db_connector.reset_cache_stats()
+    assert db_connector.cache_stats()['hits'] == 0
+
+    db_connector.q("SELECT id FROM sales")
+    list(db_connector.q_iter("SELECT amount FROM sales", chunksize=4))
+    assert db_connector.cache_stats()['entries'] == 3  # freshness sidecars and chunks are not counted
+
+def test_db_connector_columnar_fetch_engine(stand_in_database, tmp_path):
+    db_connector = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                     cache_directory=str(tmp_path / 'columnar'), fetch_engine='columnar')
+    assert db_connector.q("SELECT * FROM sales ORDER BY id")['id'].tolist() == list(range(10))
+    assert [len(c) for c in db_connector.q_iter("SELECT * FROM sales", chunksize=6)] == [6, 4]
+
+def test_db_connector_fetch_decimal_reaches_both_engines(stand_in_database, tmp_path, monkeypatch):
+    from pymaf.utils import fetch
+
+    seen = []
+    monkeypatch.setattr(fetch, 'read_vertica', lambda query, connection, decimal, params: seen.append(decimal))
+    monkeypatch.setattr(pd, 'read_sql', lambda *args, coerce_float, **kwargs: seen.append(coerce_float))
+    for fetch_engine in ('columnar', 'pandas'):
+        db_connector = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                         fetch_engine=fetch_engine, fetch_decimal='object')
+        db_connector._read_sql("SELECT * FROM sales", None)
+    assert seen == ['object', False]
+
+def test_db_connector_connects_on_first_query(stand_in_database, tmp_path):
+    cache_directory = str(tmp_path / 'cache')
+    query = "SELECT * FROM sales"
+    expected = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                 cache_directory=cache_directory).q(query)
+
+    db_connector = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                     cache_directory=cache_directory)
+    assert db_connector.q(query).equals(expected)
+    assert db_connector.q("SELECT id FROM sales", cache_only=True) is None
+    assert db_connector._dbengine is None
+
+    assert len(db_connector.q("SELECT id FROM sales")) == 10
+    assert db_connector._dbengine is not None
+
+def test_db_connector_cache_key_ignores_layout_but_not_connection(db_connector, stand_in_database, tmp_path):
+    db_connector.q("SELECT * FROM sales")
+    query = """
+        -- all sales
+        SELECT *
+          FROM sales /* every row */ ;"""
+    assert db_connector.q(query, cache_only=True) is not None
+    assert db_connector._get_cache_key("SELECT 'a  b'") != db_connector._get_cache_key("SELECT 'a b'")
+
+    other_user = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost', 'user': 'other'},
+                                   cache_directory=db_connector.cache.directory)
+    assert other_user.q("SELECT * FROM sales", cache_only=True) is None
+
+    vault_connector = DatabaseConnector(db_type='vertica', auth_backend='vault', cache_directory=str(tmp_path / 'vault'))
+    assert vault_connector.q("SELECT * FROM sales", cache_only=True) is None
+    assert vault_connector._connection_info is None
+
+def test_db_connector_q_binds_params(db_connector, monkeypatch):
+    query = "SELECT * FROM sales WHERE id < :n"
+    assert len(db_connector.q(query, params={'n': 3})) == 3
+    assert len(db_connector.q(query, params={'n': 5})) == 5
+
+    executed = _record_queries(db_connector, monkeypatch)
+    assert len(db_connector.q(query, params={'n': 3})) == 3
+    assert executed == []
+    assert [len(chunk) for chunk in db_connector.q_iter(query, chunksize=2, params={'n': 3})] == [2, 1]
+
+def test_import_is_lazy():
+    import subprocess
+
+    code = ("import sys; import pymaf.utils.database_connector; "
+            "print(' '.join(m for m in ('pandas', 'diskcache', 'vertica_python', 'hvac') if m in sys.modules))")
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    output = subprocess.run([sys.executable, '-c', code], cwd=root, capture_output=True, text=True, check=True)
+    assert output.stdout.strip() == ''
+
+def _record_queries(db_connector, monkeypatch):
+    executed = []
+    read_sql = db_connector._read_sql
+    monkeypatch.setattr(db_connector, '_read_sql',
+                        lambda query, *args, **kwargs: executed.append(query) or read_sql(query, *args, **kwargs))
+    return executed
+
+def test_db_connector_q_incremental_fetches_only_new_rows(db_connector, monkeypatch):
+    query = "SELECT * FROM sales"
+    assert len(db_connector.q_incremental(query, 'id', ttl=0)) == 10
+
+    with db_connector.dbengine.connection() as connection:
+        connection.executemany("INSERT INTO sales VALUES (?, ?)", [(i, i * 1.5) for i in range(10, 13)])
+        connection.execute("UPDATE sales SET amount = -1 WHERE id = 9")  # rows at the watermark are re-read
+        connection.commit()
+    executed = _record_queries(db_connector, monkeypatch)
+
+    result = db_connector.q_incremental(query, 'id', ttl=0)
+    assert executed == ["SELECT * FROM (SELECT * FROM sales) pymaf_increment WHERE id >= 9"]
+    assert result['id'].tolist() == list(range(13))
+    assert result['amount'].iloc[9] == -1
+
+    executed.clear()
+    assert len(db_connector.q_incremental(query, 'id', ttl=3600)) == 13
+    assert executed == []
+
+def test_db_connector_q_range_caches_partitions(db_connector, monkeypatch):
+    with db_connector.dbengine.connection() as connection:
+        connection.execute("CREATE TABLE events (sold_at TEXT, value INTEGER)")
+        connection.executemany("INSERT INTO events VALUES (?, ?)",
+                               [(f"2023-01-0{day} {hour:02d}:00:00", day) for day in range(1, 6) for hour in (6, 18)])
+        connection.commit()
+    query = "SELECT * FROM events WHERE sold_at >= {start} AND sold_at < {end}"
+
+    assert db_connector.q_range(query, '2023-01-01', '2023-01-04')['value'].tolist() == [1, 1, 2, 2, 3, 3]
+
+    executed = _record_queries(db_connector, monkeypatch)
+    result = db_connector.q_range(query, '2023-01-03 12:00', '2023-01-06', column='sold_at')
+    assert result['value'].tolist() == [3, 4, 4, 5, 5]
+    assert sorted(executed) == [query.format(start="'2023-01-04 00:00:00'", end="'2023-01-05 00:00:00'"),
+                                query.format(start="'2023-01-05 00:00:00'", end="'2023-01-06 00:00:00'")]
+
+def test_db_connector_q_partitioned_by_range(db_connector, monkeypatch):
+    query = "SELECT * FROM sales"
+    executed = _record_queries(db_connector, monkeypatch)
+    result = db_connector.q_partitioned(query, 'id', 3, max_workers=3)
+    assert sorted(result['id'].tolist()) == list(range(10))
+    assert executed[0].startswith("SELECT MIN(id)")
+    assert sorted(executed[1:]) == sorted([
+        "SELECT * FROM (SELECT * FROM sales) pymaf_partition WHERE id < 3 OR id IS NULL",
+        "SELECT * FROM (SELECT * FROM sales) pymaf_partition WHERE id >= 3 AND id < 6",
+        "SELECT * FROM (SELECT * FROM sales) pymaf_partition WHERE id >= 6"])
+
+def test_db_connector_q_partitioned_streams_in_order(db_connector):
+    chunks = list(db_connector.q_partitioned("SELECT * FROM sales", 'id', 2, method='mod', stream=True))
+    assert [chunk['id'].tolist() for chunk in chunks] == [[0, 2, 4, 6, 8], [1, 3, 5, 7, 9]]
+
+def test_db_connector_q_partitioned_retries_only_failed_partitions(db_connector, monkeypatch):
+    query = "SELECT * FROM sales"
+    read_sql = db_connector._read_sql
+    failures, executed = ['id >= 5'], []
+    def flaky_read_sql(query, *args, **kwargs):
+        executed.append(query)
+        if failures and query.endswith(failures[0]):
+            raise RuntimeError("connection reset")
+        return read_sql(query, *args, **kwargs)
+    monkeypatch.setattr(db_connector, '_read_sql', flaky_read_sql)
+
+    with pytest.raises(RuntimeError):
+        db_connector.q_partitioned(query, 'id', 2, lower_bound=0, upper_bound=10)
+    assert len(executed) == 2
+
+    failures.clear()
+    executed.clear()
+    assert len(db_connector.q_partitioned(query, 'id', 2, lower_bound=0, upper_bound=10)) == 10
+    assert executed == ["SELECT * FROM (SELECT * FROM sales) pymaf_partition WHERE id >= 5"]
+
+SLOW_QUERY = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT COUNT(*) FROM c"
+
+def test_db_connector_q_timeout_cancels_the_query(db_connector):
+    start = time.monotonic()
+    with pytest.raises(QueryTimeoutError):
+        db_connector.q(SLOW_QUERY, timeout=0.2)
+    assert time.monotonic() - start < 5
+    assert db_connector.dbengine.size == 0  # the cancelled connection was not reused
+    assert len(db_connector.q("SELECT * FROM sales", timeout=5)) == 10
+    assert db_connector.q("SELECT * FROM missing_table", timeout=5) is None
+
+def test_db_connector_retries_timed_out_queries(stand_in_database, tmp_path, monkeypatch):
+    db_connector = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                     cache_directory=str(tmp_path / 'cache'), query_timeout=0.1, retries=2,
+                                     retry_backoff=0)
+    executed = _record_queries(db_connector, monkeypatch)
+    with pytest.raises(QueryTimeoutError):
+        db_connector.q(SLOW_QUERY)
+    assert len(executed) == 3
+
+    executed.clear()
+    assert db_connector.q("SELECT * FROM missing_table") is None
+    assert len(executed) == 1  # other errors are not retried
+
+def test_db_connector_timeout_bounds_the_pool_checkout(stand_in_database, tmp_path):
+    db_connector = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                     cache_directory=str(tmp_path / 'cache'), pool_options={'max_size': 1, 'timeout': 10})
+    with db_connector.dbengine.connection():
+        start = time.monotonic()
+        with pytest.raises(QueryTimeoutError):
+            db_connector.q("SELECT * FROM sales", timeout=0.3)
+        assert time.monotonic() - start < 2
+
+@pytest.fixture
+def sqlalchemy_connector(stand_in_database, tmp_path):
+    # Takes the SQLAlchemy path of PostgreSQL, on the sqlite stand-in
+    db_connector = DatabaseConnector(db_type='postgresql', connection_info={'host': 'localhost'},
+                                     cache_directory=str(tmp_path / 'cache'))
+    db_connector._dbengine = create_engine(f"sqlite:///{stand_in_database}", poolclass=dbconfig._deadline_queue_pool(),
+                                           pool_size=1, max_overflow=0, pool_timeout=10,
+                                           connect_args={'check_same_thread': False})
+    yield db_connector
+    db_connector._dbengine.dispose()
+
+def test_db_connector_timeout_invalidates_sqlalchemy_connection(sqlalchemy_connector):
+    with sqlalchemy_connector.dbengine.connect() as connection:
+        first = connection.connection.dbapi_connection
+    with pytest.raises(QueryTimeoutError):
+        sqlalchemy_connector.q(SLOW_QUERY, timeout=0.2)
+    with sqlalchemy_connector.dbengine.connect() as connection:
+        assert connection.connection.dbapi_connection is not first  # the cancelled connection was closed
+    assert len(sqlalchemy_connector.q("SELECT * FROM sales", timeout=5)) == 10
+
+def test_db_connector_timeout_bounds_the_sqlalchemy_checkout(sqlalchemy_connector):
+    with sqlalchemy_connector.dbengine.connect():
+        start = time.monotonic()
+        with pytest.raises(QueryTimeoutError):
+            sqlalchemy_connector.q("SELECT * FROM sales", timeout=0.3)
+        assert time.monotonic() - start < 2
@@ -0,0 +1,161 @@
+import os
+import sys
+import sqlite3
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from pymaf.utils import dbconfig
+from pymaf.utils.dbconfig import verticaConnectionPool, PoolTimeoutError, get_shared_engine, dispose_shared_engines
+
+@pytest.fixture
+def opened(monkeypatch):
+    # Records every connection the pool opens, using sqlite in place of vertica_python
+    connections = []
+    def connect(self):
+        connections.append(sqlite3.connect(':memory:', check_same_thread=False))
+        return connections[-1]
+    monkeypatch.setattr(dbconfig.verticaConnection, 'connect', connect)
+    yield connections
+    dispose_shared_engines()
+
+def test_pool_opens_min_size_up_front(opened):
+    pool = verticaConnectionPool({}, min_size=2, max_size=4)
+    assert len(opened) == 2
+    assert pool.size == 2 and pool.idle == 2
+
+def test_pool_reuses_returned_connections(opened):
+    pool = verticaConnectionPool({}, min_size=0, max_size=2)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        assert second is first
+    assert len(opened) == 1
+
+def test_pool_checkout_times_out_at_max_size(opened):
+    pool = verticaConnectionPool({}, min_size=0, max_size=1)
+    held = pool.checkout()
+    with pytest.raises(PoolTimeoutError):
+        pool.checkout(timeout=0.05)
+    pool.checkin(held)
+    pool.checkin(pool.checkout(timeout=0.05))
+
+def test_pool_checkout_waits_for_checkin(opened):
+    pool = verticaConnectionPool({}, min_size=0, max_size=1)
+    held = pool.checkout()
+    threading.Timer(0.05, pool.checkin, args=(held,)).start()
+    assert pool.checkout(timeout=2).raw is held.raw
+
+def test_pool_replaces_connections_failing_pre_ping(opened):
+    pool = verticaConnectionPool({}, min_size=1, max_size=1)
+    opened[0].close()
+    with pool.connection() as connection:
+        assert connection is opened[1]
+    assert pool.size == 1
+
+def test_pool_recycles_old_connections(opened):
+    pool = verticaConnectionPool({}, min_size=1, max_size=1, recycle=0)
+    with pool.connection() as connection:
+        assert connection is opened[1]
+
+def test_shared_engine_per_connection_info(opened):
+    first = get_shared_engine('vertica', {'host': 'a'})
+    assert get_shared_engine('vertica', {'host': 'a'}) is first
+    assert get_shared_engine('vertica', {'host': 'b'}) is not first
+
+def test_slow_shared_engine_does_not_block_others(monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    def connect(self):
+        if self.connection_info['host'] == 'slow':
+            started.set()
+            release.wait(5)
+        return sqlite3.connect(':memory:', check_same_thread=False)
+    monkeypatch.setattr(dbconfig.verticaConnection, 'connect', connect)
+
+    engines = []
+    threads = [threading.Thread(target=lambda: engines.append(get_shared_engine('vertica', {'host': 'slow'})))
+               for _ in range(2)]
+    try:
+        for thread in threads:
+            thread.start()
+        assert started.wait(5)
+        assert get_shared_engine('vertica', {'host': 'fast'}).size == 1
+        assert all(thread.is_alive() for thread in threads)
+    finally:
+        release.set()
+        for thread in threads:
+            thread.join()
+        dispose_shared_engines()
+    assert engines[0] is engines[1]  # built once
+
+def test_sqlalchemy_pool_options_are_mapped():
+    connection = dbconfig.sqlAlchemyDbConnection('postgresql', {'host': 'h', 'port': 5432, 'user': 'u', 'password': 'p', 'database': 'd'},
+                                                 pool_options={'min_size': 2, 'max_size': 10, 'recycle': 60})
+    kwargs = connection._engine_pool_kwargs()
+    assert kwargs['pool_size'] == 2 and kwargs['max_overflow'] == 8 and kwargs['pool_recycle'] == 60
+    assert kwargs['pool_pre_ping'] is True
+
+@pytest.fixture
+def nodes(monkeypatch):
+    # Fake cluster: records the connection_info of every connection opened, and refuses nodes listed in down
+    from vertica_python import errors
+
+    cluster = {'opened': [], 'down': set()}
+    def connect(self):
+        if self.connection_info['host'] in cluster['down']:
+            raise errors.ConnectionError(f"{self.connection_info['host']} is down")
+        cluster['opened'].append(self.connection_info)
+        return sqlite3.connect(':memory:', check_same_thread=False)
+    monkeypatch.setattr(dbconfig.verticaConnection, 'connect', connect)
+    return cluster
+
+def test_pool_spreads_connections_round_robin(nodes):
+    pool = verticaConnectionPool({'host': 'a, b:5434, c', 'port': 5433}, min_size=3, max_size=3, load_balance='round_robin')
+    assert [(info['host'], info['port']) for info in nodes['opened']] == [('a', 5433), ('b', 5434), ('c', 5433)]
+    assert pool.size == 3
+
+def test_pool_prefers_least_outstanding_nodes(nodes):
+    pool = verticaConnectionPool({'host': ['a', 'b', 'c']}, min_size=0, max_size=6)
+    held = [pool.checkout() for _ in range(6)]
+    assert sorted(connection.host for connection in held) == ['a', 'a', 'b', 'b', 'c', 'c']
+    by_host = sorted(held, key=lambda connection: connection.host)
+    for connection in (by_host[4], by_host[5], by_host[0]):
+        pool.checkin(connection)
+    # c has nothing checked out, so its idle connection is reused before the more recent one on a
+    assert pool.checkout().host == 'c'
+
+def test_pool_fails_over_and_ejects_down_nodes(nodes):
+    nodes['down'].add('a')
+    pool = verticaConnectionPool({'host': ['a', 'b']}, min_size=0, max_size=4, eject_seconds=60)
+    held = [pool.checkout() for _ in range(3)]
+    assert {connection.host for connection in held} == {'b'}
+    assert pool.balancer.is_ejected('a')
+
+    pool.balancer.eject_seconds = 0
+    nodes['down'].clear()
+    assert pool.checkout().host == 'a'
+
+def test_pool_ejects_node_that_drops_a_connection(nodes):
+    from vertica_python import errors
+
+    pool = verticaConnectionPool({'host': ['a', 'b']}, min_size=2, max_size=2, pre_ping=False)
+    held = pool.checkout()
+    pool.checkin(held)
+    with pytest.raises(errors.ConnectionError):
+        with pool.connection():
+            raise errors.ConnectionError("node dropped")
+    assert pool.balancer.is_ejected(held.host)
+    assert pool.size == 1 and [entry[2] for entry in pool._idle] == [{'a': 'b', 'b': 'a'}[held.host]]
+
+def test_native_load_balancing_passes_backup_nodes(nodes):
+    verticaConnectionPool({'host': ['a', 'b', 'c']}, min_size=1, load_balance='native')
+    info = nodes['opened'][0]
+    assert info['connection_load_balance'] is True
+    assert sorted(info['backup_server_node'] + [(info['host'], info['port'])]) == [('a', 5433), ('b', 5433), ('c', 5433)]
+
+def test_native_load_balancing_passes_backup_ports(nodes):
+    verticaConnectionPool({'host': ['a:5434', 'b', 'c:6000'], 'port': 5500}, min_size=1, load_balance='native')
+    info = nodes['opened'][0]
+    assert sorted(info['backup_server_node'] + [(info['host'], info['port'])]) == [('a', 5434), ('b', 5500), ('c', 6000)]
@@ -0,0 +1,90 @@
+import os
+import sys
+import asyncio
+import logging
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from pymaf.utils.async_connector import AsyncDatabaseConnector
+from pymaf.utils.database_connector import DatabaseConnector
+from pymaf.utils.events import OpenTelemetryHooks
+
+@pytest.fixture
+def db_connector(stand_in_database, tmp_path):
+    db_connector = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                     cache_directory=str(tmp_path / 'cache'))
+    yield db_connector
+    db_connector.clear_cache()
+
+@pytest.fixture
+def events(db_connector):
+    events = []
+    db_connector.hooks.subscribe(events.append)
+    return events
+
+def test_events_of_a_cache_miss_and_hit(db_connector, events):
+    query = "SELECT * FROM sales"
+    db_connector.q(query)
+    assert [event.name for event in events] == ['query_start', 'cache_miss', 'checkout', 'fetch', 'serialize', 'query_end']
+    end = events[-1]
+    assert [phase.name for phase in end.phases] == ['cache_miss', 'checkout', 'fetch', 'serialize']
+    assert end.rows == 10 and end.nbytes > 0 and end.error is None
+    assert end.cache_key == db_connector._get_cache_key(query)
+    assert end.seconds >= sum(end.phase_seconds().values())
+
+    events.clear()
+    db_connector.q(query)
+    assert [event.name for event in events] == ['query_start', 'cache_hit', 'query_end']
+    assert events[1].rows == 10
+
+def test_query_end_carries_the_error(db_connector, events):
+    assert db_connector.q("SELECT * FROM missing_table") is None
+    assert events[-1].name == 'query_end' and events[-1].error is not None
+
+def test_failing_callback_does_not_break_queries(db_connector):
+    def broken(event):
+        raise RuntimeError("broken hook")
+    db_connector.hooks.subscribe(broken, events=('query_end',))
+    assert len(db_connector.q("SELECT * FROM sales")) == 10
+
+def test_q_many_traces_each_query(db_connector, events):
+    db_connector.q_many(["SELECT * FROM sales", "SELECT id FROM sales"])
+    ends = [event for event in events if event.name == 'query_end']
+    assert len(ends) == 2
+    assert all('fetch' in end.phase_seconds() for end in ends)
+
+def test_aq_traces_phases_run_on_threads(stand_in_database, tmp_path):
+    async_connector = AsyncDatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                             cache_directory=str(tmp_path / 'cache'))
+    ends = []
+    async_connector.hooks.subscribe(ends.append, events=('query_end',))
+    asyncio.run(async_connector.aq("SELECT * FROM sales"))
+    async_connector.close()
+    assert [phase.name for phase in ends[0].phases] == ['cache_miss', 'checkout', 'fetch', 'serialize']
+
+def test_slow_query_log(stand_in_database, tmp_path, caplog):
+    db_connector = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                     cache_directory=str(tmp_path / 'cache'), slow_query_threshold=0)
+    with caplog.at_level(logging.WARNING, logger='pymaf'):
+        db_connector.q("SELECT *\n  FROM sales")
+    message = [record.getMessage() for record in caplog.records if 'Slow query' in record.getMessage()][0]
+    assert 'fetch' in message and message.endswith('SELECT * FROM sales')
+
+def test_opentelemetry_spans(db_connector):
+    from opentelemetry.sdk.trace import TracerProvider
+    from opentelemetry.sdk.trace.export import SimpleSpanProcessor
+    from opentelemetry.sdk.trace.export.in_memory_span_exporter import InMemorySpanExporter
+
+    exporter = InMemorySpanExporter()
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(exporter))
+    db_connector.hooks.subscribe(OpenTelemetryHooks(provider.get_tracer('test')))
+
+    db_connector.q("SELECT * FROM sales")
+    spans = {span.name: span for span in exporter.get_finished_spans()}
+    assert set(spans) == {'pymaf.query', 'pymaf.cache_miss', 'pymaf.checkout', 'pymaf.fetch', 'pymaf.serialize'}
+    assert spans['pymaf.fetch'].parent.span_id == spans['pymaf.query'].context.span_id
+    assert spans['pymaf.query'].attributes['pymaf.rows'] == 10
+    assert spans['pymaf.query'].start_time <= spans['pymaf.fetch'].start_time <= spans['pymaf.query'].end_time
@@ -0,0 +1,61 @@
+import os
+import sys
+import decimal
+import warnings
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'benchmarks'))
+
+import pytest
+import numpy as np
+import pandas as pd
+
+from fake_vertica import FakeConnection, make_rows
+from pymaf.utils.fetch import read_vertica, iter_vertica
+
+@pytest.fixture
+def connection():
+    return FakeConnection(make_rows(50))
+
+@pytest.fixture
+def expected(connection):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)
+        return pd.read_sql("SELECT * FROM bench", connection)
+
+def test_read_vertica_types(connection):
+    df = read_vertica("SELECT * FROM bench", connection, batch_size=16)
+    assert df['id'].dtype == np.int64
+    assert df['amount'].dtype == np.float64 and df['price'].dtype == np.float64
+    assert str(df['quantity'].dtype) == 'Int64'
+    assert df['is_active'].dtype == np.bool_
+    assert pd.api.types.is_datetime64_any_dtype(df['order_date'])
+    assert pd.api.types.is_datetime64_any_dtype(df['updated_at'])
+
+def test_read_vertica_matches_read_sql(connection, expected):
+    df = read_vertica("SELECT * FROM bench", connection, batch_size=16)
+    assert df.columns.tolist() == expected.columns.tolist()
+    assert df['id'].tolist() == expected['id'].tolist()
+    assert df['quantity'].isna().tolist() == expected['quantity'].isna().tolist()
+    assert np.allclose(df['price'], expected['price'].astype(float))
+    assert df['updated_at'].tolist() == pd.to_datetime(expected['updated_at']).tolist()
+    assert df['order_date'].tolist() == pd.to_datetime(expected['order_date']).tolist()
+    assert df['label'].tolist() == expected['label'].tolist()
+
+def test_read_vertica_without_raw_text(connection, expected):
+    # Connections that cannot hand out raw text (e.g. binary transfer) use converted values
+    connection.options = {'binary_transfer': True}
+    df = read_vertica("SELECT * FROM bench", connection, batch_size=16)
+    assert df['quantity'].isna().tolist() == expected['quantity'].isna().tolist()
+    assert df['updated_at'].tolist() == pd.to_datetime(expected['updated_at']).tolist()
+
+def test_read_vertica_decimal_object(connection):
+    df = read_vertica("SELECT * FROM bench", connection, decimal='object')
+    assert df['price'][1] == decimal.Decimal('0.01')
+
+def test_iter_vertica_batches(connection):
+    assert [len(chunk) for chunk in iter_vertica("SELECT * FROM bench", connection, batch_size=20)] == [20, 20, 10]
+
+def test_read_vertica_empty_result():
+    df = read_vertica("SELECT * FROM bench", FakeConnection([]))
+    assert len(df) == 0 and df['id'].dtype == np.int64
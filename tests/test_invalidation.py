@@ -0,0 +1,112 @@
+import os
+import sys
+import sqlite3
+from contextlib import contextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from pymaf.utils.cache import TableIndex, PRUNE_MIN_KEYS
+from pymaf.utils.database_connector import DatabaseConnector
+from pymaf.utils.invalidation import TableWatcher, vertica_markers
+from pymaf.utils.sql import referenced_tables
+
+@pytest.fixture
+def db_connector(stand_in_database, tmp_path):
+    db_connector = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                     cache_directory=str(tmp_path / 'cache'), cache_timeout=None)
+    yield db_connector
+    db_connector.clear_cache()
+
+def _insert_sale(database):
+    with sqlite3.connect(database) as connection:
+        connection.execute("INSERT INTO sales VALUES (100, 1.0)")
+    connection.close()
+
+def sqlite_markers(connector, tables):
+    with connector._connection() as connection:
+        return {table: connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone() for table in tables}
+
+def test_referenced_tables():
+    assert referenced_tables("SELECT * FROM ca_ods.Sales s JOIN \"Dim\".\"Store\" d ON s.id = d.id, other") == \
+        ['Dim.Store', 'ca_ods.sales', 'other']
+    assert referenced_tables("""
+        WITH recent AS (SELECT * FROM orders WHERE note = 'from x')
+        SELECT EXTRACT(YEAR FROM sold_at), * FROM recent, (SELECT id FROM customers) c""") == ['customers', 'orders']
+    assert referenced_tables("SELECT * FROM a, b b_alias, c WHERE a.id = b_alias.id") == ['a', 'b', 'c']
+    assert referenced_tables("SELECT * FROM a JOIN b ON a.x = b.x, c WHERE c.y IN (1, 2)") == ['a', 'b', 'c']
+    assert referenced_tables("SELECT * FROM a LEFT JOIN b USING (x, y), c AS c1, d ORDER BY 1, 2") == ['a', 'b', 'c', 'd']
+    assert referenced_tables("SELECT SUBSTRING(s FROM 1 FOR 2), x FROM t, generate_series(1, 3)") == ['t']
+
+def test_invalidate_table_drops_only_its_results(db_connector):
+    db_connector.q("SELECT * FROM sales")
+    db_connector.q("SELECT 1 AS one")
+    assert db_connector.invalidate(table='ca_ods.SALES') == 1
+    assert db_connector.q("SELECT * FROM sales", cache_only=True) is None
+    assert db_connector.q("SELECT 1 AS one", cache_only=True) is not None
+    assert db_connector.invalidate(table='sales') == 0
+
+def test_invalidate_query(db_connector):
+    query = "SELECT * FROM sales WHERE id < :n"
+    db_connector.q(query, params={'n': 3})
+    db_connector.q(query, params={'n': 4})
+    assert db_connector.invalidate(query=query, params={'n': 3}) == 1
+    assert db_connector.q(query, params={'n': 3}, cache_only=True) is None
+    assert db_connector.q(query, params={'n': 4}, cache_only=True) is not None
+
+def test_table_index_prunes_dead_keys(tmp_path):
+    index = TableIndex(str(tmp_path / 'tables'))
+    alive = set()
+    for i in range(1000):
+        index.add(f"key-{i}", ['ca_ods.sales'], alive=alive.__contains__)
+        alive = {f"key-{i}"}  # only the latest entry stays cached
+    assert len(index.pop('sales')) <= 2 * PRUNE_MIN_KEYS
+
+def test_result_read_across_an_invalidation_is_not_cached(db_connector, monkeypatch):
+    read_sql = db_connector._read_sql
+    def read_then_change(*args, **kwargs):
+        result = read_sql(*args, **kwargs)
+        db_connector.invalidate(table='sales')  # e.g. the watcher saw a change while the query ran
+        return result
+    monkeypatch.setattr(db_connector, '_read_sql', read_then_change)
+    assert len(db_connector.q("SELECT * FROM sales")) == 10
+    assert db_connector.q("SELECT * FROM sales", cache_only=True) is None
+
+    monkeypatch.setattr(db_connector, '_read_sql', read_sql)
+    db_connector.q("SELECT * FROM sales")
+    assert db_connector.q("SELECT * FROM sales", cache_only=True) is not None
+
+def test_table_watcher_invalidates_changed_tables(db_connector, stand_in_database):
+    watcher = TableWatcher(db_connector, markers=sqlite_markers)
+    assert len(db_connector.q("SELECT * FROM sales")) == 10
+    assert watcher.check() == []  # first markers are a baseline
+
+    _insert_sale(stand_in_database)
+    assert watcher.check() == ['sales']
+    assert len(db_connector.q("SELECT * FROM sales")) == 11
+    assert watcher.check() == []
+
+def test_table_watcher_needs_markers_for_the_database(tmp_path):
+    db_connector = DatabaseConnector(db_type='mysql', connection_info={'host': 'localhost'},
+                                     cache_directory=str(tmp_path / 'cache'))
+    with pytest.raises(NotImplementedError):
+        db_connector.start_table_watcher()
+
+def test_vertica_markers_read_system_tables_once():
+    executed = []
+    class Cursor:
+        def execute(self, query):
+            executed.append(query)
+        def fetchall(self):
+            return [('CA_ODS', 'Sales', 10, 42), ('public', 'sales', 3, 7), ('ca_ods', 'stores', 5, None)]
+        def close(self):
+            pass
+    class Connector:
+        @contextmanager
+        def _connection(self):
+            yield type('Connection', (), {'cursor': lambda self: Cursor()})()
+
+    markers = vertica_markers(Connector(), ['ca_ods.sales', 'sales', 'missing'])
+    assert markers == {'ca_ods.sales': (('ca_ods', (10, 42)),), 'sales': (('ca_ods', (10, 42)), ('public', (3, 7)))}
+    assert len(executed) == 1 and 'v_monitor.projection_storage' in executed[0]
@@ -0,0 +1,75 @@
+import os
+import sys
+import sqlite3
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+import pytest
+
+from pymaf.utils.database_connector import DatabaseConnector
+from pymaf.utils.lazy import LazyResult, spill
+
+pytest.importorskip('pyarrow')
+
+@pytest.fixture
+def lazy_result(tmp_path):
+    df = pd.DataFrame({'store': [i % 3 for i in range(1000)], 'amount': [float(i) for i in range(1000)],
+                       'label': [f"row-{i}" for i in range(1000)]})
+    chunks = (df.iloc[i:i + 100] for i in range(0, len(df), 100))
+    return LazyResult(str(tmp_path / spill(chunks, str(tmp_path), 'key'))), df
+
+def test_spill_writes_one_file(lazy_result, tmp_path):
+    result, df = lazy_result
+    assert os.listdir(tmp_path) == [os.path.basename(result.path)]
+    assert len(result) == 1000 and result.columns == ['store', 'amount', 'label']
+    pd.testing.assert_frame_equal(result.to_pandas(), df)
+
+def test_spill_promotes_columns_null_in_the_first_chunk(tmp_path):
+    chunks = [pd.DataFrame({'id': [0, 1], 'note': [None, None]}),
+              pd.DataFrame({'id': [2, 3], 'note': [None, 'late']}),
+              pd.DataFrame({'id': [4], 'note': ['more']})]
+    result = LazyResult(str(tmp_path / spill(iter(chunks), str(tmp_path), 'key')))
+    assert os.listdir(tmp_path) == [os.path.basename(result.path)]
+    df = result.to_pandas()
+    assert df['id'].tolist() == [0, 1, 2, 3, 4]
+    assert df['note'].isna().tolist() == [True, True, True, False, False]
+    assert df['note'].tolist()[3:] == ['late', 'more']
+
+def test_head_select_and_filter(lazy_result):
+    result, df = lazy_result
+    pd.testing.assert_frame_equal(result.head(3), df.head(3))
+    assert result['amount'].columns == ['amount']
+
+    big = result.filter("amount >= 990")[['label']]
+    assert big.to_pandas()['label'].tolist() == [f"row-{i}" for i in range(990, 1000)]
+    assert len(result.filter(lambda chunk: chunk['store'] == 0)) == 334
+    assert all(len(chunk) <= 100 for chunk in result.iter_chunks(chunksize=100))
+
+def test_agg_in_batches(lazy_result):
+    result, df = lazy_result
+    totals = result.agg({'amount': 'sum', 'label': 'count'})
+    assert totals['amount'] == df['amount'].sum() and totals['label'] == 1000
+
+    by_store = result.agg({'amount': ['sum', 'mean', 'max']}, by='store', chunksize=64)
+    expected = df.groupby('store').agg({'amount': ['sum', 'mean', 'max']})
+    pd.testing.assert_frame_equal(by_store, expected, check_dtype=False)
+
+    with pytest.raises(NotImplementedError):
+        result.agg({'amount': 'median'})
+
+def test_q_lazy_spills_and_reuses_the_file(stand_in_database, tmp_path):
+    db_connector = DatabaseConnector(db_type='vertica', connection_info={'host': 'localhost'},
+                                     cache_directory=str(tmp_path / 'cache'))
+    assert db_connector.q("SELECT * FROM sales", lazy=True, cache_only=True) is None
+
+    result = db_connector.q("SELECT * FROM sales", lazy=True)
+    assert isinstance(result, LazyResult) and len(result) == 10
+
+    with sqlite3.connect(stand_in_database) as connection:
+        connection.execute("DELETE FROM sales")
+    again = db_connector.q("SELECT * FROM sales", columns=['amount'], lazy=True)
+    assert again.path == result.path and again.head(2)['amount'].tolist() == [0.0, 1.5]
+
+    db_connector.clear_cache()
+    assert not os.path.exists(result.path)
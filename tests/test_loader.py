@@ -0,0 +1,137 @@
+import os
+import sys
+import gzip
+import io
+from contextlib import contextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+import pandas as pd
+
+from pymaf.utils.database_connector import DatabaseConnector
+from pymaf.utils.loader import CsvStream, copy_vertica, copy_postgres
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+        self.rowcount = -1
+
+    def _read(self, sql, stream):
+        self.connection.sql = sql
+        data = b''
+        while True:
+            chunk = stream.read(1024)
+            if not chunk:
+                break
+            self.connection.reads += 1
+            data += chunk
+        self.connection.data = data
+        self.rowcount = data.count(b'\n')
+
+    copy = copy_expert = _read
+
+    def execute(self, sql):
+        self.connection.executed.append(sql)
+
+    def fetchone(self):
+        return (self.rowcount - 1, 1)
+
+    def close(self):
+        pass
+
+class FakeConnection:
+    def __init__(self):
+        self.sql, self.data, self.reads, self.executed, self.committed = None, None, 0, [], False
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        pass
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        'id': range(1000),
+        'label': ['a,"b"', '', None, 'x'] * 250,
+        'amount': [1.5, None, 2.0, 3.25] * 250,
+    })
+
+def test_csv_stream_round_trip(df):
+    data = CsvStream(df, chunksize=64).read()
+    loaded = pd.read_csv(io.BytesIO(data), header=None, names=df.columns, na_values=[r'\N'],
+                         keep_default_na=False)
+    assert loaded['id'].tolist() == df['id'].tolist()
+    assert loaded['label'].iloc[:2].tolist() == ['a,"b"', '']
+    assert pd.isna(loaded['label'].iloc[2])  # NULL stays distinct from the empty string
+    assert loaded['amount'].isna().tolist() == df['amount'].isna().tolist()
+
+def test_csv_stream_reads_lazily(df):
+    stream = CsvStream(df, chunksize=100)
+    stream.read(10)
+    assert 0 < stream.bytes_encoded < len(CsvStream(df).read())
+
+def test_csv_stream_gzip(df):
+    plain = CsvStream(df, chunksize=64).read()
+    assert gzip.decompress(CsvStream(df, chunksize=64, compress='gzip').read()) == plain
+
+def test_csv_stream_unknown_compression(df):
+    with pytest.raises(NotImplementedError):
+        CsvStream(df, compress='bz2')
+
+def test_copy_vertica(df):
+    connection = FakeConnection()
+    result = copy_vertica(connection, df, 'public.sales', chunksize=100, compress='gzip',
+                          rejected_table='sales_rejected', reject_max=10)
+    assert connection.sql.startswith('COPY public.sales ("id", "label", "amount") FROM STDIN GZIP')
+    assert "REJECTED DATA AS TABLE sales_rejected REJECTMAX 10" in connection.sql
+    assert gzip.decompress(connection.data).count(b'\n') == len(df)
+    assert connection.reads > 1 and connection.committed
+    assert result['rows_rejected'] == 1
+
+def test_copy_postgres(df):
+    connection = FakeConnection()
+    result = copy_postgres(connection, df, 'sales', chunksize=100)
+    assert connection.sql == 'COPY sales ("id", "label", "amount") FROM STDIN WITH (FORMAT csv, NULL \'\\N\')'
+    assert result == {'rows_loaded': len(df), 'rows_rejected': 0, 'bytes_sent': len(connection.data)}
+    assert connection.committed
+
+def test_csv_stream_writes_integers_with_nulls_without_decimals():
+    df = pd.DataFrame({'quantity': [1, None, 3], 'ratio': [0.5, None, 2.0], 'big': [2.0 ** 60, 1.0, None]})
+    assert df['quantity'].dtype == 'float64'
+    assert CsvStream(df).read() == b'1,0.5,1152921504606846976\n\\N,\\N,1\n3,2.0,\\N\n'
+
+class FakeEngine:
+    def __init__(self):
+        self.raw = FakeConnection()
+        self.raw.close = lambda: None
+
+    def raw_connection(self):
+        return self.raw
+
+    @contextmanager
+    def connection(self):
+        yield self.raw
+
+@pytest.mark.parametrize('db_type', ['vertica', 'postgresql'])
+def test_database_connector_load_dispatches_on_db_type(df, db_type):
+    db_connector = DatabaseConnector(db_type=db_type, connection_info={'host': 'localhost'})
+    db_connector._dbengine = FakeEngine()
+    result = db_connector.load(df, 'sales')
+    assert result['rows_loaded'] + result['rows_rejected'] == len(df)
+    assert db_connector._dbengine.raw.committed
+    if db_type == 'vertica':
+        assert "DELIMITER ','" in db_connector._dbengine.raw.sql
+    else:
+        assert 'FORMAT csv' in db_connector._dbengine.raw.sql
+        with pytest.raises(NotImplementedError):
+            db_connector.load(df, 'sales', compress='gzip')
+
+def test_database_connector_load_unsupported_db_type(df):
+    db_connector = DatabaseConnector(db_type='mysql', connection_info={'host': 'localhost'})
+    with pytest.raises(NotImplementedError):
+        db_connector.load(df, 'sales')
@@ -0,0 +1,55 @@
+import os
+import sys
+import logging
+import logging.handlers
+import subprocess
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymaf.utils import logger as pymaf_logger
+from pymaf.utils.logger import configure_logging, flush_logs, pkg_logger
+
+def test_records_are_handed_to_a_queue():
+    assert [type(handler) for handler in pkg_logger.handlers] == [logging.handlers.QueueHandler]
+
+def test_no_log_file_unless_configured(tmp_path):
+    code = "import pymaf.utils.logger as l; l.pkg_logger.warning('hello'); print(l.file_handler, l.pkg_logger.level)"
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=root)
+    env.pop('PYMAF_LOG_FILE', None)
+    output = subprocess.run([sys.executable, '-c', code], cwd=str(tmp_path), env=env, capture_output=True, text=True, check=True)
+    assert output.stdout.split() == ['None', str(logging.WARNING)]
+    assert 'hello' in output.stderr
+    assert os.listdir(tmp_path) == []
+
+    env['PYMAF_LOG_FILE'] = str(tmp_path / 'pymaf.log')
+    subprocess.run([sys.executable, '-c', code], cwd=str(tmp_path), env=env, check=True, capture_output=True)
+    assert 'hello' in (tmp_path / 'pymaf.log').read_text()
+
+def test_configure_logging_writes_a_file(tmp_path):
+    path = tmp_path / 'debug.log'
+    try:
+        configure_logging(level='DEBUG', file=str(path), console=False)
+        pkg_logger.debug("fetched %s rows", 42)
+        flush_logs()
+        assert 'DEBUG - fetched 42 rows' in path.read_text()
+    finally:
+        configure_logging(level='WARNING')
+    assert pymaf_logger.file_handler is None
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs os.fork")
+def test_forked_child_keeps_logging(tmp_path):
+    path = tmp_path / 'child.log'
+    try:
+        configure_logging(file=str(path), console=False)
+        pid = os.fork()
+        if pid == 0:
+            pkg_logger.warning("from the child")
+            flush_logs()
+            os._exit(0)
+        os.waitpid(pid, 0)
+        assert 'from the child' in path.read_text()
+    finally:
+        configure_logging()
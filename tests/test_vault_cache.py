@@ -0,0 +1,110 @@
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hvac
+import pytest
+
+from pymaf.utils import vault
+from pymaf.utils.vault import Vault, clear_vault_cache
+
+class FakeClient:
+    logins = 0
+    reads = 0
+    reject_next_read = False
+
+    def __init__(self, url=None):
+        self.auth = self
+        self.userpass = self
+        self.token = self
+        self.sys = self
+
+    def login(self, username, password):
+        FakeClient.logins += 1
+        return {'auth': {'client_token': 's.token', 'lease_duration': 3600, 'renewable': True}}
+
+    def renew_self(self):
+        return {'auth': {'lease_duration': 3600}}
+
+    def read(self, path):
+        FakeClient.reads += 1
+        if FakeClient.reject_next_read:
+            FakeClient.reject_next_read = False
+            raise hvac.exceptions.Forbidden("permission denied")
+        return {'lease_id': '', 'lease_duration': 2764800, 'renewable': False,
+                'data': {'data': {'VERTICA_HOST': 'vertica', 'VERTICA_USER': 'etl'}}}
+
+@pytest.fixture(autouse=True)
+def fake_vault(monkeypatch):
+    monkeypatch.setenv('DEVELOPER_ENVIRONMENT', 'SANDBOX')
+    monkeypatch.setenv('SANDBOX_KEYSTORE_URL', 'https://vault')
+    monkeypatch.setenv('SANDBOX_USER', 'user')
+    monkeypatch.setenv('SANDBOX_PASSWORD', 'password')
+    monkeypatch.setattr(vault.hvac, 'Client', FakeClient)
+    FakeClient.logins = FakeClient.reads = 0
+    FakeClient.reject_next_read = False
+    clear_vault_cache()
+    yield
+    clear_vault_cache()
+
+def test_credentials_are_cached_across_instances():
+    for _ in range(5):
+        assert Vault().get_vertica_credentials() == {'host': 'vertica', 'user': 'etl'}
+    assert FakeClient.logins == 1
+    assert FakeClient.reads == 1
+
+def test_credentials_without_lease_use_credential_ttl():
+    Vault(credential_ttl=60).get_vertica_credentials()
+    lease = next(iter(vault._secrets.values()))
+    assert lease.ttl == 60
+
+def test_expired_token_logs_in_again():
+    client = Vault().get_client()
+    next(iter(vault._tokens.values())).extend(1)  # within the renewal margin
+    assert Vault().get_client() is not client
+    assert FakeClient.logins == 2
+
+def test_rejected_token_logs_in_once_and_retries():
+    Vault().get_client()
+    FakeClient.reject_next_read = True
+    assert Vault().get_vertica_credentials()['host'] == 'vertica'
+    assert FakeClient.logins == 2
+    assert FakeClient.reads == 2
+
+def test_token_is_renewed_in_background():
+    Vault().get_client()
+    key, lease = next(iter(vault._tokens.items()))
+    assert lease.timer is not None and lease.timer.daemon
+    lease.extend(10)
+    vault._renew_token(key, {})
+    assert lease.ttl == 3600
+    assert FakeClient.logins == 1
+
+def test_other_auth_methods_are_not_implemented():
+    with pytest.raises(NotImplementedError):
+        Vault().get_client(auth_method='token')
+
+def test_slow_login_does_not_block_cached_lookups(monkeypatch):
+    import threading
+
+    Vault().get_vertica_credentials()
+    started, release = threading.Event(), threading.Event()
+    login = FakeClient.login
+    def slow_login(self, username, password):
+        started.set()
+        release.wait(5)
+        return login(self, username, password)
+    monkeypatch.setattr(FakeClient, 'login', slow_login)
+    monkeypatch.setenv('SANDBOX_USER', 'other')  # another user's login is in flight
+    thread = threading.Thread(target=Vault().get_client)
+    thread.start()
+    try:
+        assert started.wait(5)
+        monkeypatch.setenv('SANDBOX_USER', 'user')
+        assert Vault().get_vertica_credentials()['host'] == 'vertica'
+        assert thread.is_alive()
+    finally:
+        release.set()
+        thread.join()
+    assert FakeClient.logins == 2